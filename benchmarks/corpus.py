@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+"""Synthetic TxScript corpus generator.
+
+Each generator takes a size and returns the source of a TxScript program
+whose size grows linearly with it. The programs exercise the parts of the
+compiler that are most likely to scale badly.
+
+Run this module to print a program:
+
+    python benchmarks/corpus.py assumptions 16
+"""
+import argparse
+import hashlib
+
+def hex_constant(i, size=33):
+    """Get a deterministic hex string of size bytes."""
+    data = ''
+    counter = 0
+    while len(data) < size * 2:
+        data += hashlib.sha256('%d:%d' % (i, counter)).hexdigest()
+        counter += 1
+    return data[:size * 2]
+
+def assumptions(n, references=4):
+    """n assumed stack items, each referenced several times."""
+    names = ['a%d' % i for i in range(n)]
+    lines = ['assume %s;' % ', '.join(names)]
+    for r in range(references):
+        for i, name in enumerate(names):
+            other = names[(i + r + 1) % n]
+            lines.append('verify %s + %s > %d;' % (name, other, r))
+    lines.append('%s;' % names[0])
+    return '\n'.join(lines) + '\n'
+
+def nested_arithmetic(n):
+    """An arithmetic expression nested n levels deep."""
+    expr = 'a'
+    for i in range(n):
+        op = '+' if i % 2 == 0 else '-'
+        expr = '(%s %s %d)' % (expr, op, i % 7 + 1)
+    return 'assume a;\nverify %s == a;\n' % expr
+
+def long_chain(n):
+    """A left-deep chain of n additions (a + 1 + 2 + ...)."""
+    terms = ['a'] + ['%d' % (i % 7 + 1) for i in range(n)]
+    return 'assume a;\nverify %s > 0;\n' % ' + '.join(terms)
+
+def boolean_chains(n):
+    """Long chains of and and or."""
+    ors = ' or '.join('a == %d' % i for i in range(n))
+    ands = ' and '.join('b != %d' % i for i in range(n))
+    return 'assume a, b;\nverify %s;\n%s;\n' % (ors, ands)
+
+def multisig(n):
+    """A checkMultiSig call with n public keys."""
+    keys = ["'%s'" % hex_constant(i) for i in range(n)]
+    return 'checkMultiSig(%d, %s, %d);\n' % (n // 2 + 1, ', '.join(keys), n)
+
+def constants(n):
+    """n named byte array constants, each used twice."""
+    lines = ["c%d = '%s';" % (i, hex_constant(i, 20)) for i in range(n)]
+    lines.append('assume x;')
+    lines.extend('verify hash160(x) != c%d;' % i for i in range(n))
+    lines.extend('c%d;' % i for i in range(n))
+    return '\n'.join(lines) + '\n'
+
+def inner_script(n):
+    """An inner script with n statements."""
+    body = ['    %d + %d;' % (i % 15 + 1, (i + 1) % 15 + 1) for i in range(n)]
+    return 'redeemScript = {\n%s\n};\nredeemScript;\n' % '\n'.join(body)
+
+generators = [
+    # (name, function).
+    ('assumptions', assumptions),
+    ('nested_arithmetic', nested_arithmetic),
+    ('long_chain', long_chain),
+    ('boolean_chains', boolean_chains),
+    ('multisig', multisig),
+    ('constants', constants),
+    ('inner_script', inner_script),
+]
+
+def generate(name, size):
+    """Generate the program of generator name at size."""
+    return dict(generators)[name](size)
+
+def main():
+    argparser = argparse.ArgumentParser(description='Generate a synthetic TxScript program.')
+    argparser.add_argument('generator', choices=[i[0] for i in generators], help='Kind of program.')
+    argparser.add_argument('size', type=int, help='Size of the program.')
+    args = argparser.parse_args()
+    print(generate(args.generator, args.size))
+
+if __name__ == '__main__':
+    main()
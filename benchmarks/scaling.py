@@ -0,0 +1,255 @@
+#!/usr/bin/env python
+"""Scaling benchmark.
+
+Compiles the programs of each corpus generator (see corpus.py) at
+increasing sizes, with profiling enabled, and fits the scaling exponent k
+of every compilation stage (time ~ size ** k). A linear stage has k = 1,
+and a quadratic stage has k = 2.
+
+The programs of a generator are compiled in rounds (one compilation of
+each size per round) until a minimum wall time has passed, and the fastest
+time of each stage is used. Noise that lasts for a while (e.g. other
+processes) therefore affects every size rather than skewing the exponents.
+The garbage collector runs between compilations, not during them.
+
+The exponents are compared to those in a baseline file. Exits with a
+non-zero status if an exponent exceeds its baseline by more than the
+tolerance, so that a stage that becomes quadratic is caught.
+
+The peak memory of stages is only measured if tracemalloc is available
+(Python 3.9+). Otherwise, the peak resident memory of compiling the largest
+program in a separate process is reported instead, and stages have no peak.
+
+    python benchmarks/scaling.py                    # Compare to the baseline.
+    python benchmarks/scaling.py --write-baseline   # Update the baseline.
+"""
+import argparse
+import gc
+import json
+import math
+import os
+import subprocess
+import sys
+import timeit
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+import corpus
+from txsc import compile_source
+
+default_baseline = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scaling_baseline.json')
+
+# Sizes that each generator is run at. Programs should be large enough that
+# the fixed cost of a compilation does not dominate.
+sizes = {
+    'assumptions': [16, 32, 64, 128],
+    'nested_arithmetic': [64, 128, 256, 512],
+    # Deeper than the recursion limit.
+    'long_chain': [500, 1000, 2000, 4000],
+    'boolean_chains': [32, 64, 128, 256],
+    'multisig': [32, 64, 128, 256],
+    'constants': [32, 64, 128, 256],
+    'inner_script': [64, 128, 256, 512],
+}
+
+# Stages that take less time than this (in seconds) at the largest size
+# are too noisy to check.
+MIN_STAGE_TIME = 0.005
+
+# Minimum total time (in seconds) spent compiling each program.
+DEFAULT_MIN_TIME = 0.5
+
+# Compiles the source on stdin and prints the increase in peak resident memory.
+PEAK_RSS_SCRIPT = """
+import resource, sys
+sys.path.insert(0, sys.argv[1])
+from txsc import compile_source
+source = sys.stdin.read()
+# Load the languages and parsers first.
+compile_source('1;')
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+compile_source(source)
+print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before)
+"""
+
+def fit_exponent(points):
+    """Fit k in y = c * x ** k to points [(x, y), ...] by least squares on a log-log scale."""
+    points = [(math.log(x), math.log(y)) for x, y in points if x > 0 and y > 0]
+    if len(points) < 2:
+        return None
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    var = sum((x - mean_x) ** 2 for x, _ in points)
+    if not var:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / var
+
+def measure(source):
+    """Compile source once and return the measurements.
+
+    Returns a dict of {'time': seconds, 'peak_memory': bytes, 'stages': {name: stage}}.
+    Each stage has the total time of all runs of the stage in a compilation,
+    the highest peak memory, and the number of runs.
+    """
+    gc.collect()
+    gc.disable()
+    try:
+        profile = compile_source(source, profile=True).profile
+    finally:
+        gc.enable()
+    stages = {}
+    for record in profile['stages']:
+        stage = stages.setdefault(record['name'], {'time': 0.0, 'peak_memory': None, 'runs': 0})
+        stage['time'] += record['time']
+        stage['runs'] += 1
+        # Increases in peak resident memory are meaningless after the first compilation.
+        if profile['memory_traced'] and record['peak_memory'] is not None:
+            stage['peak_memory'] = max(stage['peak_memory'], record['peak_memory'])
+    peaks = [i['peak_memory'] for i in stages.values() if i['peak_memory'] is not None]
+    return {'time': profile['total_time'], 'peak_memory': max(peaks) if peaks else None, 'stages': stages}
+
+def keep_fastest(best, result):
+    """Update best with the times in result that are faster."""
+    best['time'] = min(best['time'], result['time'])
+    for name, stage in result['stages'].items():
+        if name in best['stages']:
+            best['stages'][name]['time'] = min(best['stages'][name]['time'], stage['time'])
+        else:
+            best['stages'][name] = stage
+
+def measure_peak_rss(source):
+    """Get the increase in peak resident memory (in bytes) of compiling source in a new process.
+
+    Returns None if it cannot be measured (e.g. on Windows).
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    proc = subprocess.Popen([sys.executable, '-c', PEAK_RSS_SCRIPT, root],
+                            stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    stdout, _ = proc.communicate(source)
+    if proc.returncode:
+        return None
+    # ru_maxrss is in bytes on macOS, and in KiB elsewhere.
+    return int(stdout) * (1 if sys.platform == 'darwin' else 1024)
+
+def run_generator(name, repeat, min_time):
+    """Measure the programs of generator name and fit the scaling exponents.
+
+    Each program is compiled at least repeat times, and the programs are
+    compiled until min_time seconds per program have passed.
+    """
+    sources = [corpus.generate(name, size) for size in sizes[name]]
+    measurements = [None] * len(sources)
+    runs = 0
+    start = timeit.default_timer()
+    while runs < repeat or timeit.default_timer() - start < min_time * len(sources):
+        runs += 1
+        for i, source in enumerate(sources):
+            result = measure(source)
+            if measurements[i] is None:
+                measurements[i] = result
+            else:
+                keep_fastest(measurements[i], result)
+    for size, source, m in zip(sizes[name], sources, measurements):
+        m['size'] = size
+        m['runs'] = runs
+        m['throughput'] = len(source) / m['time']
+
+    largest = measurements[-1]
+    if largest['peak_memory'] is None:
+        largest['peak_rss'] = measure_peak_rss(sources[-1])
+    exponents = {'total': fit_exponent([(m['size'], m['time']) for m in measurements])}
+    for stage, data in largest['stages'].items():
+        if data['time'] < MIN_STAGE_TIME:
+            continue
+        exponents[stage] = fit_exponent([(m['size'], m['stages'].get(stage, {}).get('time', 0)) for m in measurements])
+    return {
+        'exponents': exponents,
+        'time': largest['time'],
+        'peak_memory': largest['peak_memory'],
+        'peak_rss': largest.get('peak_rss'),
+        'throughput': largest['throughput'],
+        'measurements': measurements,
+    }
+
+def format_memory(value):
+    return '-' if value is None else '%.1f KiB' % (value / 1024.0)
+
+def print_report(name, result):
+    print('%s (sizes: %s)' % (name, ', '.join(str(i) for i in sizes[name])))
+    if result['peak_memory'] is None and result['peak_rss'] is not None:
+        peak = '%s peak (RSS)' % format_memory(result['peak_rss'])
+    else:
+        peak = '%s peak' % format_memory(result['peak_memory'])
+    print('  total: k = %.2f, %.3f s, %s, %.0f source bytes/s, %d runs' % (
+        result['exponents']['total'], result['time'], peak, result['throughput'],
+        result['measurements'][-1]['runs']))
+    stages = result['measurements'][-1]['stages']
+    for stage, k in sorted(result['exponents'].items(), key=lambda i: -stages.get(i[0], {}).get('time', 0)):
+        if stage == 'total' or k is None:
+            continue
+        data = stages[stage]
+        print('  %-28s k = %5.2f  %8.4f s  %5d runs  %s peak' % (stage, k, data['time'], data['runs'], format_memory(data['peak_memory'])))
+
+def check_regressions(results, baseline, tolerance):
+    """Get the exponents in results that exceed those in baseline by more than tolerance."""
+    failures = []
+    for name, result in sorted(results.items()):
+        expected = baseline.get(name, {})
+        for stage, k in sorted(result['exponents'].items()):
+            limit = expected.get(stage)
+            if k is None or limit is None:
+                continue
+            if k > limit + tolerance:
+                failures.append('%s: %s scales as size ** %.2f (baseline: %.2f)' % (name, stage, k, limit))
+    return failures
+
+def main():
+    argparser = argparse.ArgumentParser(description='Measure how compilation time scales with program size.')
+    argparser.add_argument('-g', '--generator', dest='generators', action='append', choices=sorted(sizes.keys()), help='Generator to run (Default: all).')
+    argparser.add_argument('-r', '--repeat', type=int, default=3, help='Minimum number of compilations per measurement.')
+    argparser.add_argument('--min-time', type=float, default=DEFAULT_MIN_TIME, help='Minimum time in seconds spent compiling each program.')
+    argparser.add_argument('--baseline', default=default_baseline, help='Baseline file of scaling exponents.')
+    argparser.add_argument('--write-baseline', action='store_true', help='Write the measured exponents to the baseline file.')
+    argparser.add_argument('--tolerance', type=float, default=0.3, help='Amount by which an exponent may exceed its baseline.')
+    argparser.add_argument('--json', dest='json_file', help='Write all measurements to a JSON file.')
+    args = argparser.parse_args()
+
+    names = args.generators or [i[0] for i in corpus.generators]
+    results = {}
+    for name in names:
+        results[name] = run_generator(name, args.repeat, args.min_time)
+        print_report(name, results[name])
+
+    if args.json_file:
+        with open(args.json_file, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    exponents = dict((name, result['exponents']) for name, result in results.items())
+    if args.write_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        for name, values in exponents.items():
+            baseline[name] = dict((stage, round(k, 2)) for stage, k in values.items() if k is not None)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True, separators=(',', ': '))
+            f.write('\n')
+        return
+
+    if not os.path.exists(args.baseline):
+        print('No baseline at %s' % args.baseline)
+        sys.exit(1)
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    failures = check_regressions(results, baseline, args.tolerance)
+    for failure in failures:
+        print('FAIL: %s' % failure)
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
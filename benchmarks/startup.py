@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+"""Startup time benchmark.
+
+Measures how long it takes a new process to import txsc and to compile a
+trivial script, and checks that importing the compiler does not import
+modules that should only be loaded on demand.
+
+Exits with a non-zero status if a measurement exceeds its limit.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that importing txsc.script_compiler must not import.
+lazy_modules = ['pkg_resources', 'ply', 'txsc.txscript', 'txsc.asm', 'txsc.btcscript']
+
+def run(code):
+    """Run python code in a new process and return its duration in milliseconds."""
+    env = dict(os.environ, PYTHONPATH=root)
+    with open(os.devnull, 'w') as devnull:
+        start = time.time()
+        subprocess.check_call([sys.executable, '-c', code], env=env, stdout=devnull)
+        return (time.time() - start) * 1000
+
+def median_time(code, runs):
+    times = sorted(run(code) for _ in range(runs))
+    return times[len(times) // 2]
+
+def eagerly_imported_modules():
+    """Get the modules in lazy_modules that are imported by txsc.script_compiler."""
+    code = ('import sys; import txsc.script_compiler; '
+            'print(",".join(m for m in %r if sys.modules.get(m)))' % lazy_modules)
+    env = dict(os.environ, PYTHONPATH=root)
+    output = subprocess.check_output([sys.executable, '-c', code], env=env)
+    return [i for i in output.strip().split(',') if i]
+
+benchmarks = [
+    # (name, code).
+    ('python', 'pass'),
+    ('import', 'import txsc.script_compiler'),
+    ('compile', 'import sys; sys.argv = ["txsc", "2 + 5;"]; from txsc.compiler import main; main()'),
+]
+
+def main():
+    argparser = argparse.ArgumentParser(description='Measure txsc startup time.')
+    argparser.add_argument('-n', '--runs', type=int, default=20, help='Number of runs per benchmark.')
+    argparser.add_argument('--max-import-ms', type=float, default=135.0, help='Maximum import time, excluding interpreter startup.')
+    argparser.add_argument('--max-compile-ms', type=float, default=175.0, help='Maximum compile time, excluding interpreter startup.')
+    args = argparser.parse_args()
+
+    failures = []
+    eager = eagerly_imported_modules()
+    if eager:
+        failures.append('Importing txsc.script_compiler imports: %s' % ', '.join(eager))
+
+    results = dict((name, median_time(code, args.runs)) for name, code in benchmarks)
+    baseline = results['python']
+    for name, _ in benchmarks:
+        print('%-8s %8.1f ms' % (name, results[name]))
+
+    for name, limit in [('import', args.max_import_ms), ('compile', args.max_compile_ms)]:
+        elapsed = results[name] - baseline
+        if elapsed > limit:
+            failures.append('%s took %.1f ms (limit: %.1f ms)' % (name, elapsed, limit))
+
+    for failure in failures:
+        print('FAIL: %s' % failure)
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,13 @@
+import re
+
 from setuptools import setup, find_packages
 
 with open('requirements.txt') as f:
     requirements = f.readlines()
 requirements = [i.replace('\n', '') for i in requirements]
 
-version = '0.1.0'
+with open('txsc/__init__.py') as f:
+    version = re.search(r"__version__ = '(.*)'", f.read()).group(1)
 
 setup(name = 'txsc',
     version = version,
@@ -13,7 +16,14 @@ setup(name = 'txsc',
     author_email = 'kefkius@maza.club',
     url = 'https://github.com/kefkius/txsc',
     packages = find_packages(),
+    package_data = {
+        'txsc.ir': ['*.rules'],
+    },
     install_requires = requirements,
+    extras_require = {
+        # txsc.aio uses trollius where asyncio is not available.
+        'aio:python_version < "3.4"': ['trollius'],
+    },
     entry_points = {
         'console_scripts': [
             'txsc = txsc.compiler:main',
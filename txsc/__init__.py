@@ -0,0 +1,4 @@
+__version__ = '0.1.0'
+
+from txsc.api import (compile_source, CompilationResult, CompilationError, DirectiveError,
+                      LanguageError, PassError, SourceError)
@@ -0,0 +1,116 @@
+"""asyncio interface to the compiler.
+
+AsyncCompiler runs compile_source() in an executor and returns futures that
+can be awaited (or yielded from) by coroutines. Identical requests that are
+in flight at the same time are compiled only once.
+
+Uses asyncio if it is available, and trollius otherwise.
+"""
+from collections import deque
+
+try:
+    import asyncio
+except ImportError:
+    import trollius as asyncio
+
+from txsc.api import compile_source
+
+# Default maximum number of compilations that run at once.
+DEFAULT_MAX_WORKERS = 4
+# Default maximum number of compilations that wait to be run.
+DEFAULT_MAX_PENDING = 256
+
+class AsyncCompiler(object):
+    """Compiles source in an executor.
+
+    At most max_workers compilations are submitted to the executor at once.
+    Further compilations wait in a queue of at most max_pending requests;
+    if the queue is full, compile() raises asyncio.QueueFull.
+
+    Attributes:
+        - executor: Executor that compilations run in. If None, the default
+            executor of the event loop is used.
+        - compilations (int): Number of compilations that were started.
+        - coalesced (int): Number of requests that were joined to an
+            identical request that was in flight.
+
+    """
+    def __init__(self, executor=None, max_workers=DEFAULT_MAX_WORKERS, max_pending=DEFAULT_MAX_PENDING, loop=None):
+        self.executor = executor
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.loop = loop
+        # {key: future, ...} for requests that are queued or running.
+        self.in_flight = {}
+        # Keys of requests that are waiting to be run.
+        self.pending = deque()
+        self.running = 0
+        self.compilations = 0
+        self.coalesced = 0
+
+    def get_loop(self):
+        if self.loop is None:
+            self.loop = asyncio.get_event_loop()
+        return self.loop
+
+    @staticmethod
+    def key(source, source_lang, target_lang, optimization):
+        """Get the key that identifies a request."""
+        if isinstance(source, basestring):
+            source = source.splitlines(True)
+        return (tuple(source), source_lang, target_lang, optimization)
+
+    def compile(self, source, source_lang='txscript', target_lang='btc', optimization=2):
+        """Compile source.
+
+        Returns a future for the CompilationResult. The arguments are the
+        same as those of compile_source().
+        """
+        loop = self.get_loop()
+        key = self.key(source, source_lang, target_lang, optimization)
+        future = self.in_flight.get(key)
+        if future is not None:
+            self.coalesced += 1
+        else:
+            if len(self.pending) >= self.max_pending:
+                raise asyncio.QueueFull()
+            future = self.in_flight[key] = asyncio.Future(loop=loop)
+            self.pending.append(key)
+            self.run_pending()
+
+        # Each caller gets its own future, so that cancelling one request
+        # does not affect requests that were joined to it.
+        waiter = asyncio.Future(loop=loop)
+        future.add_done_callback(lambda f: self._set_waiter(waiter, f))
+        return waiter
+
+    def run_pending(self):
+        """Start queued compilations while there are free workers."""
+        loop = self.get_loop()
+        while self.pending and self.running < self.max_workers:
+            key = self.pending.popleft()
+            self.running += 1
+            self.compilations += 1
+            job = loop.run_in_executor(self.executor, compile_source, *key)
+            job.add_done_callback(lambda f, key=key: self._finished(key, f))
+
+    def _finished(self, key, job):
+        self.running -= 1
+        future = self.in_flight.pop(key)
+        if job.cancelled():
+            future.cancel()
+        elif job.exception() is not None:
+            future.set_exception(job.exception())
+        else:
+            future.set_result(job.result())
+        self.run_pending()
+
+    def _set_waiter(self, waiter, future):
+        if waiter.cancelled():
+            return
+        if future.cancelled():
+            waiter.cancel()
+        elif future.exception() is not None:
+            waiter.set_exception(future.exception())
+        else:
+            waiter.set_result(future.result())
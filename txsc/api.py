@@ -0,0 +1,46 @@
+"""Library interface to the compiler.
+
+compile_source() may be called concurrently from several threads. Each call
+uses its own ScriptCompiler, and parsers are kept per-thread, so no state is
+shared between compilations.
+"""
+from argparse import Namespace
+from collections import namedtuple
+
+from txsc.script_compiler import (ScriptCompiler, CompilationError, DirectiveError,
+                                  LanguageError, PassError, SourceError)
+
+# The result of a compilation.
+#     - output (str): The output of the target language.
+#     - source_lang (str): The name of the source language.
+#     - target_lang (str): The name of the target language. This may differ from
+#           the requested target language if the source has a target directive.
+#     - instructions (CompactInstructions): The optimized linear IR.
+#     - profile (dict): The report of a txsc.profiler.Profiler if profiling
+#           was enabled, or None.
+CompilationResult = namedtuple('CompilationResult', ('output', 'source_lang', 'target_lang', 'instructions', 'profile'))
+
+def compile_source(source, source_lang='txscript', target_lang='btc', optimization=2, cache_dir=None, profile=False,
+                   passes=None, superopt_db=None):
+    """Compile source.
+
+    source may be a string or a list of lines. Raises CompilationError
+    (or a subclass of it) if source cannot be compiled. If profile is True,
+    the time, memory and instruction counts of each stage are recorded.
+    passes may specify the passes to run (see txsc.ir.passes.parse_passes).
+    superopt_db is the path of the superoptimizer's database (used with optimization level 4).
+    """
+    if isinstance(source, basestring):
+        source_lines = source.splitlines(True)
+    else:
+        source_lines = list(source)
+
+    options = Namespace(source_lang=source_lang, target_lang=target_lang, optimization=optimization,
+                        verbosity=0, output_file=None, cache_dir=cache_dir, profile=profile,
+                        passes=passes, superopt_db=superopt_db)
+    compiler = ScriptCompiler()
+    compiler.setup_options(options)
+    compiler.compile(source_lines)
+
+    return CompilationResult(compiler.outputs[compiler.target_lang.name], compiler.source_lang.name,
+                             compiler.target_lang.name, compiler.instructions, compiler.profile)
@@ -7,7 +7,7 @@ from txsc.ir import formats
 import txsc.ir.linear_nodes as types
 from txsc.language import Language
 
-from txsc.asm import ASMParser
+from txsc.asm.asm_parser import get_parser
 from txsc.btcscript import BtcScriptTargetVisitor
 
 def get_lang():
@@ -27,15 +27,16 @@ class ASMSourceVisitor(SourceVisitor):
     """Transforms ASM into the linear representation."""
 
     def transform(self, source):
-        parser = ASMParser()
+        parser = get_parser()
         if isinstance(source, list):
             source = '\n'.join(source)
-        parsed = parser.parse_source(source)
+        with self.profiler.stage('parse') as stage:
+            parsed = parser.parse_source(source)
 
-        if parsed is None:
-            print('\nFailed to parse.\n')
-        assert isinstance(parsed, list)
-        map(self.process_value, parsed)
+            if not isinstance(parsed, list):
+                raise SyntaxError('Failed to parse.')
+            map(self.process_value, parsed)
+            stage.set_output(self.instructions)
         return self.instructions
 
     def process_value(self, value):
@@ -47,7 +48,10 @@ class ASMSourceVisitor(SourceVisitor):
             try:
                 opcode = types.small_int_opcode(int(value))()
             except (TypeError, ValueError):
-                opcode = types.opcode_by_name('OP_%s' % value)()
+                opcode = types.opcode_by_name('OP_%s' % value)
+                if opcode is None:
+                    raise SyntaxError('Unknown opcode: "%s"' % value)
+                opcode = opcode()
             self.add_instruction(opcode)
 
 class ASMTargetVisitor(BtcScriptTargetVisitor):
@@ -55,9 +59,6 @@ class ASMTargetVisitor(BtcScriptTargetVisitor):
     def __init__(self, *args, **kwargs):
         super(ASMTargetVisitor, self).__init__(*args, **kwargs)
         self.values = []
-        # If we're transforming an InnerScript, we use BtcScriptTargetVisitor
-        # to get the actual values of opcodes.
-        self.visiting_innerscript = False
 
     def process_instruction(self, instruction):
         result = self.visit(instruction)
@@ -69,28 +70,18 @@ class ASMTargetVisitor(BtcScriptTargetVisitor):
     def output(self):
         return ' '.join(self.values)
 
-    def visit_InnerScript(self, node):
-        """Use BtcScriptTargetVisitor to transform node."""
-        self.visiting_innerscript = True
-        value = super(ASMTargetVisitor, self).visit_InnerScript(node)
-        self.visiting_innerscript = False
-        return value
-
     def visit_Push(self, node):
         length = len(node.data)
         asm = []
         asm.append(format_hex(hex(length)))
-        asm.append(format_hex(node.data.encode('hex')))
+        # Leading zero bytes are part of the data.
+        asm.append('0x' + node.data.encode('hex'))
         return asm
 
     def generic_visit_OpCode(self, node):
-        if self.visiting_innerscript:
-            return super(ASMTargetVisitor, self).generic_visit_OpCode(node)
         return node.name[3:]
 
     def generic_visit_SmallIntOpCode(self, node):
-        if self.visiting_innerscript:
-            return super(ASMTargetVisitor, self).generic_visit_SmallIntOpCode(node)
         return node.name[3:]
 
 
@@ -99,3 +90,7 @@ class ASMLanguage(Language):
     name = 'asm'
     source_visitor = ASMSourceVisitor
     target_visitor = ASMTargetVisitor
+
+    @classmethod
+    def prepare(cls):
+        get_parser()
@@ -1,13 +1,41 @@
+import os
+import threading
+
 from ply import lex, yacc
 
+# Modules containing the pregenerated parse and lex tables.
+# Run this module to regenerate them after changing the grammar or tokens.
+tabmodule = 'txsc.asm.parsetab'
+lextab = 'txsc.asm.lextab'
+
+# Per-thread parser instances. PLY parsers keep state while parsing,
+# so an instance cannot be shared by threads.
+_local = threading.local()
+
+def get_parser():
+    """Get the ASMParser instance of the current thread."""
+    parser = getattr(_local, 'parser', None)
+    if parser is None:
+        parser = _local.parser = ASMParser()
+    return parser
+
+def write_tables(outputdir=None):
+    """Write the parse and lex tables to outputdir."""
+    if outputdir is None:
+        outputdir = os.path.dirname(os.path.abspath(__file__))
+    parser = ASMParser(outputdir=outputdir, write_tables=True)
+    lex.lex(module=parser).writetab(lextab, outputdir)
+
 class ASMParser(object):
-    def __init__(self):
-        self.lexer = lex.lex(module=self)
+    def __init__(self, outputdir=None, write_tables=False):
+        self.lexer = lex.lex(module=self, optimize=True, lextab=lextab)
         # Suppress warning that OP is (technically) unused.
-        self.parser = yacc.yacc(module=self, errorlog=yacc.NullLogger())
+        self.parser = yacc.yacc(module=self, debug=False, errorlog=yacc.NullLogger(),
+                tabmodule=tabmodule, outputdir=outputdir, write_tables=write_tables)
 
     def parse_source(self, src):
-        return self.parser.parse(src, lexer=self.lexer)
+        # Each parse uses its own copy of the lexer so that no state is shared between parses.
+        return self.parser.parse(src, lexer=self.lexer.clone())
 
 
     tokens = ('OP', 'PUSH', 'OPCODE')
@@ -23,7 +51,7 @@ class ASMParser(object):
         return t
 
     def t_error(self, t):
-        print("Illegal character '%s'" % t.value)
+        raise SyntaxError("Illegal character '%s'" % t.value[0])
 
 
     def p_error(self, p):
@@ -46,3 +74,6 @@ class ASMParser(object):
     def p_word_opcode(self, p):
         '''word : OPCODE'''
         p[0] = p[1]
+
+if __name__ == '__main__':
+    write_tables()
@@ -0,0 +1,10 @@
+# lextab.py. This file automatically created by PLY (version 3.11). Don't edit!
+_tabversion   = '3.10'
+_lextokens    = set(('OP', 'OPCODE', 'PUSH'))
+_lexreflags   = 64
+_lexliterals  = ''
+_lexstateinfo = {'INITIAL': 'inclusive'}
+_lexstatere   = {'INITIAL': [('(?P<t_OP>[a-zA-Z0-9_]+)', [None, ('t_OP', 'OP')])]}
+_lexstateignore = {'INITIAL': ' \t\n'}
+_lexstateerrorf = {'INITIAL': 't_error'}
+_lexstateeoff = {}
@@ -0,0 +1,34 @@
+
+# parsetab.py
+# This file is automatically generated. Do not edit.
+# pylint: disable=W,C,R
+_tabversion = '3.10'
+
+_lr_method = 'LALR'
+
+_lr_signature = 'OP OPCODE PUSHscript : word\n                  | script word\n        word : PUSH PUSHword : OPCODE'
+    
+_lr_action_items = {'PUSH':([0,1,2,3,4,5,6,],[1,5,-4,-1,1,-3,-2,]),'OPCODE':([0,2,3,4,5,6,],[2,-4,-1,2,-3,-2,]),'$end':([2,3,4,5,6,],[-4,-1,0,-3,-2,]),}
+
+_lr_action = {}
+for _k, _v in _lr_action_items.items():
+   for _x,_y in zip(_v[0],_v[1]):
+      if not _x in _lr_action:  _lr_action[_x] = {}
+      _lr_action[_x][_k] = _y
+del _lr_action_items
+
+_lr_goto_items = {'word':([0,4,],[3,6,]),'script':([0,],[4,]),}
+
+_lr_goto = {}
+for _k, _v in _lr_goto_items.items():
+   for _x, _y in zip(_v[0], _v[1]):
+       if not _x in _lr_goto: _lr_goto[_x] = {}
+       _lr_goto[_x][_k] = _y
+del _lr_goto_items
+_lr_productions = [
+  ("S' -> script","S'",1,None,None,None),
+  ('script -> word','script',1,'p_script','asm_parser.py',59),
+  ('script -> script word','script',2,'p_script','asm_parser.py',60),
+  ('word -> PUSH PUSH','word',2,'p_word_push','asm_parser.py',69),
+  ('word -> OPCODE','word',1,'p_word_opcode','asm_parser.py',73),
+]
@@ -0,0 +1,98 @@
+"""Batch compilation of many source files.
+
+Sources are spread across a pool of worker processes. Each worker creates
+one ScriptCompiler when it starts, and loads the source and target languages
+of the options (including their parsers) before its first job, so languages
+are only loaded once per worker rather than once per source.
+"""
+from collections import namedtuple
+import copy
+import glob
+import multiprocessing
+import os
+
+from txsc.script_compiler import ScriptCompiler, read_source_file
+
+# The result of compiling one source file.
+# Exactly one of output and error is None.
+BatchResult = namedtuple('BatchResult', ('path', 'output', 'error'))
+
+# The number of sources sent to a worker at a time.
+CHUNK_SIZE = 16
+
+# ScriptCompiler instance of the current worker process.
+_compiler = None
+
+def _init_worker(options):
+    """Create the ScriptCompiler that a worker uses and load the languages of options."""
+    global _compiler
+    _compiler = ScriptCompiler()
+    # Languages that are chosen by file extension are loaded by the jobs that need them.
+    source_lang = _compiler.input_languages.get(options.source_lang)
+    if source_lang is not None:
+        source_lang.prepare()
+    _compiler.output_languages.get(options.target_lang)
+
+def _compile_job(job):
+    """Compile the source file of job."""
+    path, options = job
+    try:
+        options = copy.copy(options)
+        source_lines, source_lang = read_source_file(path, _compiler.input_languages)
+        if source_lang:
+            options.source_lang = source_lang
+        _compiler.setup_options(options)
+        _compiler.compile(source_lines)
+        return BatchResult(path, _compiler.output(), None)
+    except Exception as e:
+        return BatchResult(path, None, str(e))
+
+def read_manifest(filename):
+    """Read the source paths listed in a manifest file.
+
+    Blank lines and lines beginning with '#' are ignored. Relative paths
+    are relative to the directory containing the manifest.
+    """
+    base = os.path.dirname(filename)
+    paths = []
+    with open(filename, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            paths.append(os.path.join(base, line))
+    return paths
+
+def expand_batch_sources(spec):
+    """Get the source paths that spec refers to.
+
+    spec is either the path of a manifest file or a glob pattern.
+    """
+    if os.path.isfile(spec):
+        return read_manifest(spec)
+    return sorted(glob.glob(spec))
+
+def compile_batch(paths, options, processes=None):
+    """Compile the source files at paths.
+
+    BatchResult instances are yielded in the same order as paths, as soon
+    as they are available. If processes is 1, sources are compiled in
+    the calling process.
+    """
+    jobs = ((path, options) for path in paths)
+    if processes == 1:
+        _init_worker(options)
+        for job in jobs:
+            yield _compile_job(job)
+        return
+
+    pool = multiprocessing.Pool(processes, initializer=_init_worker, initargs=(options,))
+    try:
+        for result in pool.imap(_compile_job, jobs, CHUNK_SIZE):
+            yield result
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
@@ -6,6 +6,7 @@ Uses python-bitcoinlib internally.
 from bitcoin.core import b2x, x, script
 
 from txsc.transformer import SourceVisitor, TargetVisitor
+from txsc.ir.instructions import CompactInstructions
 import txsc.ir.linear_nodes as types
 from txsc.language import Language
 
@@ -20,20 +21,25 @@ class BtcScriptSourceVisitor(SourceVisitor):
         if source.startswith('0x'):
             source = source[2:]
 
-        src = script.CScript(x(source))
-        iterator = iter(src)
-        for value in iterator:
-            op = None
-            s = str(value)
-            if s.startswith('OP_'):
-                op = types.opcode_by_name(s)()
-            elif isinstance(value, int):
-                op = types.small_int_opcode(value)()
-            else:
-                op = types.Push(data=value)
-
-            if op is not None:
-                self.add_instruction(op)
+        with self.profiler.stage('parse') as stage:
+            try:
+                src = script.CScript(x(source.strip()))
+                values = list(src)
+            except (TypeError, script.CScriptInvalidError) as e:
+                raise SyntaxError('Invalid script: %s' % e)
+            for value in values:
+                op = None
+                s = str(value)
+                if s.startswith('OP_'):
+                    op = types.opcode_by_name(s)()
+                elif isinstance(value, int):
+                    op = types.small_int_opcode(value)()
+                else:
+                    op = types.Push(data=value)
+
+                if op is not None:
+                    self.add_instruction(op)
+            stage.set_output(self.instructions)
 
         return self.instructions
 
@@ -51,14 +57,10 @@ class BtcScriptTargetVisitor(TargetVisitor):
         return ''.join(self.hex_strs)
 
     def visit_InnerScript(self, node):
-        s = []
-        for op in node.ops:
-            result = self.visit(op)
-            if isinstance(result, list):
-                result = ''.join(result).replace('0x','')
-            s.append(result)
-        s = ''.join(s)
-        return self.visit(types.Push(data=x(s)))
+        ops = node.ops
+        if not isinstance(ops, CompactInstructions):
+            ops = CompactInstructions(ops)
+        return self.visit(types.Push(data=ops.serialize()))
 
     def visit_Push(self, node):
         value = script.CScriptOp.encode_op_pushdata(node.data)
@@ -66,7 +68,7 @@ class BtcScriptTargetVisitor(TargetVisitor):
 
     def generic_visit_OpCode(self, node):
         value = int(script.OPCODES_BY_NAME[node.name])
-        return hex(value)[2:]
+        return '%02x' % value
 
     def generic_visit_SmallIntOpCode(self, node):
         return self.generic_visit_OpCode(node)
@@ -0,0 +1,209 @@
+"""Content-addressed on-disk cache of compilation results.
+
+Entries are keyed by a hash of everything that determines the result of a
+compilation: the source (after directive processing), the source and target
+languages, the passes that are run, the peephole rules that are loaded, the
+compiler version, and the version of the cache format. The results of individual passes are also cached, keyed by
+the input of the pass.
+
+The cache may be shared by several processes. Entries are written to a
+temporary file and renamed into place, so readers never see a partial entry.
+Eviction is least-recently-used: reading an entry updates its modification
+time, and the oldest entries are removed when the cache grows beyond its
+maximum size.
+
+Entries are unpickled when they are read, so a cache directory must not be
+writable by other users: Anyone who can write an entry can run code in the
+processes that read it.
+"""
+from collections import namedtuple
+import errno
+import fcntl
+import hashlib
+import os
+import tempfile
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+import txsc
+
+# Version of the cache format. Increment this whenever the output of a
+# compilation or pass changes for the same input, or when the layout of
+# the pickled intermediate representations changes.
+CACHE_FORMAT_VERSION = 4
+
+# Default maximum size of a cache in bytes.
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+
+# Fraction of the maximum size that eviction reduces a full cache to, so
+# that the cache is not scanned again after every write.
+EVICTION_RATIO = 0.75
+
+# A cached compilation result.
+#     - output (str): The output of the target language.
+#     - instructions (CompactInstructions): The optimized linear IR.
+CacheEntry = namedtuple('CacheEntry', ('output', 'instructions'))
+
+class CompilationCache(object):
+    """On-disk cache of compilation results.
+
+    Attributes:
+        - directory (str): Directory that entries are stored in.
+        - max_size (int): Size in bytes that the cache is kept under.
+        - hits (int): Number of lookups that found an entry.
+        - misses (int): Number of lookups that did not find an entry.
+
+    """
+    entry_suffix = '.entry'
+    lock_name = 'lock'
+
+    def __init__(self, directory, max_size=DEFAULT_MAX_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        # Estimated total size of all entries, or None if it is not known yet.
+        # It includes what this instance writes, but not what other processes write.
+        self._size = None
+        try:
+            os.makedirs(directory)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+    @staticmethod
+    def key(source_lines, source_lang, target_lang, passes, rules=''):
+        """Get the key for a compilation.
+
+        rules is the digest of the peephole rules, if the peephole pass is run.
+        """
+        h = hashlib.sha256()
+        for value in [txsc.__version__, str(CACHE_FORMAT_VERSION), source_lang, target_lang, str(passes), rules]:
+            h.update(value)
+            h.update('\0')
+        for line in source_lines:
+            h.update(line)
+            h.update('\0')
+        return h.hexdigest()
+
+    @staticmethod
+    def pass_key(pass_name, token, state):
+        """Get the key for the result of a compilation pass.
+
+        state is the key or the serialized form of the input of the pass.
+        """
+        h = hashlib.sha256()
+        for value in [txsc.__version__, str(CACHE_FORMAT_VERSION), 'pass', pass_name, token]:
+            h.update(value)
+            h.update('\0')
+        h.update(state)
+        return h.hexdigest()
+
+    def entry_path(self, key):
+        """Get the path of the entry for key."""
+        return os.path.join(self.directory, key[:2], key + self.entry_suffix)
+
+    def get(self, key):
+        """Get the entry for key, or None if there is no such entry."""
+        path = self.entry_path(key)
+        try:
+            with open(path, 'rb') as f:
+                entry = pickle.load(f)
+            # Mark the entry as recently used.
+            os.utime(path, None)
+        except (IOError, OSError):
+            entry = None
+        except Exception:
+            # The entry is unreadable (e.g. it was written by an incompatible version).
+            self._remove(path)
+            entry = None
+
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def put(self, key, entry):
+        """Store entry under key.
+
+        The cache is only scanned for entries to evict when its estimated
+        size exceeds the maximum size.
+        """
+        path = self.entry_path(key)
+        dirname = os.path.dirname(path)
+        try:
+            os.makedirs(dirname)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+        fd, tmp_path = tempfile.mkstemp(dir=dirname, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(entry, f, pickle.HIGHEST_PROTOCOL)
+                entry_size = f.tell()
+            os.rename(tmp_path, path)
+        except Exception:
+            self._remove(tmp_path)
+            raise
+
+        if self._size is None:
+            self._size = self.size()
+        else:
+            self._size += entry_size
+        if self._size > self.max_size:
+            self.evict(int(self.max_size * EVICTION_RATIO))
+
+    def iter_entries(self):
+        """Yield (path, size, mtime) for every entry."""
+        for dirpath, _, filenames in os.walk(self.directory):
+            for filename in filenames:
+                if not filename.endswith(self.entry_suffix):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                yield path, st.st_size, st.st_mtime
+
+    def size(self):
+        """Get the total size of all entries."""
+        return sum(size for _, size, _ in self.iter_entries())
+
+    def evict(self, max_size=None):
+        """Remove least recently used entries until the cache is under a size.
+
+        max_size defaults to the maximum size of the cache.
+        """
+        if max_size is None:
+            max_size = self.max_size
+        with open(os.path.join(self.directory, self.lock_name), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                entries = sorted(self.iter_entries(), key=lambda i: i[2])
+                total = sum(i[1] for i in entries)
+                for path, size, _ in entries:
+                    if total <= max_size:
+                        break
+                    self._remove(path)
+                    total -= size
+                self._size = total
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def clear(self):
+        """Remove every entry."""
+        for path, _, _ in list(self.iter_entries()):
+            self._remove(path)
+        self._size = 0
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -1,5 +1,6 @@
 #!/usr/bin/env python
 import argparse
+import json
 import os
 import sys
 
@@ -19,7 +20,13 @@ if is_local:
         path = path[:-1]
     sys.path.insert(0, path)
 
-from txsc.script_compiler import ScriptCompiler, OptimizationLevel, Verbosity
+from txsc.ir.passes import passes, pipelines
+from txsc.script_compiler import (ScriptCompiler, OptimizationLevel, Verbosity, CompilationError,
+                                  read_source_file)
+from txsc.server import CompileServer, ServerError
+from txsc.cache import DEFAULT_MAX_SIZE
+from txsc.ir.superoptimizer import DEFAULT_DB_PATH
+from txsc.batch import compile_batch, expand_batch_sources
 
 
 # http://stackoverflow.com/questions/6076690/verbose-level-with-argparse-and-multiple-v-options
@@ -43,10 +50,49 @@ class OAction(argparse.Action):
             values=values.count('O')+1
         setattr(args, self.dest, values)
 
+def serve(compiler, args):
+    """Serve compile requests until interrupted or stdin is closed."""
+    server = CompileServer(args, compiler)
+    try:
+        if args.socket_path:
+            server.serve_unix(args.socket_path)
+        else:
+            server.serve_stream(sys.stdin, sys.stdout)
+    except KeyboardInterrupt:
+        pass
+    except ServerError as e:
+        print(e)
+        sys.exit(1)
+
+def batch(args):
+    """Compile a batch of source files.
+
+    Returns whether every file compiled successfully.
+    """
+    paths = expand_batch_sources(args.batch)
+    output_file = args.output_file
+    args.output_file = None
+
+    success = True
+    out = open(output_file, 'w') if output_file else sys.stdout
+    try:
+        for result in compile_batch(paths, args, args.jobs):
+            if result.error is not None:
+                success = False
+                sys.stderr.write('%s: %s\n' % (result.path, result.error))
+                continue
+            out.write('%s: %s\n' % (result.path, result.output))
+            out.flush()
+    finally:
+        if output_file:
+            out.close()
+    return success
+
 def main():
     compiler = ScriptCompiler()
-    source_choices = sorted(compiler.input_languages.keys())
-    target_choices = sorted(compiler.output_languages.keys())
+    # Languages are only loaded when they are chosen. Unknown languages are
+    # reported by ScriptCompiler, since listing the choices would load every language.
+    source_choices = compiler.input_languages
 
     argparser = argparse.ArgumentParser(description='Transaction script compiler.')
     argparser.add_argument('source', metavar='SOURCE', nargs='?', type=str, help='Source to compile.')
@@ -54,11 +100,22 @@ def main():
     argparser.add_argument('-o', '--output', dest='output_file', metavar='OUTPUT_FILE', type=str, help='Output to a file.')
     argparser.add_argument('-O', '--optimize', nargs='?', action=OAction, dest='optimization', metavar='OPTIMIZATION_LEVEL', default=2, help='Optimization level (Max: %d).' % OptimizationLevel.max_optimization)
 
-    argparser.add_argument('-s', '--source', metavar='SOURCE_LANGUAGE', dest='source_lang', choices=source_choices, default='txscript', help='Source language.')
-    argparser.add_argument('-t', '--target', metavar='TARGET_LANGUAGE', dest='target_lang', choices=target_choices, default='btc', help='Target language.')
+    argparser.add_argument('--passes', dest='passes', metavar='PASSES', type=str, help='Comma-separated passes or pipelines to run instead of those of the optimization level. Prefix a pass with + or - to add it to or remove it from them. Passes: %s. Pipelines: %s.' % (', '.join(sorted(passes)), ', '.join(sorted(pipelines))))
+
+    argparser.add_argument('-s', '--source', metavar='SOURCE_LANGUAGE', dest='source_lang', default='txscript', help='Source language.')
+    argparser.add_argument('-t', '--target', metavar='TARGET_LANGUAGE', dest='target_lang', default='btc', help='Target language.')
 
     argparser.add_argument('-v', '--verbose', nargs='?', action=VAction, dest='verbosity', default=0, help='Verbosity level (Max: %d).' % Verbosity.max_verbosity)
 
+    argparser.add_argument('--profile', dest='profile', choices=['json'], help='Write the time, peak memory and instruction counts of each compilation stage to stderr. Before Python 3.9, peak memory is the increase in peak resident memory of the process (see "memory_measure").')
+    argparser.add_argument('--superopt-db', dest='superopt_db', metavar='DB_FILE', type=str, help='Database of superoptimization results used with -O4 (Default: %s).' % DEFAULT_DB_PATH)
+    argparser.add_argument('--cache-dir', dest='cache_dir', metavar='CACHE_DIR', type=str, help='Cache compilation results in CACHE_DIR.')
+    argparser.add_argument('--cache-size', dest='cache_size', metavar='CACHE_SIZE', type=int, help='Maximum size of the compilation cache in bytes (Default: %d).' % DEFAULT_MAX_SIZE)
+    argparser.add_argument('--batch', dest='batch', metavar='MANIFEST', type=str, help='Compile every file listed in MANIFEST (or matching a glob pattern).')
+    argparser.add_argument('-j', '--jobs', dest='jobs', metavar='JOBS', type=int, help='Number of processes used with --batch (Default: number of CPUs).')
+    argparser.add_argument('--serve', dest='serve', action='store_true', default=False, help='Serve newline-delimited JSON compile requests.')
+    argparser.add_argument('--socket', dest='socket_path', metavar='SOCKET_PATH', type=str, help='Serve requests on a Unix socket instead of stdin.')
+
     args = argparser.parse_args()
 
     def list_languages():
@@ -77,6 +134,11 @@ def main():
     if args.list_langs:
         list_languages()
         argparser.exit(0)
+    elif args.serve:
+        serve(compiler, args)
+        argparser.exit(0)
+    elif args.batch:
+        argparser.exit(0 if batch(args) else 1)
     elif args.source is None:
         argparser.print_usage()
         argparser.exit(1)
@@ -84,16 +146,22 @@ def main():
     s = args.source
     src = [s]
     if os.path.exists(s):
-        with open(s, 'r') as f:
-            src = f.readlines()
+        src, source_lang = read_source_file(s, source_choices)
         # Automatically detect source language from file extension.
-        names = s.split('.')
-        if len(names) > 1 and names[-1] in source_choices:
-            args.source_lang = names[-1]
-
-    compiler.setup_options(args)
-    compiler.compile(src)
+        if source_lang:
+            args.source_lang = source_lang
+
+    try:
+        compiler.setup_options(args)
+        compiler.compile(src)
+    except CompilationError as e:
+        print('Error encountered during compilation of source:')
+        print(e)
+        sys.exit(1)
     print(compiler.output())
+    if compiler.profile is not None:
+        json.dump(compiler.profile, sys.stderr, indent=2, sort_keys=True)
+        sys.stderr.write('\n')
 
 if __name__ == '__main__':
     main()
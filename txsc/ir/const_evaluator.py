@@ -0,0 +1,321 @@
+"""Evaluation of operations on constant values.
+
+ConstEvaluator follows the rules of the script interpreter, so that an
+operation that is evaluated at compile time results in the same stack
+item that executing it would. Numeric operands are script numbers of at
+most four bytes, and numeric results are minimally encoded. Operations
+that would fail when they are executed (e.g. division by zero) are not
+evaluated, so that they still fail.
+
+Opcodes that are disabled in Bitcoin (e.g. OP_CAT and OP_MUL) are
+evaluated as they were originally defined.
+"""
+from functools import wraps
+import hashlib
+
+from txsc.ir import formats
+from txsc.ir.instructions import SerializationError
+from txsc.ir.ripemd160 import ripemd160
+from txsc.ir.structural_visitor import StructuralVisitor
+import txsc.ir.structural_nodes as types
+
+# Maximum size of a numeric operand.
+MAX_NUM_SIZE = 4
+# Maximum size of a stack item.
+MAX_SCRIPT_ELEMENT_SIZE = 520
+# Maximum number of bits that OP_LSHIFT and OP_RSHIFT shift by.
+MAX_SHIFT = 2048
+
+class EvaluationError(Exception):
+    """Exception raised when an operation cannot be evaluated."""
+    pass
+
+def num(data):
+    """Decode data as a numeric operand."""
+    if len(data) > MAX_NUM_SIZE:
+        raise EvaluationError('Numeric operand is longer than %d bytes' % MAX_NUM_SIZE)
+    value = formats.scriptnum_to_int(data)
+    # Operands that are not minimally encoded fail with SCRIPT_VERIFY_MINIMALDATA.
+    if formats.int_to_scriptnum(value) != data:
+        raise EvaluationError('Numeric operand is not minimally encoded')
+    return value
+
+def params(*decoders):
+    """Causes the arguments to a method to be decoded.
+
+    decoders contains a decoder (e.g. num or str) for each argument,
+    or one decoder for all of them.
+    """
+    def method_decorator(method):
+        @wraps(method)
+        def wrapper(self, *args):
+            if len(decoders) == 1:
+                args = map(decoders[0], args)
+            else:
+                args = [decoder(arg) for decoder, arg in zip(decoders, args)]
+            return method(self, *args)
+        return wrapper
+    return method_decorator
+
+def truncate_div(left, right):
+    """Divide, rounding towards zero."""
+    if right == 0:
+        raise EvaluationError('Division by zero')
+    quotient = abs(left) // abs(right)
+    return quotient if (left < 0) == (right < 0) else -quotient
+
+def shift(value, bits):
+    """Shift the magnitude of value by bits (to the right if bits is negative)."""
+    magnitude = abs(value) << bits if bits >= 0 else abs(value) >> -bits
+    return -magnitude if value < 0 else magnitude
+
+def hash_data(name, data):
+    """Hash data with the hash function name."""
+    try:
+        h = hashlib.new(name)
+    except ValueError:
+        # RIPEMD-160 is not available with some versions of OpenSSL.
+        if name == 'ripemd160':
+            return ripemd160(data)
+        raise EvaluationError('Hash function %s is not available' % name)
+    h.update(data)
+    return h.digest()
+
+def same_size(left, right):
+    """Pad the shorter of two byte strings with zeros."""
+    size = max(len(left), len(right))
+    return left.ljust(size, '\x00'), right.ljust(size, '\x00')
+
+class ConstEvaluator(object):
+    """Evaluates expressions containing only constant values.
+
+    Attributes:
+        - enabled (bool): Whether expressions are evaluated.
+        - symbol_table (SymbolTable): Symbol table used to lower inner
+            scripts, which are constant if they contain no assumptions.
+
+    """
+    def __init__(self):
+        self.enabled = True
+        self.symbol_table = None
+
+    def operand_data(self, node):
+        """Get the data that node pushes, or None if it is not constant."""
+        if isinstance(node, types.Push):
+            return formats.hex_to_bytearray(node.data)
+        elif isinstance(node, types.InnerScript):
+            # Inner scripts are pushed as they are lowered.
+            instructions = StructuralVisitor().transform(types.Script(statements=[node]), self.symbol_table)
+            try:
+                return instructions[0].ops.serialize()
+            except SerializationError:
+                # The inner script contains assumptions.
+                return None
+
+    def eval_op(self, op_name, *args):
+        """Evaluate an opcode.
+
+        Returns a Push of the result, or None if the opcode cannot be evaluated.
+        """
+        if not self.enabled:
+            return
+
+        method = getattr(self, op_name, None)
+        if method is None:
+            return
+        operands = map(self.operand_data, args)
+        if any(i is None for i in operands):
+            return
+        try:
+            result = method(*operands)
+        except EvaluationError:
+            return
+        # Numeric and boolean results are script numbers.
+        if isinstance(result, (bool, int, long)):
+            result = formats.int_to_scriptnum(result)
+        if len(result) > MAX_SCRIPT_ELEMENT_SIZE:
+            return
+        return types.Push(result.encode('hex'))
+
+    # Arithmetic.
+
+    @params(num)
+    def OP_1ADD(self, value):
+        return value + 1
+
+    @params(num)
+    def OP_1SUB(self, value):
+        return value - 1
+
+    @params(num)
+    def OP_2MUL(self, value):
+        return shift(value, 1)
+
+    @params(num)
+    def OP_2DIV(self, value):
+        return shift(value, -1)
+
+    @params(num)
+    def OP_NEGATE(self, value):
+        return -value
+
+    @params(num)
+    def OP_ABS(self, value):
+        return abs(value)
+
+    @params(num)
+    def OP_NOT(self, value):
+        return value == 0
+
+    @params(num)
+    def OP_0NOTEQUAL(self, value):
+        return value != 0
+
+    @params(num)
+    def OP_ADD(self, left, right):
+        return left + right
+
+    @params(num)
+    def OP_SUB(self, left, right):
+        return left - right
+
+    @params(num)
+    def OP_MUL(self, left, right):
+        return left * right
+
+    @params(num)
+    def OP_DIV(self, left, right):
+        return truncate_div(left, right)
+
+    @params(num)
+    def OP_MOD(self, left, right):
+        return left - right * truncate_div(left, right)
+
+    @params(num)
+    def OP_LSHIFT(self, value, bits):
+        if not 0 <= bits <= MAX_SHIFT:
+            raise EvaluationError('Invalid shift')
+        return shift(value, bits)
+
+    @params(num)
+    def OP_RSHIFT(self, value, bits):
+        if not 0 <= bits <= MAX_SHIFT:
+            raise EvaluationError('Invalid shift')
+        return shift(value, -bits)
+
+    @params(num)
+    def OP_BOOLAND(self, left, right):
+        return left != 0 and right != 0
+
+    @params(num)
+    def OP_BOOLOR(self, left, right):
+        return left != 0 or right != 0
+
+    @params(num)
+    def OP_NUMEQUAL(self, left, right):
+        return left == right
+
+    @params(num)
+    def OP_NUMNOTEQUAL(self, left, right):
+        return left != right
+
+    @params(num)
+    def OP_LESSTHAN(self, left, right):
+        return left < right
+
+    @params(num)
+    def OP_LESSTHANOREQUAL(self, left, right):
+        return left <= right
+
+    @params(num)
+    def OP_GREATERTHAN(self, left, right):
+        return left > right
+
+    @params(num)
+    def OP_GREATERTHANOREQUAL(self, left, right):
+        return left >= right
+
+    @params(num)
+    def OP_MIN(self, left, right):
+        return min(left, right)
+
+    @params(num)
+    def OP_MAX(self, left, right):
+        return max(left, right)
+
+    @params(num)
+    def OP_WITHIN(self, value, min_, max_):
+        return min_ <= value < max_
+
+    # Splice operations.
+
+    @params(str)
+    def OP_CAT(self, left, right):
+        return left + right
+
+    @params(str, num, num)
+    def OP_SUBSTR(self, s, begin, size):
+        end = begin + size
+        if begin < 0 or end < begin:
+            raise EvaluationError('Invalid substring')
+        return s[begin:end]
+
+    @params(str, num)
+    def OP_LEFT(self, s, size):
+        if size < 0:
+            raise EvaluationError('Invalid size')
+        return s[:size]
+
+    @params(str, num)
+    def OP_RIGHT(self, s, size):
+        if size < 0:
+            raise EvaluationError('Invalid size')
+        return s[max(len(s) - size, 0):]
+
+    @params(str)
+    def OP_SIZE(self, s):
+        return len(s)
+
+    # Bitwise logic.
+
+    @params(str)
+    def OP_INVERT(self, s):
+        return ''.join(chr(~ord(i) & 0xff) for i in s)
+
+    @params(str)
+    def OP_AND(self, left, right):
+        return ''.join(chr(ord(a) & ord(b)) for a, b in zip(*same_size(left, right)))
+
+    @params(str)
+    def OP_OR(self, left, right):
+        return ''.join(chr(ord(a) | ord(b)) for a, b in zip(*same_size(left, right)))
+
+    @params(str)
+    def OP_XOR(self, left, right):
+        return ''.join(chr(ord(a) ^ ord(b)) for a, b in zip(*same_size(left, right)))
+
+    @params(str)
+    def OP_EQUAL(self, left, right):
+        return left == right
+
+    # Crypto.
+
+    @params(str)
+    def OP_RIPEMD160(self, s):
+        return hash_data('ripemd160', s)
+
+    @params(str)
+    def OP_SHA1(self, s):
+        return hash_data('sha1', s)
+
+    @params(str)
+    def OP_SHA256(self, s):
+        return hash_data('sha256', s)
+
+    @params(str)
+    def OP_HASH160(self, s):
+        return hash_data('ripemd160', hash_data('sha256', s))
+
+    @params(str)
+    def OP_HASH256(self, s):
+        return hash_data('sha256', hash_data('sha256', s))
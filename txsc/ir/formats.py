@@ -1,7 +1,6 @@
 """Utility functions to convert values between formats."""
 import binascii
 
-import hexs
 
 from bitcoin.core import _bignum
 from bitcoin.core.script import CScriptOp
@@ -9,9 +8,13 @@ from bitcoin.core.scripteval import _CastToBool
 
 def hex_to_list(s):
     """Create a list of the bytes in s."""
-    s = hexs.format_hex(s)
+    s = make_even(s)
     return [s[i:i+2] for i in range(0, len(s), 2)]
 
+def make_even(s):
+    """Prepend a zero to s (a hex string) if its length is odd."""
+    return '0' + s if len(s) % 2 else s
+
 def int_to_bytearray(value):
     """Encode an integer as a byte array or opcode value."""
     try:
@@ -20,6 +23,14 @@ def int_to_bytearray(value):
         pass
     return _bignum.bn2vch(value)
 
+def int_to_scriptnum(value):
+    """Encode an integer as a minimally-encoded script number."""
+    return _bignum.bn2vch(value)
+
+def scriptnum_to_int(data):
+    """Decode a script number."""
+    return _bignum.vch2bn(data)
+
 def hex_to_bytearray(value):
     """Encode a hex string as a byte array."""
     value = value.replace('0x','').replace('L','')
@@ -1,11 +1,12 @@
-import copy
+from array import array
 
 from bitcoin.core import _bignum
-from bitcoin.core.script import CScriptOp
+from bitcoin.core.script import CScriptOp, OPCODES_BY_NAME
 from bitcoin.core.scripteval import _CastToBool
 
 from txsc.ir import linear_nodes
 from txsc.ir import structural_nodes
+from txsc.ir.stack_index import StackIndex
 
 # Constants for instructions type.
 LINEAR = 1
@@ -17,26 +18,240 @@ def get_instructions_class(instructions_type):
     elif instructions_type == STRUCTURAL:
         return SInstructions
 
+class SerializationError(ValueError):
+    """Exception raised when instructions cannot be encoded as a raw script."""
+    pass
+
 class Instructions(object):
     """Base model for instructions."""
     pass
 
+class SliceView(object):
+    """Copy-on-write view of a slice of linear instructions.
+
+    Reading from a view does not copy anything. The first method that
+    modifies the view copies the slice, so the underlying instructions are
+    never changed. A view is only valid until its instructions are modified.
+    """
+    __slots__ = ('_instructions', '_start', '_end', '_copy')
+
+    def __init__(self, instructions, start, end):
+        self._instructions = instructions
+        self._start = start
+        self._end = min(end, len(instructions))
+        self._copy = None
+
+    def _materialize(self):
+        """Get the copy of the slice, creating it if necessary."""
+        if self._copy is None:
+            self._copy = self._instructions[self._start:self._end]
+        return self._copy
+
+    def __len__(self):
+        if self._copy is not None:
+            return len(self._copy)
+        return max(self._end - self._start, 0)
+
+    def __getitem__(self, key):
+        if self._copy is not None:
+            return self._copy[key]
+        if isinstance(key, slice):
+            return [self[i] for i in xrange(*key.indices(len(self)))]
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError('Instruction index out of range')
+        return self._instructions[self._start + key]
+
+    def __iter__(self):
+        if self._copy is not None:
+            return iter(self._copy)
+        return (self._instructions[i] for i in xrange(self._start, self._end))
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __add__(self, other):
+        return list(self) + list(other)
+
+    def __radd__(self, other):
+        return list(other) + list(self)
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def __setitem__(self, key, value):
+        self._materialize()[key] = value
+
+    def __delitem__(self, key):
+        del self._materialize()[key]
+
+    def __iadd__(self, other):
+        self._materialize().extend(other)
+        return self
+
+    def append(self, value):
+        self._materialize().append(value)
+
+    def extend(self, values):
+        self._materialize().extend(values)
+
+    def insert(self, index, value):
+        self._materialize().insert(index, value)
+
+    def pop(self, index=-1):
+        return self._materialize().pop(index)
+
+    def remove(self, value):
+        self._materialize().remove(value)
+
+    def reverse(self):
+        self._materialize().reverse()
+
+    def sort(self, *args, **kwargs):
+        self._materialize().sort(*args, **kwargs)
+
 class LInstructions(Instructions, list):
-    """Model for linear instructions."""
-    ir_type = LINEAR
+    """Model for linear instructions.
 
-    def __init__(self, *args):
-        # Perform a deep copy if an LInstructions instance is passed.
-        if len(args) == 1 and isinstance(args[0], LInstructions):
-            return super(LInstructions, self).__init__(copy.deepcopy(args[0]))
-        return super(LInstructions, self).__init__(*args)
+    If changes are tracked (see track_changes()), modifications record the
+    ranges of indices that they affect in dirty.
+    """
+    ir_type = LINEAR
+    # Sorted list of [start, end) ranges that have been modified, or None if changes are not tracked.
+    dirty = None
+    # Lowest index that has been modified since this was last set to None, if changes are tracked.
+    first_modified = None
+    # StackIndex of the instructions, if one has been built.
+    stack_index = None
 
     def __str__(self):
         return str(map(str, self))
 
+    def track_changes(self):
+        """Start recording modified ranges, with all instructions marked as modified."""
+        self.dirty = [(0, len(self))]
+
+    def untrack_changes(self):
+        """Stop recording modified ranges."""
+        self.__dict__.pop('dirty', None)
+
+    def build_index(self):
+        """Build a StackIndex of the instructions, which is kept up to date as they are modified."""
+        self.stack_index = StackIndex(self)
+        return self.stack_index
+
+    def drop_index(self):
+        """Stop maintaining the StackIndex of the instructions."""
+        self.__dict__.pop('stack_index', None)
+
+    def _record(self, start, old_end, new_end):
+        """Record that [start : old_end] was replaced with [start : new_end]."""
+        index = self.stack_index
+        if index is not None:
+            if len(index) + new_end - old_end == len(self):
+                index.replace(start, old_end, self[start:new_end])
+            else:
+                # Extended slices may move instructions outside of [start : old_end].
+                index.rebuild(self)
+        if self.dirty is None:
+            return
+        if self.first_modified is None or start < self.first_modified:
+            self.first_modified = start
+        delta = new_end - old_end
+        ranges = []
+        merged_start, merged_end = start, new_end
+        for s, e in self.dirty:
+            if e < start:
+                ranges.append((s, e))
+            elif s > old_end:
+                ranges.append((s + delta, e + delta))
+            else:
+                merged_start = min(merged_start, s)
+                merged_end = max(merged_end, e + delta if e > old_end else new_end)
+        ranges.append((merged_start, merged_end))
+        ranges.sort()
+        self.dirty = ranges
+
+    def _slice_indices(self, key):
+        start, stop, step = key.indices(len(self))
+        if step != 1:
+            return (0, len(self))
+        return (start, max(start, stop))
+
+    def __setitem__(self, key, value):
+        if isinstance(key, slice):
+            start, end = self._slice_indices(key)
+            value = list(value)
+            super(LInstructions, self).__setitem__(key, value)
+            self._record(start, end, start + len(value) if key.step in (None, 1) else end)
+            return
+        super(LInstructions, self).__setitem__(key, value)
+        key = key + len(self) if key < 0 else key
+        self._record(key, key + 1, key + 1)
+
+    def __setslice__(self, i, j, values):
+        self.__setitem__(slice(max(0, i), max(0, j)), values)
+
+    def __delitem__(self, key):
+        if isinstance(key, slice):
+            start, end = self._slice_indices(key)
+            super(LInstructions, self).__delitem__(key)
+            self._record(start, end, start if key.step in (None, 1) else len(self))
+            return
+        super(LInstructions, self).__delitem__(key)
+        key = key + len(self) + 1 if key < 0 else key
+        self._record(key, key + 1, key)
+
+    def __delslice__(self, i, j):
+        self.__delitem__(slice(max(0, i), max(0, j)))
+
+    def __iadd__(self, values):
+        self.extend(values)
+        return self
+
+    def append(self, value):
+        self.insert(len(self), value)
+
+    def extend(self, values):
+        self[len(self):] = values
+
+    def insert(self, index, value):
+        index = index + len(self) if index < 0 else index
+        index = min(max(index, 0), len(self))
+        super(LInstructions, self).insert(index, value)
+        self._record(index, index, index + 1)
+
+    def pop(self, index=-1):
+        index = index + len(self) if index < 0 else index
+        value = self[index]
+        del self[index]
+        return value
+
+    def remove(self, value):
+        del self[self.index(value)]
+
+    def reverse(self):
+        super(LInstructions, self).reverse()
+        self._record(0, len(self), len(self))
+
+    def sort(self, *args, **kwargs):
+        super(LInstructions, self).sort(*args, **kwargs)
+        self._record(0, len(self), len(self))
+
     def copy_slice(self, start, end):
-        """Create a copy of instructions from [start : end]."""
-        return copy.deepcopy(self[start:end])
+        """Create a copy of instructions from [start : end].
+
+        Nodes are not copied, since they are not modified after they are created.
+        """
+        return self[start:end]
+
+    def view_slice(self, start, end):
+        """Create a copy-on-write view of instructions from [start : end]."""
+        return SliceView(self, start, end)
 
     def replace_slice(self, start, end, values):
         """Replace instructions from [start : end] with values."""
@@ -49,17 +264,23 @@ class LInstructions(Instructions, list):
         those in the template push.
         """
         for i in range(len(template)):
-            if not template[i]:
+            template_item = template[i]
+            if template_item is None:
+                continue
+            script_item = self[index + i]
+            # Opcodes are singletons, so identical opcodes are equal.
+            if template_item is script_item:
                 continue
 
-            equal = template[i] == self[index + i]
+            if isinstance(template_item, linear_nodes.OpCode):
+                equal = False
+            else:
+                equal = template_item == script_item
             if strict and not equal:
                 return False
 
             # Non-strict evaluation.
-            template_item = template[i]
-            script_item = self[index + i]
-            if template_item.__class__.__name__ == 'SmallIntOpCode' and isinstance(script_item, linear_nodes.SmallIntOpCode):
+            if template_item.__class__ is linear_nodes.SmallIntOpCode and isinstance(script_item, linear_nodes.SmallIntOpCode):
                 equal = True
             elif isinstance(template_item, linear_nodes.Push) and isinstance(script_item, linear_nodes.Push):
                 equal = True
@@ -70,10 +291,18 @@ class LInstructions(Instructions, list):
         return True
 
     def replace(self, start, length, callback):
-        """Pass [start : length] instructions to callback and replace them with its result."""
+        """Pass [start : length] instructions to callback and replace them with its result.
+
+        callback receives a SliceView of the instructions.
+        """
         end = start + length
-        values = self.copy_slice(start, end)
-        self.replace_slice(start, end, callback(values))
+        values = self.view_slice(start, end)
+        result = callback(values)
+        if result is values:
+            if values._copy is None:
+                return
+            result = values._copy
+        self.replace_slice(start, end, list(result))
 
     def replace_template(self, template, callback, strict=True):
         """Call callback with any instructions matching template."""
@@ -89,6 +318,9 @@ class LInstructions(Instructions, list):
 
     def find_occurrences(self, op):
         """Return all the indices that op occurs at."""
+        # Opcodes are singletons, so they can be found by identity.
+        if isinstance(op, linear_nodes.OpCode):
+            return [i for i, node in enumerate(self) if node is op]
         occurrences = []
         template = [op]
         for i in range(len(self)):
@@ -96,11 +328,164 @@ class LInstructions(Instructions, list):
                 occurrences.append(i)
         return occurrences
 
+    def compact(self):
+        """Get a CompactInstructions instance of these instructions."""
+        return CompactInstructions(self)
+
+# Codes for nodes that are not opcodes. Valid opcodes are below 0xf0.
+PUSH = 0xf0
+ASSUMPTION = 0xf1
+INNER_SCRIPT = 0xf2
+
+# {opcode byte: node class, ...} and {node class: opcode byte, ...}.
+classes_by_code = {PUSH: linear_nodes.Push, ASSUMPTION: linear_nodes.Assumption, INNER_SCRIPT: linear_nodes.InnerScript}
+codes_by_class = dict((cls, code) for code, cls in classes_by_code.items())
+for _cls in linear_nodes.iter_opcode_classes():
+    if _cls.name not in OPCODES_BY_NAME:
+        continue
+    _code = int(OPCODES_BY_NAME[_cls.name])
+    codes_by_class[_cls] = _code
+    # Prefer the canonical name of opcodes that have aliases (e.g. OP_0 instead of OP_FALSE).
+    if _code not in classes_by_code or str(CScriptOp(_code)) == _cls.name:
+        classes_by_code[_code] = _cls
+
+class CompactInstructions(Instructions):
+    """Compact, immutable model for linear instructions.
+
+    Nodes are stored as a stream of opcode bytes, with a parallel array of
+    indices into a table of payloads (push data, assumptions, and inner scripts).
+    Opcodes are singletons, and other nodes are only created when they are accessed.
+
+    Attributes:
+        - codes (array): Opcode byte of each node.
+        - payload_indices (array): Index of each node's payload in payloads, or -1.
+        - payloads (list): Push data, (var_name, depth) tuples of assumptions,
+            and CompactInstructions of inner scripts.
+
+    """
+    ir_type = LINEAR
+
+    def __init__(self, nodes=()):
+        self.codes = array('B')
+        self.payload_indices = array('i')
+        self.payloads = []
+        for node in nodes:
+            self.append_node(node)
+
+    def append_node(self, node):
+        """Append node. Only used while constructing instructions."""
+        code = codes_by_class.get(node.__class__)
+        if code is None:
+            raise TypeError('Cannot store node of type %s' % node.__class__.__name__)
+
+        payload = None
+        if code == PUSH:
+            payload = node.data
+        elif code == ASSUMPTION:
+            payload = (node.var_name, node.depth)
+        elif code == INNER_SCRIPT:
+            payload = node.ops if isinstance(node.ops, CompactInstructions) else CompactInstructions(node.ops)
+        if payload is None:
+            self.payload_indices.append(-1)
+        else:
+            self.payload_indices.append(len(self.payloads))
+            self.payloads.append(payload)
+        self.codes.append(code)
+
+    def node(self, i):
+        """Get the node at index i."""
+        code = self.codes[i]
+        cls = classes_by_code[code]
+        payload_index = self.payload_indices[i]
+        if payload_index < 0:
+            return cls()
+        payload = self.payloads[payload_index]
+        if code == PUSH:
+            return cls(data=payload)
+        elif code == ASSUMPTION:
+            return cls(var_name=payload[0], depth=payload[1])
+        return cls(ops=payload)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return CompactInstructions(self.node(i) for i in xrange(*key.indices(len(self))))
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError('Instruction index out of range')
+        return self.node(key)
+
+    def __iter__(self):
+        for i in xrange(len(self)):
+            yield self.node(i)
+
+    def __str__(self):
+        return str(map(str, self))
+
+    def __eq__(self, other):
+        if isinstance(other, CompactInstructions):
+            return (self.codes == other.codes and self.payload_indices == other.payload_indices
+                    and self.payloads == other.payloads)
+        if isinstance(other, (list, tuple)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __getstate__(self):
+        return (self.codes.tostring(), self.payload_indices.tostring(), self.payloads)
+
+    def __setstate__(self, state):
+        codes, payload_indices, self.payloads = state
+        self.codes = array('B', codes)
+        self.payload_indices = array('i', payload_indices)
+
+    def names(self):
+        """Get the names of the nodes without creating them."""
+        return [classes_by_code[code].name for code in self.codes]
+
+    def compact(self):
+        return self
+
+    def expand(self):
+        """Get an LInstructions instance of these instructions."""
+        return LInstructions(list(self))
+
+    def serialize(self):
+        """Encode the instructions as a raw script.
+
+        Raises SerializationError if the instructions contain assumptions.
+        """
+        data = []
+        for code, payload_index in zip(self.codes, self.payload_indices):
+            if code == PUSH:
+                data.append(CScriptOp.encode_op_pushdata(self.payloads[payload_index]))
+            elif code == INNER_SCRIPT:
+                data.append(CScriptOp.encode_op_pushdata(self.payloads[payload_index].serialize()))
+            elif code == ASSUMPTION:
+                raise SerializationError('Cannot serialize assumption of "%s"' % self.payloads[payload_index][0])
+            else:
+                data.append(chr(code))
+        return b''.join(data)
+
 class SInstructions(Instructions):
     """Model for structural instructions."""
     ir_type = STRUCTURAL
     def __init__(self, script=structural_nodes.Script()):
         self.script = script
 
+    def __getstate__(self):
+        # Nodes are pickled with their children first, so that pickling
+        # a node refers to its children instead of recursing into them.
+        return (structural_nodes.postorder(self.script), self.script)
+
+    def __setstate__(self, state):
+        _, self.script = state
+
     def dump(self, *args):
         return self.script.dump(*args)
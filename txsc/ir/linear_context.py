@@ -1,32 +1,45 @@
+from bisect import bisect_right
 from collections import defaultdict
 
 from txsc.transformer import BaseTransformer
 from txsc.ir import formats
 from txsc.ir.instructions import LInstructions
+from txsc.ir import stack_index
+from txsc.ir.stack_scheduler import StackScheduler, ScheduleError
 import txsc.ir.linear_nodes as types
+from txsc.profiler import null_profiler
 
 class LinearContextualizer(BaseTransformer):
-    """Populates metadata attributes of linear IR instructions."""
-    @staticmethod
-    def instruction_to_int(op):
-        """Get the integer value that op (a nullary opcode) pushes."""
-        if isinstance(op, types.SmallIntOpCode):
-            return op.value
-        elif isinstance(op, types.Push):
-            return formats.bytearray_to_int(op.data)
+    """Determines facts about the positions of linear IR instructions.
+
+    Nodes are shared between positions, so these facts are stored in lists
+    that are parallel to the instructions.
+
+    Attributes:
+        - args (list): The relative indices of nodes that each node affects.
+        - deltas (list): The number of stack items that each node adds (or consumes).
+        - multisig_counts (dict): (num_pubkeys, num_sigs) of multisig opcodes by index.
+
+    """
+    instruction_to_int = staticmethod(stack_index.instruction_to_int)
 
     def __init__(self):
         # {assumption_name: [occurrence_index, ...], ...}
         self.assumptions = defaultdict(list)
+        self.instructions = []
+        self.args = []
+        self.deltas = []
+        self.multisig_counts = {}
 
     def following_occurrences(self, assumption_name, idx):
         """Get the number of occurrences of assumption_name after idx."""
-        return len(filter(lambda i: i > idx, self.assumptions[assumption_name]))
+        occurrences = self.assumptions[assumption_name]
+        return len(occurrences) - bisect_right(occurrences, idx)
 
-    def nextop(self, op):
-        """Get the operation that follows op."""
+    def nextop(self, idx):
+        """Get the operation that follows the one at idx."""
         try:
-            return self.instructions[op.idx + 1]
+            return self.instructions[idx + 1]
         except IndexError:
             return None
 
@@ -39,66 +52,85 @@ class LinearContextualizer(BaseTransformer):
         if not isinstance(instructions, LInstructions):
             raise TypeError('A LInstructions instance is required')
         self.assumptions.clear()
+        self.multisig_counts.clear()
         self.instructions = instructions
+        self.args = [getattr(i, 'args', []) for i in instructions]
+        self.deltas = [i.delta for i in instructions]
 
-        for i, instruction in enumerate(iter(instructions)):
-            instruction.idx = i
-            self.visit(instruction)
+        for i, instruction in enumerate(instructions):
+            self.visit(instruction, i)
 
-    def visit(self, instruction):
+    def visit(self, instruction, idx):
         method = getattr(self, 'visit_%s' % instruction.__class__.__name__, None)
         if not method:
             return
-        return method(instruction)
+        return method(instruction, idx)
 
-    def visit_Assumption(self, op):
-        self.assumptions[op.var_name].append(op.idx)
+    def visit_Assumption(self, op, idx):
+        self.assumptions[op.var_name].append(idx)
 
-    def visit_CheckMultiSig(self, op):
+    def visit_CheckMultiSig(self, op, idx):
         """Attempt to determine opcode arguments."""
         i = 1
-        num_pubkeys = self.instruction_to_int(self.instructions[op.idx - i])
+        num_pubkeys = self.instruction_to_int(self.instructions[idx - i])
         if num_pubkeys is None:
             return
 
         i += 1
         i += num_pubkeys
-        num_sigs = self.instruction_to_int(self.instructions[op.idx - i])
+        num_sigs = self.instruction_to_int(self.instructions[idx - i])
         if num_sigs is None:
             return
 
         i += 1
         i += num_sigs
 
-        op.num_pubkeys = num_pubkeys
-        op.num_sigs = num_sigs
-        op.args = range(i)
+        self.multisig_counts[idx] = (num_pubkeys, num_sigs)
+        self.args[idx] = range(i)
 
-    def visit_CheckMultiSigVerify(self, op):
-        return self.visit_CheckMultiSig(op)
+    def visit_CheckMultiSigVerify(self, op, idx):
+        return self.visit_CheckMultiSig(op, idx)
 
-    def visit_IfDup(self, op):
+    def visit_IfDup(self, op, idx):
         """Attempt to determine opcode's delta."""
-        arg = self.instruction_to_int(self.instructions[op.idx - 1])
+        arg = self.instruction_to_int(self.instructions[idx - 1])
         if arg is None:
             return
 
-        op.delta = 1 if arg else 0
+        self.deltas[idx] = 1 if arg else 0
 
-    def visit_Pick(self, op):
+    def visit_Pick(self, op, idx):
         """Attempt to determine opcode argument."""
-        arg = self.instruction_to_int(self.instructions[op.idx - 1])
+        arg = self.instruction_to_int(self.instructions[idx - 1])
         if arg is None:
             return
 
-        op.args = [1, arg + 2]
+        self.args[idx] = [1, arg + 2]
 
-    def visit_Roll(self, op):
+    def visit_Roll(self, op, idx):
         """Attempt to determine opcode argument."""
-        return self.visit_Pick(op)
+        return self.visit_Pick(op, idx)
 
 class LinearInliner(BaseTransformer):
-    """Replaces variables with stack operations."""
+    """Replaces variables with stack operations.
+
+    If peephole optimization is enabled, a StackScheduler plans the stack
+    operations for the whole script. Otherwise, or if the scheduler cannot
+    model the script, each assumption is replaced with OP_PICK or OP_ROLL.
+
+    Inlining is a single forward pass. The total delta of the instructions
+    before the current one, and the number of occurrences of each assumption
+    after it, are looked up in a StackIndex that is kept up to date as the
+    instructions are modified.
+    """
+    def __init__(self, profiler=null_profiler):
+        super(LinearInliner, self).__init__()
+        self.profiler = profiler
+        self.instructions = []
+        self.index = None
+        # {name: stack height at which a shared result was produced, ...}
+        self.shared_results = {}
+
     @classmethod
     def op_for_int(self, value):
         """Get a small int or push operation for value."""
@@ -110,78 +142,118 @@ class LinearInliner(BaseTransformer):
 
     def total_delta(self, idx):
         """Get the total delta of script operations before idx."""
-        return sum(i.delta for i in self.instructions[:idx])
-
-    def inline(self, instructions, contextualizer, peephole_optimizer):
-        """Perform inlining of variables in instructions.
+        total = self.index.height(idx)
+        if total is None:
+            raise SyntaxError('Cannot inline assumption: The stack height depends on execution')
+        return total
 
-        Inlining is performed by iterating through each instruction and
-        calling visitor methods. If no result is returned, the next
-        instruction is visited.
+    def nextop(self, idx):
+        """Get the operation that follows the one at idx."""
+        try:
+            return self.instructions[idx + 1]
+        except IndexError:
+            return None
 
-        If there is a result, the instruction is replaced with that result,
-        and the iteration begins again.
+    def inline(self, instructions, peephole_optimizer):
+        """Perform inlining of variables in instructions.
 
-        Inlining ends when all instructions have been iterated over without
-        any result.
+        Instructions are visited in order. If a visitor method returns a
+        result, the instruction is replaced with that result, and the pass
+        resumes at the first instruction of the result. Peephole
+        optimizations are performed once all instructions have been visited,
+        since performing them after every replacement is quadratic.
         """
         if not isinstance(instructions, LInstructions):
             raise TypeError('A LInstructions instance is required')
         self.instructions = instructions
-        self.contextualizer = contextualizer
 
-        # Loop until no inlining can be done.
-        while 1:
+        peephole_optimizer.optimize(instructions)
+        peephole_optimizer.remove_trailing_verifications(instructions)
+        if peephole_optimizer.enabled and self.schedule(instructions):
             peephole_optimizer.optimize(instructions)
-            self.contextualizer.contextualize(instructions)
-            inlined = False
-            for i, node in enumerate(instructions):
-                result = self.visit(node)
-                if result is None:
-                    continue
-                if not isinstance(result, list):
-                    result = [result]
-
-                instructions.replace_slice(i, i+1, result)
-                inlined = True
-                break
-
-            if not inlined:
-                break
+            return
 
-    def visit_consecutive_assumptions(self, assumptions):
-        """Handle a row of consecutive assumptions."""
+        self.shared_results = {}
+        # Every instruction is optimized afterwards, so recording the ranges
+        # that are modified would only slow down replacements.
+        instructions.untrack_changes()
+        self.index = instructions.build_index()
+        try:
+            i = 0
+            while i < len(instructions):
+                with self.profiler.stage('LinearInliner', instructions):
+                    result = self.visit(instructions[i], i)
+                    if result is None:
+                        i += 1
+                        continue
+                    if not isinstance(result, list):
+                        result = [result]
+                    instructions.replace_slice(i, i+1, result)
+        finally:
+            instructions.drop_index()
+            self.index = None
+        peephole_optimizer.optimize(instructions)
+
+    def schedule(self, instructions):
+        """Replace assumptions using a StackScheduler.
+
+        Returns whether the scheduler could model instructions.
+        """
+        with self.profiler.stage('StackScheduler', instructions):
+            try:
+                result = StackScheduler().schedule(instructions)
+            except ScheduleError:
+                return False
+            instructions.replace_slice(0, len(instructions), result)
+        return True
+
+    def visit_consecutive_assumptions(self, assumptions, idx):
+        """Handle a row of consecutive assumptions that starts at idx."""
         # If the first assumption's delta is 0 and the depths are sequential,
         # then nothing needs to be done.
-        if self.total_delta(assumptions[0].idx) == 0:
+        if self.total_delta(idx) == 0:
             # http://stackoverflow.com/questions/28885455/python-check-whether-list-is-sequential-or-not
             iterator = (i.depth for i in reversed(assumptions))
             if all(a == b for a, b in enumerate(iterator, next(iterator) + 1)):
                 return []
 
-    def visit(self, instruction):
+    def visit(self, instruction, idx):
         method = getattr(self, 'visit_%s' % instruction.__class__.__name__, None)
         if not method:
             return
-        return method(instruction)
+        return method(instruction, idx)
 
-    def visit_Assumption(self, op):
+    def visit_Assumption(self, op, idx):
+        if op.depth is None:
+            return self.visit_shared_result(op, idx)
         # Detect whether there are multiple assumptions in a row.
         assumptions = [op]
         while 1:
-            nextop = self.contextualizer.nextop(assumptions[-1])
-            if not isinstance(nextop, types.Assumption) or nextop.depth != assumptions[-1].depth - 1:
+            nextop = self.nextop(idx + len(assumptions) - 1)
+            if not isinstance(nextop, types.Assumption) or nextop.depth is None or nextop.depth != assumptions[-1].depth - 1:
                 break
             assumptions.append(nextop)
         if len(assumptions) > 1:
-            result = self.visit_consecutive_assumptions(assumptions)
+            result = self.visit_consecutive_assumptions(assumptions, idx)
             if result is not None:
                 return result
 
         # If there are no consecutive assumptions, use opcodes to bring this assumption to the top.
-        arg = self.op_for_int(self.total_delta(op.idx) + op.depth)
+        arg = self.op_for_int(self.total_delta(idx) + op.depth)
 
         # Use OP_PICK if there are other occurrences after this one.
-        opcode = types.Pick if self.contextualizer.following_occurrences(op.var_name, op.idx) > 0 else types.Roll
+        opcode = types.Pick if self.index.occurrences_after(op.var_name, idx) > 0 else types.Roll
         return [arg, opcode()]
 
+    def visit_shared_result(self, op, idx):
+        """Handle an occurrence of a shared result.
+
+        The first occurrence names the item on top of the stack, and
+        the others refer to it.
+        """
+        if op.var_name not in self.shared_results:
+            self.shared_results[op.var_name] = self.total_delta(idx)
+            return []
+        arg = self.op_for_int(self.total_delta(idx) - self.shared_results[op.var_name])
+        opcode = types.Pick if self.index.occurrences_after(op.var_name, idx) > 0 else types.Roll
+        return [arg, opcode()]
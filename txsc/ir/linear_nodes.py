@@ -1,7 +1,9 @@
 """Node types for linear representation.
 
-Most attributes of these do not need to be supplied by the
-caller. They will be determined automatically during contextualization.
+Opcode nodes are immutable, and there is one instance of each opcode
+class (e.g. types.Add() is types.Add()). Facts that depend on the position
+of a node in a script, such as its index or the arguments of OP_PICK, are
+determined by LinearContextualizer instead of being stored on the node.
 """
 import inspect
 import sys
@@ -12,20 +14,18 @@ class Node(object):
     Attributes:
         - name (str): Operation name.
         - delta (int): The number of stack items that this node adds (or consumes).
-        - idx (int): This node's index in the script.
         - comparators (tuple): Tuple of attributes that should be used when comparing
             two nodes of this type.
 
     """
+    __slots__ = ()
     name = ''
     delta = 0
-    idx = -1
     comparators = ('name',)
-    def __init__(self, delta=None):
-        if isinstance(delta, int):
-            self.delta = delta
 
     def __eq__(self, other):
+        if self is other:
+            return True
         same_values = all(getattr(other, attr) == getattr(self, attr) for attr in self.comparators)
         return isinstance(other, self.__class__) and same_values
 
@@ -34,21 +34,19 @@ class Node(object):
 
 class InnerScript(Node):
     """A script contained inside a script."""
+    __slots__ = ('ops',)
     name = 'innerscript'
-    ops = None
+    delta = 1
     comparators = Node.comparators + ('ops',)
-    def __init__(self, ops=None, **kwargs):
-        kwargs['delta'] = 1
-        super(InnerScript, self).__init__(**kwargs)
+    def __init__(self, ops=None):
         self.ops = ops if ops is not None else []
 
 class Assumption(Node):
     """Assumption that a stack value exists."""
+    __slots__ = ('var_name', 'depth')
     name = 'assume'
-    var_name = ''
     comparators = Node.comparators + ('var_name', 'depth',)
-    def __init__(self, var_name='', depth=-1, **kwargs):
-        super(Assumption, self).__init__(**kwargs)
+    def __init__(self, var_name='', depth=-1):
         self.var_name = var_name
         self.depth = depth
 
@@ -56,12 +54,11 @@ class Assumption(Node):
         return 'assume(%s)'%self.var_name
 
 class Push(Node):
+    __slots__ = ('data',)
     name = 'push'
+    delta = 1
     comparators = Node.comparators + ('data',)
-    def __init__(self, data=None, **kwargs):
-        kwargs['delta'] = 1
-
-        super(Push, self).__init__(**kwargs)
+    def __init__(self, data=None):
         self.data = data
 
     def __str__(self):
@@ -70,16 +67,34 @@ class Push(Node):
 class OpCode(Node):
     """An opcode.
 
+    Instances are immutable singletons: Calling an opcode class always
+    returns the same instance.
+
     Attributes:
         - verifier (bool): Whether this opcode performs verification.
-        - args (list): The relative indices of nodes that this opcode affects.
+        - args (list): The relative indices of nodes that this opcode affects,
+            if they do not depend on the script.
 
     """
+    __slots__ = ()
     verifier = False
-    args = None
-    def __init__(self, **kwargs):
-        super(OpCode, self).__init__(**kwargs)
-        self.args = kwargs.get('args', [])
+    args = []
+    def __new__(cls):
+        # Look up the instance in cls.__dict__ so that subclasses get their own instance.
+        instance = cls.__dict__.get('_instance')
+        if instance is None:
+            instance = super(OpCode, cls).__new__(cls)
+            cls._instance = instance
+        return instance
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (self.__class__, ())
 
     def __str__(self):
         return str(self.name)
@@ -102,10 +117,12 @@ class OpCode(Node):
 
 class SmallIntOpCode(OpCode):
     """Small integer opcode."""
+    __slots__ = ()
     value = 0
     comparators = OpCode.comparators + ('value',)
 
 def _smallint(cls_name, num, **kwargs):
+    kwargs['__slots__'] = ()
     kwargs['delta'] = 1
     kwargs['name'] = 'OP_%d' % num
     kwargs['value'] = num
@@ -131,6 +148,7 @@ Sixteen = _smallint('Sixteen', 16)
 
 def _opcode(cls_name, delta, name, **kwargs):
     """Create an OpCode subclass."""
+    kwargs['__slots__'] = ()
     kwargs['delta'] = delta
     kwargs['name'] = name
     return type(cls_name, (OpCode,), kwargs)
@@ -154,8 +172,10 @@ def _ternary_opcode(*args, **kwargs):
 
 # TODO.
 class False_(Zero):
+    __slots__ = ()
     name = 'OP_FALSE'
 class True_(One):
+    __slots__ = ()
     name = 'OP_TRUE'
 NegativeOne = _opcode('NegativeOne', 1, 'OP_1NEGATE')
 
@@ -258,11 +278,11 @@ CheckSigVerify = _binary_opcode('CheckSigVerify', -2, 'OP_CHECKSIGVERIFY', verif
 
 # TODO: Relative arg indices of CheckMultiSig and CheckMultiSigVerify can only be guaranteed during execution.
 class CheckMultiSig(OpCode):
+    __slots__ = ()
     name = 'OP_CHECKMULTISIG'
-    num_pubkeys = -1
-    num_sigs = -1
 
 class CheckMultiSigVerify(CheckMultiSig):
+    __slots__ = ()
     name = 'OP_CHECKMULTISIGVERIFY'
     verifier = True
 
@@ -1,138 +1,95 @@
 """Script optimizations."""
-import itertools
+import os
 
-from txsc.ir.linear_context import LinearContextualizer, LinearInliner
+from txsc.ir.linear_context import LinearInliner
+from txsc.ir.rule_matcher import Rule, RuleMatcher, load_rules
 import txsc.ir.linear_nodes as types
+from txsc.language import iter_entry_points, load_spec
+from txsc.profiler import null_profiler
 
+# Rule file of the built-in peephole rules.
+RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'peephole.rules')
+# Entry point group of plugins that provide peephole rules.
+RULES_ENTRY_POINT_GROUP = 'txsc.peephole'
+
+# Functions that perform peephole optimizations on instructions.
 peephole_optimizers = []
+# Functions that return peephole rules.
+peephole_rule_sets = []
+# RuleMatcher of all peephole rules.
+_matcher = None
 
 def peephole(func):
     """Decorator for peephole optimizers."""
     peephole_optimizers.append(func)
     return func
 
-def permutations(nodes):
-    """Return permutations of nodes."""
-    return [list(i) for i in itertools.permutations(nodes, len(nodes))]
+def peephole_rules(func):
+    """Decorator for functions that return a list of peephole rules.
 
-@peephole
-def merge_op_and_verify(instructions):
+    The functions are called once, when the rules are compiled. Rules of
+    functions that are decorated first have priority.
+    """
+    global _matcher
+    peephole_rule_sets.append(func)
+    _matcher = None
+    return func
+
+def iter_plugin_rule_sets():
+    """Yield (name, function) for the peephole rule functions of plugins.
+
+    Plugins register functions that return lists of rules in the txsc.peephole
+    entry point group (e.g. functions that call rule_matcher.load_rules()).
+    """
+    for name, spec in iter_entry_points(RULES_ENTRY_POINT_GROUP):
+        yield name, load_spec(spec)
+
+def get_matcher():
+    """Get the RuleMatcher of all peephole rules.
+
+    The rules are compiled once. Rules of plugins have lower priority
+    than those of txsc.
+    """
+    global _matcher
+    if _matcher is None:
+        matcher = RuleMatcher()
+        rule_sets = [(func.__name__, func) for func in peephole_rule_sets]
+        for name, func in rule_sets + list(iter_plugin_rule_sets()):
+            for rule in func():
+                rule.name = rule.name or name
+                matcher.add(rule)
+        _matcher = matcher
+    return _matcher
+
+@peephole_rules
+def merge_op_and_verify():
     """Merge opcodes with a corresponding *VERIFY form.
 
     e.g. OP_EQUAL OP_VERIFY -> OP_EQUALVERIFY
     """
-    optimizations = []
+    rules = []
     for op in types.iter_opcode_classes():
         if op.name.endswith('VERIFY') and op.name != 'OP_VERIFY':
             base_op = types.opcode_by_name(op.name[:-6])
             if not base_op:
                 continue
-            template = [base_op(), types.Verify()]
-            optimizations.append((template, [op()]))
-
-    for template, replacement in optimizations:
-        callback = lambda values, replacement=replacement: replacement
-        instructions.replace_template(template, callback)
-
-@peephole
-def replace_repeated_ops(instructions):
-    """Replace repeated opcodes with single opcodes."""
-    optimizations = [
-        # OP_DROP OP_DROP -> OP_2DROP
-        ([types.Drop(), types.Drop()], [types.TwoDrop()]),
-    ]
-    for template, replacement in optimizations:
-        callback = lambda values, replacement=replacement: replacement
-        instructions.replace_template(template, callback)
-
-@peephole
-def optimize_stack_ops(instructions):
-    """Optimize stack operations."""
-    for template, replacement in [
-        # OP_1 OP_PICK -> OP_OVER
-        ([types.One(), types.Pick()], [types.Over()]),
-        # OP_1 OP_ROLL OP_DROP -> OP_NIP
-        ([types.One(), types.Roll(), types.Drop()], [types.Nip()]),
-        # OP_0 OP_PICK -> OP_DUP
-        ([types.Zero(), types.Pick()], [types.Dup()]),
-        # OP_0 OP_ROLL -> _
-        ([types.Zero(), types.Roll()], []),
-        # OP_1 OP_ROLL OP_1 OP_ROLL -> _
-        ([types.One(), types.Roll(), types.One(), types.Roll()], []),
-        # OP_1 OP_ROLL -> OP_SWAP
-        ([types.One(), types.Roll()], [types.Swap()]),
-    ]:
-        callback = lambda values, replacement=replacement: replacement
-        instructions.replace_template(template, callback)
-
-@peephole
-def replace_shortcut_ops(instructions):
-    """Replace opcodes with a corresponding shortcut form."""
-    optimizations = []
-    # Replace division by 2.
-    optimizations.append(([types.Two(), types.Div()], lambda values: [types.Div2()]))
-    # Replace subtraction by 1.
-    optimizations.append(([types.One(), types.Sub()], lambda values: [types.Sub1()]))
-    # Replace 1 * -1 with -1.
-    optimizations.append(([types.One(), types.Negate()], lambda values: [types.NegativeOne()]))
-    # Replace addition by 1.
-    for permutation in permutations([types.Push(), types.One()]):
-        idx = 0 if isinstance(permutation[0], types.Push) else 1
-        optimizations.append((permutation + [types.Add()], lambda values, idx=idx: [values[idx], types.Add1()]))
-    for permutation in permutations([types.SmallIntOpCode(), types.One()]):
-        idx = 0 if not isinstance(permutation[0], types.One) else 1
-        optimizations.append((permutation + [types.Add()], lambda values, idx=idx: [values[idx], types.Add1()]))
-    # Replace multiplication by 2.
-    for permutation in permutations([types.Push(), types.Two()]):
-        idx = 0 if isinstance(permutation[0], types.Push) else 1
-        optimizations.append((permutation + [types.Mul()], lambda values, idx=idx: [values[idx], types.Mul2()]))
-    for permutation in permutations([types.SmallIntOpCode(), types.Two()]):
-        idx = 0 if not isinstance(permutation[0], types.Two) else 1
-        optimizations.append((permutation + [types.Mul()], lambda values, idx=idx: [values[idx], types.Mul2()]))
-
-
-    for template, callback in optimizations:
-        instructions.replace_template(template, callback, strict=False)
-
-@peephole
-def replace_null_ops(instructions):
-    """Replace operations that do nothing."""
-    # Remove subtraction by 0.
-    optimizations = [([types.Zero(), types.Sub()], lambda values: [])]
-    # Remove addition by 0.
-    for permutation in permutations([None, types.Zero()]):
-        idx = 0 if permutation[0] is None else 1
-        optimizations.append((permutation + [types.Add()], lambda values, idx=idx: [values[idx]]))
-
-    for template, callback in optimizations:
-        instructions.replace_template(template, callback)
-
-@peephole
-def optimize_dup_and_checksig(instructions):
-    for template, callback in [
-        ([types.Dup(), None, types.CheckSig()], lambda values: values[1:]),
-    ]:
-        instructions.replace_template(template, callback)
+            rules.append(Rule([base_op(), types.Verify()], [op()]))
+    return rules
 
-@peephole
-def optimize_hashes(instructions):
-    for template, replacement in [
-        # OP_SHA256 OP_SHA256 -> OP_HASH256
-        ([types.Sha256(), types.Sha256()], [types.Hash256()]),
-        # OP_SHA256 OP_RIPEMD160 -> OP_HASH160
-        ([types.Sha256(), types.RipeMD160()], [types.Hash160()]),
-    ]:
-        callback = lambda values, replacement=replacement: replacement
-        instructions.replace_template(template, callback)
+@peephole_rules
+def builtin_rules():
+    """Rules of the rule file that is included with txsc."""
+    return load_rules(RULES_FILE)
 
 @peephole
-def remove_trailing_verifications(instructions):
-    """Remove any trailing OP_VERIFY occurrences.
+def remove_trailing_dup_verify(instructions):
+    """Remove a trailing OP_DUP OP_VERIFY.
 
-    A trailing OP_VERIFY is redundant since a truthy value
-    is required for a script to pass.
+    The duplicated value is left on top of the stack, and a
+    truthy value is required for a script to pass.
     """
-    while len(instructions) and isinstance(instructions[-1], types.Verify):
+    while len(instructions) > 1 and isinstance(instructions[-2], types.Dup) and isinstance(instructions[-1], types.Verify):
+        instructions.pop(-1)
         instructions.pop(-1)
 
 @peephole
@@ -146,39 +103,54 @@ def promote_return(instructions):
     instructions.insert(0, types.Return())
 
 class PeepholeOptimizer(object):
-    """Performs peephole optimization on the linear IR."""
-    MAX_PASSES = 5
-    def __init__(self, enabled=True):
+    """Performs peephole optimization on the linear IR.
+
+    The first optimization of instructions starts tracking their changes
+    (see LInstructions.track_changes()). Later optimizations of the same
+    instructions only examine the ranges that have changed since.
+    """
+    def __init__(self, enabled=True, profiler=null_profiler):
         self.enabled = enabled
+        self.profiler = profiler
 
-    def optimize(self, instructions, max_passes=-1):
+    def optimize(self, instructions):
         if not self.enabled:
             return
-        if max_passes == -1:
-            max_passes = self.MAX_PASSES
-
-        pass_number = 0
-        while 1:
-            if pass_number > max_passes:
-                break
-
-            state = str(instructions)
+        if instructions.dirty is None:
+            instructions.track_changes()
+
+        matcher = get_matcher()
+        # Run until no optimization modifies instructions.
+        while instructions.dirty:
+            with self.profiler.stage('peephole_rules', instructions):
+                matcher.apply(instructions)
             for func in peephole_optimizers:
-                func(instructions)
-            new = str(instructions)
-
-            pass_number += 1
-
-            if state == new:
-                break
+                with self.profiler.stage(func.__name__, instructions):
+                    func(instructions)
+
+    def remove_trailing_verifications(self, instructions):
+        """Remove any trailing OP_VERIFY occurrences.
+
+        A trailing OP_VERIFY is redundant since a truthy value is required
+        for a script to pass. That is only the case if it is the last
+        statement of the script, so this must be done before assumptions
+        are replaced: An assumption of the item on top of the stack is
+        replaced with nothing, which would leave an earlier OP_VERIFY last.
+        """
+        if not self.enabled:
+            return
+        while len(instructions) and isinstance(instructions[-1], types.Verify):
+            instructions.pop(-1)
 
 class LinearOptimizer(object):
     """Performs optimizations on the linear IR."""
+    def __init__(self, profiler=null_profiler):
+        self.profiler = profiler
+
     def optimize(self, instructions, peephole=True, inline=True):
-        self.peephole_optimizer = PeepholeOptimizer(peephole)
+        self.peephole_optimizer = PeepholeOptimizer(peephole, self.profiler)
         if inline:
-            contextualizer = LinearContextualizer()
-            inliner = LinearInliner()
-            inliner.inline(instructions, contextualizer, self.peephole_optimizer)
+            inliner = LinearInliner(self.profiler)
+            inliner.inline(instructions, self.peephole_optimizer)
 
         self.peephole_optimizer.optimize(instructions)
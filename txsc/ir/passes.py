@@ -0,0 +1,278 @@
+"""Compilation passes and the pass manager.
+
+A pass transforms instructions of one intermediate representation (its
+input_ir) into instructions of the same or another one (its output_ir).
+Passes are registered with the @register_pass decorator.
+
+A pipeline is a list of pass names. Passes that operate on the structural
+IR always run before the lowering pass, and passes that operate on the
+linear IR always run after it; otherwise passes run in the order they are
+listed. Required passes run even if they are not listed.
+"""
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from txsc.ir.instructions import CompactInstructions, LINEAR, STRUCTURAL
+from txsc.ir.linear_context import LinearInliner
+from txsc.ir.linear_optimizer import PeepholeOptimizer, get_matcher
+from txsc.ir.structural_cse import StructuralCSE
+from txsc.ir.structural_optimizer import StructuralOptimizer
+from txsc.ir.structural_visitor import StructuralVisitor
+from txsc.ir.superoptimizer import SEARCH_VERSION, Superoptimizer, SuperoptimizerDatabase
+from txsc.profiler import null_profiler
+
+# {name: Pass subclass, ...}
+passes = {}
+
+def register_pass(cls):
+    """Decorator for passes."""
+    passes[cls.name] = cls
+    return cls
+
+# Named pipelines. 'O<n>' is the pipeline of optimization level n.
+pipelines = {
+    'O0': ['lower', 'inline'],
+    'O1': ['lower', 'inline', 'peephole'],
+    'O2': ['structural-optimize', 'structural-cse', 'lower', 'inline', 'peephole'],
+    'O3': ['structural-evaluate', 'structural-cse', 'lower', 'inline', 'peephole'],
+    'O4': ['structural-evaluate', 'structural-cse', 'lower', 'inline', 'peephole', 'superoptimize'],
+}
+
+class PassContext(object):
+    """State that passes share during a compilation.
+
+    Attributes:
+        - symbol_table (SymbolTable): Symbol table of the source.
+        - profiler: Profiler that records the stages of compilation.
+        - pass_names (list): Names of the passes in the pipeline.
+        - state_key (str): Cache key of the current instructions, if pass
+            results are cached. It is derived from the input of the first pass
+            and the passes that have run since.
+        - superoptimizer_db (str): Path of the superoptimizer's database
+            (Default: superoptimizer.DEFAULT_DB_PATH).
+
+    """
+    def __init__(self, symbol_table=None, profiler=null_profiler, pass_names=None):
+        self.symbol_table = symbol_table
+        self.profiler = profiler
+        self.pass_names = pass_names or []
+        self.state_key = None
+        self.superoptimizer_db = None
+
+class Pass(object):
+    """A compilation pass.
+
+    Attributes:
+        - name (str): Name that the pass is referred to by.
+        - input_ir: Type of instructions that the pass operates on.
+        - output_ir: Type of instructions that the pass produces.
+        - required (bool): Whether the pass runs even if it is not in a pipeline.
+        - cacheable (bool): Whether the results of the pass can be cached.
+
+    """
+    name = ''
+    input_ir = LINEAR
+    output_ir = LINEAR
+    required = False
+    cacheable = True
+
+    def cache_token(self, context):
+        """Get a string of any options (besides its input) that the result of the pass depends on."""
+        return ''
+
+    def run(self, instructions, context):
+        """Run the pass and return the resulting instructions."""
+        raise NotImplementedError()
+
+@register_pass
+class StructuralOptimizePass(Pass):
+    """Optimize the structural IR."""
+    name = 'structural-optimize'
+    input_ir = output_ir = STRUCTURAL
+    evaluate_expressions = False
+
+    def run(self, instructions, context):
+        StructuralOptimizer().optimize(instructions, context.symbol_table, self.evaluate_expressions)
+        return instructions
+
+@register_pass
+class StructuralEvaluatePass(StructuralOptimizePass):
+    """Optimize the structural IR and evaluate constant expressions."""
+    name = 'structural-evaluate'
+    evaluate_expressions = True
+
+@register_pass
+class StructuralCSEPass(Pass):
+    """Share equal subexpressions of the structural IR.
+
+    Lowering computes shared subexpressions once if this pass is in the pipeline.
+    """
+    name = 'structural-cse'
+    input_ir = output_ir = STRUCTURAL
+
+    def run(self, instructions, context):
+        StructuralCSE().optimize(instructions, context.symbol_table)
+        return instructions
+
+@register_pass
+class LowerPass(Pass):
+    """Convert the structural IR to the linear IR."""
+    name = 'lower'
+    input_ir = STRUCTURAL
+    output_ir = LINEAR
+    required = True
+
+    def share_subexpressions(self, context):
+        return StructuralCSEPass.name in context.pass_names
+
+    def cache_token(self, context):
+        return 'cse' if self.share_subexpressions(context) else ''
+
+    def run(self, instructions, context):
+        return StructuralVisitor().transform(instructions.script, context.symbol_table,
+                                             self.share_subexpressions(context))
+
+@register_pass
+class InlinePass(Pass):
+    """Replace assumptions with stack operations.
+
+    If the pipeline includes the peephole pass, the stack operations are
+    planned by a StackScheduler, and peephole optimizations are also performed.
+    """
+    name = 'inline'
+    required = True
+
+    def peephole_enabled(self, context):
+        return PeepholePass.name in context.pass_names
+
+    def cache_token(self, context):
+        # Peephole optimization depends on the rules that are loaded (including those of plugins).
+        return 'schedule:%s' % get_matcher().digest() if self.peephole_enabled(context) else ''
+
+    def run(self, instructions, context):
+        peephole_optimizer = PeepholeOptimizer(self.peephole_enabled(context), context.profiler)
+        LinearInliner(context.profiler).inline(instructions, peephole_optimizer)
+        return instructions
+
+@register_pass
+class PeepholePass(Pass):
+    """Perform peephole optimizations on the linear IR."""
+    name = 'peephole'
+
+    def cache_token(self, context):
+        return get_matcher().digest()
+
+    def run(self, instructions, context):
+        PeepholeOptimizer(True, context.profiler).optimize(instructions)
+        return instructions
+
+@register_pass
+class SuperoptimizePass(Pass):
+    """Replace windows of the linear IR with the shortest equivalent sequences.
+
+    Results of searches are stored in a database, so that later compilations
+    only look them up. If the pipeline includes the peephole pass, peephole
+    optimizations are performed afterward.
+    """
+    name = 'superoptimize'
+
+    def cache_token(self, context):
+        if PeepholePass.name in context.pass_names:
+            return 'v%d:%s' % (SEARCH_VERSION, get_matcher().digest())
+        return 'v%d' % SEARCH_VERSION
+
+    def run(self, instructions, context):
+        database = SuperoptimizerDatabase(context.superoptimizer_db)
+        try:
+            Superoptimizer(database).optimize(instructions)
+        finally:
+            database.save()
+        PeepholeOptimizer(PeepholePass.name in context.pass_names, context.profiler).optimize(instructions)
+        return instructions
+
+def parse_passes(spec, default):
+    """Get the list of pass names that spec describes.
+
+    spec is a comma-separated list of items. An item is either a pipeline
+    name, a pass name, '+name' to add a pass to default, or '-name' to
+    remove a pass. If spec starts with '+' or '-', items modify default.
+    Raises ValueError if spec is invalid.
+    """
+    items = [i.strip() for i in spec.split(',') if i.strip()]
+    names = list(default) if items and items[0][0] in '+-' else []
+    for item in items:
+        if item in pipelines:
+            names.extend(pipelines[item])
+            continue
+        name = item.lstrip('+-')
+        if name not in passes:
+            raise ValueError('Unknown pass or pipeline: "%s"' % name)
+        if item.startswith('-'):
+            names = [i for i in names if i != name]
+        elif name not in names:
+            names.append(name)
+    return names
+
+class PassManager(object):
+    """Runs the passes of a pipeline.
+
+    Attributes:
+        - names (list): Names of the passes that run, in order.
+        - cache (CompilationCache): Cache of pass results, or None.
+
+    """
+    def __init__(self, names, cache=None):
+        for name in names:
+            if name not in passes:
+                raise ValueError('Unknown pass: "%s"' % name)
+        names = list(names)
+        for name, cls in sorted(passes.items()):
+            if cls.required and name not in names:
+                names.append(name)
+
+        instances = [passes[name]() for name in names]
+        self.structural_passes = [i for i in instances if i.input_ir == STRUCTURAL and i.output_ir == STRUCTURAL]
+        self.lowering_passes = [i for i in instances if i.input_ir == STRUCTURAL and i.output_ir == LINEAR]
+        self.linear_passes = [i for i in instances if i.input_ir == LINEAR]
+        self.names = [i.name for i in self.structural_passes + self.lowering_passes + self.linear_passes]
+        self.cache = cache
+
+    def context(self, symbol_table=None, profiler=null_profiler):
+        """Create the context for a compilation."""
+        return PassContext(symbol_table, profiler, self.names)
+
+    def run(self, instructions, context, pass_list):
+        """Run the passes in pass_list on instructions and return the result."""
+        for pass_ in pass_list:
+            instructions = self.run_pass(pass_, instructions, context)
+        return instructions
+
+    def run_pass(self, pass_, instructions, context):
+        """Run pass_, using a cached result if there is one."""
+        if instructions.ir_type != pass_.input_ir:
+            raise TypeError('Pass "%s" cannot operate on this type of instructions' % pass_.name)
+        key = None
+        if self.cache is not None:
+            if context.state_key is None:
+                state = pickle.dumps((instructions, context.symbol_table), pickle.HIGHEST_PROTOCOL)
+                context.state_key = self.cache.pass_key('', '', state)
+            key = context.state_key = self.cache.pass_key(pass_.name, pass_.cache_token(context), context.state_key)
+            if pass_.cacheable:
+                entry = self.cache.get(key)
+                if entry is not None:
+                    instructions, context.symbol_table = entry
+                    if isinstance(instructions, CompactInstructions):
+                        instructions = instructions.expand()
+                    return instructions
+
+        with context.profiler.stage(pass_.name, instructions) as stage:
+            instructions = pass_.run(instructions, context)
+            stage.set_output(instructions)
+
+        if key is not None and pass_.cacheable:
+            # Linear instructions are cached in their compact form.
+            cached = instructions.compact() if instructions.ir_type == LINEAR else instructions
+            self.cache.put(key, (cached, context.symbol_table))
+        return instructions
@@ -0,0 +1,90 @@
+"""Pure-Python implementation of RIPEMD-160.
+
+hashlib only provides RIPEMD-160 if the OpenSSL that Python is linked
+against does, which is not the case with some versions of OpenSSL.
+This implementation is slow, but it is only used to hash constants.
+"""
+import struct
+
+# Initial value of the state.
+INITIAL_STATE = (0x67452301, 0xEFCDAB89, 0x98BADCFE, 0x10325476, 0xC3D2E1F0)
+
+# Order of the message words in the left and right lines.
+WORDS_LEFT = [
+    0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15,
+    7, 4, 13, 1, 10, 6, 15, 3, 12, 0, 9, 5, 2, 14, 11, 8,
+    3, 10, 14, 4, 9, 15, 8, 1, 2, 7, 0, 6, 13, 11, 5, 12,
+    1, 9, 11, 10, 0, 8, 12, 4, 13, 3, 7, 15, 14, 5, 6, 2,
+    4, 0, 5, 9, 7, 12, 2, 10, 14, 1, 3, 8, 11, 6, 15, 13,
+]
+WORDS_RIGHT = [
+    5, 14, 7, 0, 9, 2, 11, 4, 13, 6, 15, 8, 1, 10, 3, 12,
+    6, 11, 3, 7, 0, 13, 5, 10, 14, 15, 8, 12, 4, 9, 1, 2,
+    15, 5, 1, 3, 7, 14, 6, 9, 11, 8, 12, 2, 10, 0, 4, 13,
+    8, 6, 4, 1, 3, 11, 15, 0, 5, 12, 2, 13, 9, 7, 10, 14,
+    12, 15, 10, 4, 1, 5, 8, 7, 6, 2, 13, 14, 0, 3, 9, 11,
+]
+
+# Amounts of the left rotations in the left and right lines.
+SHIFTS_LEFT = [
+    11, 14, 15, 12, 5, 8, 7, 9, 11, 13, 14, 15, 6, 7, 9, 8,
+    7, 6, 8, 13, 11, 9, 7, 15, 7, 12, 15, 9, 11, 7, 13, 12,
+    11, 13, 6, 7, 14, 9, 13, 15, 14, 8, 13, 6, 5, 12, 7, 5,
+    11, 12, 14, 15, 14, 15, 9, 8, 9, 14, 5, 6, 8, 6, 5, 12,
+    9, 15, 5, 11, 6, 8, 13, 12, 5, 12, 13, 14, 11, 8, 5, 6,
+]
+SHIFTS_RIGHT = [
+    8, 9, 9, 11, 13, 15, 15, 5, 7, 7, 8, 11, 14, 14, 12, 6,
+    9, 13, 15, 7, 12, 8, 9, 11, 7, 7, 12, 7, 6, 15, 13, 11,
+    9, 7, 15, 11, 8, 6, 6, 14, 12, 13, 5, 14, 13, 13, 7, 5,
+    15, 5, 8, 11, 14, 14, 6, 14, 6, 9, 12, 9, 12, 5, 15, 8,
+    8, 5, 12, 9, 12, 5, 14, 6, 8, 13, 6, 5, 15, 13, 11, 11,
+]
+
+# Constants of each round in the left and right lines.
+CONSTANTS_LEFT = [0x00000000, 0x5A827999, 0x6ED9EBA1, 0x8F1BBCDC, 0xA953FD4E]
+CONSTANTS_RIGHT = [0x50A28BE6, 0x5C4DD124, 0x6D703EF3, 0x7A6D76E9, 0x00000000]
+
+MASK = 0xFFFFFFFF
+
+def rotate_left(x, n):
+    return ((x << n) | (x >> (32 - n))) & MASK
+
+def round_function(index, x, y, z):
+    """Apply the boolean function of round index."""
+    if index == 0:
+        return x ^ y ^ z
+    elif index == 1:
+        return (x & y) | (~x & z)
+    elif index == 2:
+        return (x | ~y) ^ z
+    elif index == 3:
+        return (x & z) | (y & ~z)
+    return x ^ (y | ~z)
+
+def compress(state, block):
+    """Get the state after compressing a 64-byte block."""
+    words = struct.unpack('<16L', block)
+    al, bl, cl, dl, el = state
+    ar, br, cr, dr, er = state
+    for i in range(80):
+        rnd = i >> 4
+        t = rotate_left((al + round_function(rnd, bl, cl, dl) + words[WORDS_LEFT[i]] + CONSTANTS_LEFT[rnd]) & MASK,
+                        SHIFTS_LEFT[i])
+        al, bl, cl, dl, el = el, (t + el) & MASK, bl, rotate_left(cl, 10), dl
+        t = rotate_left((ar + round_function(4 - rnd, br, cr, dr) + words[WORDS_RIGHT[i]] + CONSTANTS_RIGHT[rnd]) & MASK,
+                        SHIFTS_RIGHT[i])
+        ar, br, cr, dr, er = er, (t + er) & MASK, br, rotate_left(cr, 10), dr
+    h0, h1, h2, h3, h4 = state
+    return ((h1 + cl + dr) & MASK, (h2 + dl + er) & MASK, (h3 + el + ar) & MASK,
+            (h4 + al + br) & MASK, (h0 + bl + cr) & MASK)
+
+def ripemd160(data):
+    """Get the RIPEMD-160 digest of data."""
+    data = bytes(data)
+    padding = b'\x80' + b'\x00' * ((55 - len(data)) % 64)
+    message = data + padding + struct.pack('<Q', (len(data) * 8) & 0xFFFFFFFFFFFFFFFF)
+    state = INITIAL_STATE
+    for i in range(0, len(message), 64):
+        state = compress(state, message[i:i + 64])
+    return struct.pack('<5L', *state)
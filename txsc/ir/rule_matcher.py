@@ -0,0 +1,336 @@
+"""Matching of peephole rules.
+
+All rules are compiled into a trie whose edges are labelled by the nodes
+of their templates, so that the rules that match at a position are found
+by walking the trie once, regardless of how many rules there are.
+
+Rules can also be written in rule files (see parse_rules()).
+"""
+import hashlib
+import re
+
+from txsc.ir import formats
+import txsc.ir.linear_nodes as types
+
+# Label of edges that match any node.
+WILDCARD = ('any',)
+
+class Rule(object):
+    """A peephole rule.
+
+    Instructions that match template are replaced with the result of
+    callback, which is called with a view of the matching instructions.
+
+    Attributes:
+        - template (list): Nodes to match. None matches any node.
+        - callback: Function that returns the replacement of matching instructions.
+        - strict (bool): Whether Push nodes must push the same value that
+            those in the template push. If strict is False, SmallIntOpCode()
+            matches any small int opcode.
+        - name (str): Name of the rule.
+        - cost (int): Change in the number of instructions when the rule
+            is applied, or None if it is not known. If replacement is a
+            list, this is the difference in length of it and template.
+        - replacement (list): The replacement, or None if it is a callback.
+        - source (str): Text of the rule in a rule file, or None.
+
+    """
+    def __init__(self, template, replacement, strict=True, name='', cost=None, source=None):
+        self.template = template
+        self.strict = strict
+        self.name = name
+        self.source = source
+        if callable(replacement):
+            self.callback = replacement
+            self.replacement = None
+            self.cost = cost
+        else:
+            self.callback = lambda values: replacement
+            self.replacement = replacement
+            self.cost = len(replacement) - len(template)
+
+    def __repr__(self):
+        return 'Rule(%s)' % self.name
+
+    def describe(self):
+        """Get a string that determines what this rule does.
+
+        Rules of rule files are described by their text. The callbacks of
+        other rules are described by their code.
+        """
+        if self.source is not None:
+            replacement = self.source
+        elif self.replacement is not None:
+            replacement = ' '.join(node_text(i) for i in self.replacement)
+        else:
+            code = getattr(self.callback, '__code__', None)
+            replacement = repr((code.co_code, code.co_consts)) if code else self.callback.__class__.__name__
+        return '%s|%s|%s|%s' % (self.name, self.strict, ' '.join(node_text(i) for i in self.template), replacement)
+
+def node_text(node):
+    """Get the text of node (a template or replacement item)."""
+    if node is None:
+        return '$'
+    if isinstance(node, types.Push):
+        return 'PUSH' if node.data is None else '0x' + node.data.encode('hex')
+    return node.__class__.__name__
+
+def template_label(node, strict):
+    """Get the label of the trie edge that node (a template item) matches."""
+    if node is None:
+        return WILDCARD
+    if isinstance(node, types.Push):
+        return ('push', node.data) if strict else ('class', types.Push)
+    if node.__class__ is types.SmallIntOpCode and not strict:
+        return ('class', types.SmallIntOpCode)
+    if isinstance(node, types.OpCode):
+        return ('op', node.__class__)
+    raise TypeError('Templates cannot contain nodes of type %s' % node.__class__.__name__)
+
+def node_labels(node):
+    """Get the labels of the trie edges that node (an instruction) can follow."""
+    labels = [WILDCARD]
+    if isinstance(node, types.OpCode):
+        labels.append(('op', node.__class__))
+        if isinstance(node, types.SmallIntOpCode):
+            labels.append(('class', types.SmallIntOpCode))
+    elif isinstance(node, types.Push):
+        labels.append(('class', types.Push))
+        labels.append(('push', node.data))
+    return labels
+
+class TrieNode(object):
+    __slots__ = ('edges', 'rule')
+    def __init__(self):
+        # {label: TrieNode, ...}
+        self.edges = {}
+        # (priority, Rule) of the rule that ends at this node, if any.
+        self.rule = None
+
+class RuleMatcher(object):
+    """Finds the rules that match instructions.
+
+    Rules that are added first have priority over rules that are added later.
+
+    Attributes:
+        - max_length (int): Length of the longest template.
+
+    """
+    def __init__(self, rules=()):
+        self.root = TrieNode()
+        self.max_length = 0
+        self.num_rules = 0
+        self._hash = hashlib.sha256()
+        for rule in rules:
+            self.add(rule)
+
+    def add(self, rule):
+        """Add rule to the trie.
+
+        Raises ValueError if rule is known not to remove instructions.
+        """
+        if rule.cost is not None and rule.cost >= 0:
+            raise ValueError('Rule %s has a cost of %d, but rules must remove instructions' % (rule.name, rule.cost))
+        node = self.root
+        for item in rule.template:
+            node = node.edges.setdefault(template_label(item, rule.strict), TrieNode())
+        # A rule with the same template as an earlier rule would never match.
+        if node.rule is None:
+            node.rule = (self.num_rules, rule)
+        self.num_rules += 1
+        self.max_length = max(self.max_length, len(rule.template))
+        self._hash.update(rule.describe())
+        self._hash.update('\0')
+
+    def digest(self):
+        """Get a digest of the rules, in order.
+
+        Optimization results that depend on the rules (e.g. cached results)
+        should be keyed by this.
+        """
+        return self._hash.hexdigest()
+
+    def match(self, instructions, index):
+        """Get the rule with the highest priority whose template matches instructions at index."""
+        best = None
+        frontier = [self.root]
+        for i in xrange(index, len(instructions)):
+            labels = node_labels(instructions[i])
+            frontier = [child for node in frontier for child in (node.edges.get(label) for label in labels) if child]
+            if not frontier:
+                break
+            for node in frontier:
+                if node.rule is not None and (best is None or node.rule[0] < best[0]):
+                    best = node.rule
+        return best[1] if best else None
+
+    def apply(self, instructions):
+        """Replace matches of the rules until there are none.
+
+        Only the ranges of instructions that are marked as modified (see
+        LInstructions.track_changes()) are scanned, starting early enough
+        to find matches that overlap them. Each replacement marks the range
+        it modifies, so matching continues around it. If changes are not
+        tracked, all instructions are scanned.
+
+        Replacements that do not remove instructions are not made, so this
+        always terminates. Returns whether any replacement was made.
+        """
+        if instructions.dirty is None:
+            instructions.track_changes()
+        changed = False
+        while instructions.dirty:
+            start, end = instructions.dirty[0]
+            index = max(0, start - self.max_length + 1)
+            stop = min(max(end, start + 1), len(instructions))
+            while index < stop:
+                rule = self.match(instructions, index)
+                if rule is not None and self.replace(instructions, index, rule):
+                    changed = True
+                    break
+                index += 1
+            else:
+                instructions.dirty.pop(0)
+        return changed
+
+    def replace(self, instructions, index, rule):
+        """Replace the match of rule at index. Returns whether instructions were modified.
+
+        The match is only replaced if the replacement is shorter.
+        """
+        end = index + len(rule.template)
+        result = list(rule.callback(instructions.view_slice(index, end)))
+        if len(result) >= end - index:
+            return False
+        # No match starts before index, so only the rest of the range remains to be checked.
+        start, dirty_end = instructions.dirty[0]
+        instructions.dirty[0] = (max(start, index), dirty_end)
+        instructions.replace_slice(index, end, result)
+        return True
+
+
+class RuleSyntaxError(SyntaxError):
+    """Error in the syntax of a rule file."""
+    pass
+
+# Template items that match nodes of a class in rules that are not strict.
+capture_types = {
+    'PUSH': types.Push,
+    'SMALLINT': types.SmallIntOpCode,
+}
+
+def parse_node(token):
+    """Get the node that token (an opcode name, integer or hex push) refers to."""
+    if token.startswith('0x'):
+        return types.Push(data=formats.hex_to_bytearray(token))
+    if re.match(r'^-?[0-9]+$', token):
+        value = int(token)
+        if value == -1:
+            return types.NegativeOne()
+        if 0 <= value <= 16:
+            return types.small_int_opcode(value)()
+        return types.Push(data=formats.int_to_bytearray(value))
+    name = token.upper()
+    cls = types.opcode_by_name(name if name.startswith('OP_') else 'OP_' + name)
+    if cls is None:
+        raise ValueError('Unknown opcode: %s' % token)
+    return cls()
+
+def parse_rule(line, name=''):
+    """Parse a rule from line.
+
+    Rules have the form "template => replacement [; option ...]".
+    Templates and replacements are lists of opcode names (with or without
+    "OP_"), integers, hex pushes (e.g. "0x0102"), and captures. A capture
+    ("$name") in a template matches any node. A capture with a type
+    ("$name:PUSH" or "$name:SMALLINT") matches any node of that type, and
+    requires the "loose" option. Captures in a replacement are replaced
+    with the nodes that they matched.
+
+    Options:
+        - strict: Push nodes must push the same values (Default).
+        - loose: The rule is not strict.
+
+    The cost of the rule is the difference in length of replacement and template.
+    """
+    rule_text, _, options = line.partition(';')
+    if '=>' not in rule_text:
+        raise RuleSyntaxError('Expected "=>" in rule: %s' % line.strip())
+    template_text, replacement_text = rule_text.split('=>', 1)
+
+    strict = True
+    for option in options.split():
+        if option in ('strict', 'loose'):
+            strict = option == 'strict'
+        else:
+            raise RuleSyntaxError('Unknown option: %s' % option)
+
+    template = []
+    # {capture_name: template_index, ...}
+    captures = {}
+    for token in template_text.split():
+        if not token.startswith('$'):
+            template.append(parse_node(token))
+            continue
+        capture, _, capture_type = token[1:].partition(':')
+        if capture in captures:
+            raise RuleSyntaxError('Capture $%s appears more than once in template' % capture)
+        captures[capture] = len(template)
+        if not capture_type:
+            template.append(None)
+        elif capture_type not in capture_types:
+            raise RuleSyntaxError('Unknown capture type: %s' % capture_type)
+        elif strict:
+            raise RuleSyntaxError('Typed captures require the "loose" option: %s' % token)
+        else:
+            template.append(capture_types[capture_type]())
+    if not template:
+        raise RuleSyntaxError('Rule has an empty template: %s' % line.strip())
+
+    # Items are nodes, or indices of captured nodes.
+    replacement = []
+    for token in replacement_text.split():
+        if token.startswith('$'):
+            if token[1:] not in captures:
+                raise RuleSyntaxError('Unknown capture: %s' % token)
+            replacement.append(captures[token[1:]])
+        else:
+            replacement.append(parse_node(token))
+
+    cost = len(replacement) - len(template)
+    if any(isinstance(i, int) for i in replacement):
+        callback = lambda values: [values[i] if isinstance(i, int) else i for i in replacement]
+    else:
+        callback = replacement
+    return Rule(template, callback, strict=strict, name=name, cost=cost, source=line.strip())
+
+def parse_rules(text, name=''):
+    """Parse the rules in text (the contents of a rule file).
+
+    Each line contains a rule (see parse_rule()). Text after "#" is a
+    comment. A line of the form "[name]" sets the name of the rules after it.
+
+    Every rule must have a negative cost (i.e. its replacement must be shorter
+    than its template), so that applying rules always terminates.
+    """
+    rules = []
+    for lineno, line in enumerate(text.splitlines(), 1):
+        line = line.split('#', 1)[0].strip()
+        if not line:
+            continue
+        if line.startswith('[') and line.endswith(']'):
+            name = line[1:-1].strip()
+            continue
+        try:
+            rule = parse_rule(line, name)
+            if rule.cost >= 0:
+                raise RuleSyntaxError('Rule cost must be negative: %s' % line)
+        except (RuleSyntaxError, ValueError) as e:
+            raise RuleSyntaxError('Line %d: %s' % (lineno, e))
+        rules.append(rule)
+    return rules
+
+def load_rules(filename):
+    """Parse the rules in the rule file filename."""
+    with open(filename, 'r') as f:
+        return parse_rules(f.read())
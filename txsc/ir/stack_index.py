@@ -0,0 +1,238 @@
+"""Index of stack heights and assumption occurrences in linear instructions.
+
+The index is an implicit treap (a randomized balanced tree ordered by
+position) of the instructions. Each subtree records its size and total
+delta, so the stack height before any position can be found in O(log n),
+and a slice can be replaced in O(log n + k) for k new instructions.
+
+The occurrences of each assumption are kept in lists of tree nodes in
+script order, so the number of occurrences after a position can be found
+by binary search.
+"""
+import random
+
+from txsc.ir import formats
+import txsc.ir.linear_nodes as types
+
+def instruction_to_int(op):
+    """Get the integer value that op (a nullary opcode) pushes."""
+    if isinstance(op, types.SmallIntOpCode):
+        return op.value
+    elif isinstance(op, types.Push):
+        return formats.bytearray_to_int(op.data)
+
+def node_delta(op, previous):
+    """Get the delta of op, given the instruction before it.
+
+    Returns None if the delta can only be determined during execution.
+    """
+    if isinstance(op, types.IfDup):
+        arg = instruction_to_int(previous) if previous is not None else None
+        if arg is None:
+            return None
+        return 1 if arg else 0
+    return op.delta
+
+class TreeNode(object):
+    """Node of the treap."""
+    __slots__ = ('op', 'delta', 'priority', 'left', 'right', 'parent', 'size', 'total', 'unknowns')
+    def __init__(self, op, delta):
+        self.op = op
+        self.delta = delta
+        self.priority = random.random()
+        self.left = self.right = self.parent = None
+        self.size = 1
+        self.total = delta or 0
+        # Number of nodes in this subtree whose delta is unknown.
+        self.unknowns = 1 if delta is None else 0
+
+def _update(node):
+    """Recalculate the aggregates of node from its children."""
+    node.size = 1
+    node.total = node.delta or 0
+    node.unknowns = 1 if node.delta is None else 0
+    for child in (node.left, node.right):
+        if child is not None:
+            child.parent = node
+            node.size += child.size
+            node.total += child.total
+            node.unknowns += child.unknowns
+
+def _size(node):
+    return node.size if node is not None else 0
+
+def _split(node, count):
+    """Split the tree at node into a tree of its first count nodes and a tree of the rest."""
+    if node is None:
+        return None, None
+    if _size(node.left) >= count:
+        left, node.left = _split(node.left, count)
+        _update(node)
+        if left is not None:
+            left.parent = None
+        node.parent = None
+        return left, node
+    node.right, right_part = _split(node.right, count - _size(node.left) - 1)
+    _update(node)
+    if right_part is not None:
+        right_part.parent = None
+    node.parent = None
+    return node, right_part
+
+def _merge(left, right):
+    """Merge two trees, where all nodes of left come before those of right."""
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        _update(left)
+        left.parent = None
+        return left
+    right.left = _merge(left, right.left)
+    _update(right)
+    right.parent = None
+    return right
+
+def _build(nodes):
+    """Build a tree of nodes (in order) in linear time."""
+    last = None
+    stack = []
+    for node in nodes:
+        last = None
+        while stack and stack[-1].priority < node.priority:
+            last = stack.pop()
+            _update(last)
+        node.left = last
+        if stack:
+            stack[-1].right = node
+        stack.append(node)
+    while stack:
+        last = stack.pop()
+        _update(last)
+    if last is not None:
+        last.parent = None
+    return last
+
+class StackIndex(object):
+    """Index of the stack heights and assumption occurrences of instructions.
+
+    Use LInstructions.build_index() to attach an index to instructions,
+    so that it is updated when they are modified.
+    """
+    def __init__(self, instructions):
+        self.root = None
+        # {assumption_name: [TreeNode, ...], ...} in script order.
+        self.occurrences = {}
+        self.rebuild(instructions)
+
+    def __len__(self):
+        return _size(self.root)
+
+    def rebuild(self, instructions):
+        """Index instructions from scratch."""
+        nodes = self._make_nodes(instructions, None)
+        self.root = _build(nodes)
+        self.occurrences = {}
+        for node in nodes:
+            if isinstance(node.op, types.Assumption):
+                self.occurrences.setdefault(node.op.var_name, []).append(node)
+
+    def _make_nodes(self, ops, previous):
+        nodes = []
+        for op in ops:
+            nodes.append(TreeNode(op, node_delta(op, previous)))
+            previous = op
+        return nodes
+
+    def _node_at(self, idx):
+        node = self.root
+        while node is not None:
+            left = _size(node.left)
+            if idx < left:
+                node = node.left
+            elif idx == left:
+                return node
+            else:
+                idx -= left + 1
+                node = node.right
+        raise IndexError('Instruction index out of range')
+
+    def position(self, node):
+        """Get the index of node (a TreeNode)."""
+        idx = _size(node.left)
+        while node.parent is not None:
+            if node is node.parent.right:
+                idx += _size(node.parent.left) + 1
+            node = node.parent
+        return idx
+
+    def height(self, idx):
+        """Get the total delta of the instructions before idx, or None if it depends on execution."""
+        total = unknowns = 0
+        node = self.root
+        while node is not None and idx > 0:
+            left = node.left
+            if idx <= _size(left):
+                node = left
+                continue
+            if left is not None:
+                total += left.total
+                unknowns += left.unknowns
+            total += node.delta or 0
+            unknowns += 1 if node.delta is None else 0
+            idx -= _size(left) + 1
+            node = node.right
+        return None if unknowns else total
+
+    def delta(self, idx):
+        """Get the delta of the instruction at idx."""
+        return self._node_at(idx).delta
+
+    def _bisect(self, nodes, idx):
+        """Get the number of nodes whose index is at most idx."""
+        lo, hi = 0, len(nodes)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.position(nodes[mid]) <= idx:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def occurrences_after(self, var_name, idx):
+        """Get the number of assumptions of var_name after idx."""
+        nodes = self.occurrences.get(var_name, [])
+        return len(nodes) - self._bisect(nodes, idx)
+
+    def replace(self, start, end, ops):
+        """Replace the entries for [start : end] with entries for ops."""
+        # Remove the occurrences that are replaced.
+        for i in xrange(start, end):
+            node = self._node_at(i)
+            if isinstance(node.op, types.Assumption):
+                nodes = self.occurrences[node.op.var_name]
+                del nodes[self._bisect(nodes, i) - 1]
+
+        previous = self._node_at(start - 1).op if start > 0 else None
+        new_nodes = self._make_nodes(ops, previous)
+        left, rest = _split(self.root, start)
+        _, right = _split(rest, end - start)
+        self.root = _merge(_merge(left, _build(new_nodes)), right)
+
+        for node in new_nodes:
+            if isinstance(node.op, types.Assumption):
+                nodes = self.occurrences.setdefault(node.op.var_name, [])
+                nodes.insert(self._bisect(nodes, self.position(node)), node)
+
+        # Update the delta of the instruction after the new ones, which may depend on them.
+        next_idx = start + len(ops)
+        if next_idx < len(self) and isinstance(self._node_at(next_idx).op, types.IfDup):
+            node = self._node_at(next_idx)
+            delta = node_delta(node.op, ops[-1] if ops else previous)
+            if delta != node.delta:
+                node.delta = delta
+                while node is not None:
+                    _update(node)
+                    node = node.parent
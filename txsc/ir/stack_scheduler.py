@@ -0,0 +1,297 @@
+"""Scheduling of the stack operations that replace assumptions.
+
+The scheduler models the stack while it walks through a script: Each
+item is an assumed stack item, a known constant, or an anonymous value
+that an operation produced. When it reaches a row of assumptions, it
+knows where each assumed item currently is, and whether the item is
+used again later. It then searches for the cheapest (in bytes) sequence
+of stack operations that places the items on top of the stack, copying
+items that are used again and moving those that are not.
+"""
+import heapq
+
+from txsc.ir import formats
+from txsc.ir.superoptimizer import pushed_data, stack_ops
+import txsc.ir.linear_nodes as types
+
+# Binary operations whose arguments can be reordered.
+commutative_ops = frozenset([types.Add, types.Mul, types.BoolAnd, types.BoolOr, types.NumEqual,
+                             types.NumEqualVerify, types.NumNotEqual, types.Min, types.Max,
+                             types.Equal, types.EqualVerify, types.And, types.Or, types.Xor])
+
+# {opcode class: opcode class that performs the same operation with its arguments reversed, ...}
+flipped_ops = {
+    types.LessThan: types.GreaterThan,
+    types.GreaterThan: types.LessThan,
+    types.LessThanOrEqual: types.GreaterThanOrEqual,
+    types.GreaterThanOrEqual: types.LessThanOrEqual,
+}
+
+# Stack operations that the search uses, other than OP_PICK and OP_ROLL.
+search_ops = [types.Dup(), types.Over(), types.Swap(), types.Rot(), types.Tuck(),
+              types.TwoDup(), types.ThreeDup(), types.TwoOver(), types.TwoSwap()]
+
+class ScheduleError(Exception):
+    """Exception raised when the stack effect of an instruction cannot be determined."""
+    pass
+
+def int_op(value):
+    """Get the node that pushes value."""
+    cls = types.small_int_opcode(value)
+    if cls:
+        return cls()
+    return types.Push(data=formats.int_to_bytearray(value))
+
+def op_cost(op):
+    """Get the size of op in bytes."""
+    if isinstance(op, types.Push):
+        size = len(op.data)
+        return size + (1 if size < 0x4c else 2 if size <= 0xff else 3)
+    return 1
+
+def apply_stack_op(stack, op):
+    """Apply op (a stack operation) to stack (a tuple). Returns None if there are not enough items."""
+    count, outputs = stack_ops[op.name]
+    if len(stack) < count:
+        return None
+    values = stack[len(stack) - count:]
+    return stack[:len(stack) - count] + tuple(values[i] for i in outputs)
+
+def pick(stack, n, roll):
+    """Apply n OP_PICK (or n OP_ROLL) to stack (a tuple)."""
+    idx = len(stack) - n - 1
+    item = stack[idx]
+    if roll:
+        stack = stack[:idx] + stack[idx + 1:]
+    return stack + (item,)
+
+def position_ops(n, roll):
+    """Get the cheapest operations that copy (or move) the item at depth n to the top."""
+    if roll:
+        return [[], [types.Swap()], [types.Rot()]][n] if n < 3 else [int_op(n), types.Roll()]
+    return [[types.Dup()], [types.Over()]][n] if n < 2 else [int_op(n), types.Pick()]
+
+class StackScheduler(object):
+    """Replaces assumptions with stack operations that are planned using a model of the stack.
+
+    Stack items are modelled as tuples: ('assumed', name) for assumed items,
+    ('const', data) for pushed data, and ('value', n) for any other item,
+    where n is unique to that item.
+
+    Attributes:
+        - max_states (int): Maximum number of stack states that are examined
+            when searching for the operations of a row of assumptions.
+        - window (int): Number of items at the top of the stack that the search
+            may rearrange. Rows that move deeper items use OP_PICK and OP_ROLL.
+
+    """
+    def __init__(self, max_states=200, window=5):
+        self.max_states = max_states
+        self.window = window
+        self.counter = 0
+
+    def new_value(self):
+        """Get a stack item that is distinct from every other item."""
+        self.counter += 1
+        return ('value', self.counter)
+
+    def stack_effect(self, op, stack):
+        """Get (number of items consumed, items produced) for op, given the stack before it."""
+        data = pushed_data(op)
+        if data is not None:
+            return 0, [('const', data)]
+        if isinstance(op, types.InnerScript):
+            return 0, [self.new_value()]
+        if op.name in stack_ops:
+            count, outputs = stack_ops[op.name]
+            if len(stack) < count:
+                raise ScheduleError('Stack underflow')
+            values = stack[len(stack) - count:]
+            return count, [values[i] for i in outputs]
+        if isinstance(op, types.CheckMultiSig):
+            num_pubkeys = self.const_int(stack, 0)
+            num_sigs = self.const_int(stack, num_pubkeys + 1)
+            produced = [] if op.verifier else [self.new_value()]
+            # OP_CHECKMULTISIG also consumes an extra item.
+            return num_pubkeys + num_sigs + 3, produced
+        if op.delta is None or isinstance(op, (types.Pick, types.Roll)):
+            raise ScheduleError('Cannot determine the stack effect of %s' % op.name)
+        consumed = len(op.args)
+        if consumed + op.delta < 0:
+            raise ScheduleError('Cannot determine the stack effect of %s' % op.name)
+        return consumed, [self.new_value() for _ in range(consumed + op.delta)]
+
+    def const_int(self, stack, depth):
+        """Get the non-negative integer at depth in stack."""
+        if depth >= len(stack) or stack[-depth - 1][0] != 'const':
+            raise ScheduleError('Stack item is not a known integer')
+        value = formats.bytearray_to_int(stack[-depth - 1][1])
+        if value is None or value < 0:
+            raise ScheduleError('Stack item is not a known integer')
+        return value
+
+    def schedule(self, instructions):
+        """Get instructions with assumptions replaced by stack operations.
+
+        The stack after each row of assumptions is the same as it would be if
+        each assumption were replaced with OP_PICK or OP_ROLL in turn.
+
+        Raises ScheduleError if the stack effect of an instruction cannot be determined.
+        """
+        instructions = list(instructions)
+        if not any(isinstance(i, types.Assumption) for i in instructions):
+            return instructions
+        # Items that are assumed to be on the stack, with the deepest first.
+        depths = [i.depth for i in instructions if isinstance(i, types.Assumption) and i.depth is not None]
+        stack = [self.new_value() for _ in range(max(depths) + 1 if depths else 0)]
+        for op in instructions:
+            if isinstance(op, types.Assumption) and op.depth is not None:
+                stack[-op.depth - 1] = ('assumed', op.var_name)
+
+        # Whether each assumption is the last occurrence of its item.
+        last_use = [False] * len(instructions)
+        seen = set()
+        for i in reversed(range(len(instructions))):
+            op = instructions[i]
+            if isinstance(op, types.Assumption):
+                last_use[i] = op.var_name not in seen
+                seen.add(op.var_name)
+
+        shared_results = set()
+        result = []
+        i = 0
+        while i < len(instructions):
+            op = instructions[i]
+            if isinstance(op, types.Assumption):
+                end = i
+                while end < len(instructions) and isinstance(instructions[end], types.Assumption):
+                    end += 1
+                # The first occurrence of a shared result names the item on top of the stack.
+                if op.depth is None and op.var_name not in shared_results:
+                    if not stack:
+                        raise ScheduleError('Stack underflow')
+                    shared_results.add(op.var_name)
+                    stack[-1] = ('assumed', op.var_name)
+                    i += 1
+                    continue
+                following = instructions[end] if end < len(instructions) else None
+                ops, following, stack = self.schedule_row(stack, instructions[i:end], last_use[i:end], following)
+                result.extend(ops)
+                if following is not None:
+                    instructions[end] = following
+                i = end
+                continue
+
+            consumed, produced = self.stack_effect(op, stack)
+            if consumed > len(stack):
+                raise ScheduleError('Stack underflow')
+            del stack[len(stack) - consumed:]
+            stack.extend(produced)
+            result.append(op)
+            i += 1
+        return result
+
+    def goals(self, stack, row, last_use):
+        """Get the stack that should result from row (assumptions), given stack (a tuple)."""
+        goal = list(stack)
+        for op, last in zip(row, last_use):
+            item = ('assumed', op.var_name)
+            if item not in goal:
+                raise ScheduleError('Assumed item "%s" is not on the stack' % op.var_name)
+            if last:
+                # Move the assumed item itself, rather than a copy of it.
+                del goal[goal.index(item)]
+            goal.append(item)
+        return tuple(goal)
+
+    def schedule_row(self, stack, row, last_use, following):
+        """Plan the operations that replace row (consecutive assumptions).
+
+        Returns (operations, following operation, resulting stack). If the
+        operation after row has reversed arguments in the resulting stack,
+        the following operation is a replacement for it.
+        """
+        stack = tuple(stack)
+        goal = self.goals(stack, row, last_use)
+        # {goal: following operation, ...}
+        targets = {goal: following}
+        if following is not None and len(getattr(following, 'args', [])) == 2 and len(goal) >= 2:
+            swapped = goal[:-2] + (goal[-1], goal[-2])
+            if following.__class__ in commutative_ops:
+                targets.setdefault(swapped, following)
+            elif following.__class__ in flipped_ops:
+                targets.setdefault(swapped, flipped_ops[following.__class__]())
+
+        # Bring the items to the top in order, or with the last two reversed.
+        orders = [range(len(row))]
+        if len(row) > 1:
+            orders.append(range(len(row) - 2) + [len(row) - 1, len(row) - 2])
+        plans = []
+        for order in orders:
+            order_row, order_last = [row[i] for i in order], [last_use[i] for i in order]
+            goal = self.goals(stack, order_row, order_last)
+            if goal in targets:
+                plans.append((self.greedy(stack, order_row, order_last), goal))
+        ops, goal = min(plans, key=lambda plan: sum(op_cost(i) for i in plan[0]))
+
+        # Search for cheaper operations that only rearrange the top items.
+        split = max(0, len(stack) - self.window)
+        local_targets = dict((target[split:], target) for target in targets if target[:split] == stack[:split])
+        local_items = set(stack[split:])
+        for target in local_targets.keys():
+            if not local_items.issuperset(target):
+                del local_targets[target]
+        if local_targets:
+            found = self.search(stack[split:], local_targets, sum(op_cost(i) for i in ops))
+            if found is not None:
+                ops, goal = found[0], local_targets[found[1]]
+        return ops, targets[goal], list(goal)
+
+    def greedy(self, stack, row, last_use):
+        """Get the operations that bring each item of row to the top in turn."""
+        ops = []
+        for op, last in zip(row, last_use):
+            item = ('assumed', op.var_name)
+            n = len(stack) - 1 - stack.index(item) if last else stack[::-1].index(item)
+            ops.extend(position_ops(n, last))
+            stack = pick(stack, n, last)
+        return ops
+
+    def search(self, stack, targets, max_cost):
+        """Search for operations that turn stack into one of targets and cost less than max_cost.
+
+        Returns (operations, target), or None if none were found.
+        """
+        # Items that the search may copy or move with OP_PICK and OP_ROLL.
+        needed = set(item for target in targets for item in target)
+        max_height = max(len(target) for target in targets) + 2
+
+        def estimate(state):
+            # Most operations place at most three items.
+            return min(-(-(sum(1 for a, b in zip(reversed(state), reversed(target)) if a != b)
+                           + abs(len(state) - len(target))) // 3) for target in targets)
+
+        queue = [(estimate(stack), 0, 0, stack, [])]
+        best = {stack: 0}
+        counter = 0
+        while queue and counter < self.max_states:
+            _, cost, _, state, path = heapq.heappop(queue)
+            if state in targets:
+                return path, state
+            if cost > best.get(state, cost):
+                continue
+            steps = [([op], apply_stack_op(state, op)) for op in search_ops]
+            for n in range(2, len(state)):
+                if state[-n - 1] in needed:
+                    steps.append(([int_op(n), types.Pick()], pick(state, n, False)))
+                    steps.append(([int_op(n), types.Roll()], pick(state, n, True)))
+            for ops, new_state in steps:
+                if new_state is None or len(new_state) > max_height:
+                    continue
+                new_cost = cost + sum(op_cost(i) for i in ops)
+                if new_cost + estimate(new_state) >= max_cost or new_cost >= best.get(new_state, max_cost):
+                    continue
+                best[new_state] = new_cost
+                counter += 1
+                heapq.heappush(queue, (new_cost + estimate(new_state), new_cost, counter, new_state, path + ops))
+        return None
@@ -0,0 +1,96 @@
+"""Common subexpression elimination on the structural IR.
+
+StructuralCSE hash-conses the structural IR: Equal subexpressions are
+replaced with one shared node, so the IR becomes a DAG. StructuralVisitor
+then computes a shared node once, and refers to its result wherever the
+node is used again (see StructuralVisitor.transform()).
+"""
+from txsc.transformer import BaseTransformer, Result
+import txsc.ir.structural_nodes as types
+
+# Nodes that represent values that can be shared.
+value_types = (types.Push, types.UnaryOpCode, types.BinOpCode, types.VariableArgsOpCode)
+
+class StructuralCSE(BaseTransformer):
+    """Replaces equal subexpressions with shared nodes.
+
+    Expressions in inner scripts are not shared, since inner scripts
+    are executed with their own stack.
+
+    The key of a node refers to its (shared) children by identity, so
+    keys do not grow with the depth of the expression.
+    """
+    def __init__(self):
+        # {node key: node, ...}
+        self.nodes = {}
+        # {id(node): node key, ...}
+        self.keys = {}
+
+    def optimize(self, instructions, symbol_table):
+        self.symbol_table = symbol_table
+        self.nodes.clear()
+        self.keys.clear()
+        # Assigned expressions come first, so that occurrences of them are replaced with their symbols' values.
+        for stmt in instructions.script.statements:
+            if isinstance(stmt, types.Assignment):
+                symbol = symbol_table.lookup(stmt.name)
+                if symbol and symbol.type_ == symbol_table.Expr:
+                    stmt.value = symbol.value = self.run(self.intern(symbol.value))
+        instructions.script.statements = [self.run(self.intern(i)) for i in instructions.script.statements]
+
+    def ref(self, node):
+        """Get what refers to node (after it is interned) in the keys of other nodes."""
+        while isinstance(node, types.Symbol):
+            symbol = self.symbol_table.lookup(node.name)
+            # Symbols of expressions are equal to their values.
+            if not symbol or symbol.type_ != self.symbol_table.Expr:
+                return ('Symbol', node.name)
+            node = symbol.value
+        # Shared nodes are the only nodes with their keys.
+        if id(node) in self.keys:
+            return ('Node', id(node))
+        # Other nodes are never equal to another node.
+        return (node.__class__.__name__, id(node))
+
+    def key(self, node):
+        """Get the key of node (after its children are interned)."""
+        if id(node) in self.keys:
+            return self.keys[id(node)]
+        if isinstance(node, types.Push):
+            return ('Push', node.data)
+        if isinstance(node, types.UnaryOpCode):
+            return (node.name, self.ref(node.operand))
+        if isinstance(node, types.BinOpCode):
+            return (node.name, self.ref(node.left), self.ref(node.right))
+        if isinstance(node, types.VariableArgsOpCode):
+            return (node.name,) + tuple(self.ref(i) for i in node.operands)
+        return self.ref(node)
+
+    def intern(self, node):
+        """Intern the children of node, and get the shared node that is equal to node.
+
+        This is a generator (see BaseTransformer.run()).
+        """
+        if id(node) in self.keys:
+            yield Result(node)
+            return
+        if isinstance(node, types.VerifyOpCode):
+            node.test = yield self.intern(node.test)
+        elif isinstance(node, types.UnaryOpCode):
+            node.operand = yield self.intern(node.operand)
+        elif isinstance(node, types.BinOpCode):
+            node.left = yield self.intern(node.left)
+            node.right = yield self.intern(node.right)
+        elif isinstance(node, types.VariableArgsOpCode):
+            operands = []
+            for i in node.operands:
+                operands.append((yield self.intern(i)))
+            node.operands = operands
+        if not isinstance(node, value_types):
+            yield Result(node)
+            return
+
+        key = self.key(node)
+        shared = self.nodes.setdefault(key, node)
+        self.keys[id(shared)] = key
+        yield Result(shared)
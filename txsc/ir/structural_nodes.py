@@ -1,62 +1,190 @@
-"""Structural intermediate representation for scripts."""
+"""Structural intermediate representation for scripts.
+
+Nodes define __slots__ rather than having a __dict__, since large
+scripts consist of many of them.
+"""
 import ast
 
+from txsc.ir import formats
+
+
+class ScriptOp(object):
+    """Base class for nodes in this intermediate representation.
 
-class ScriptOp(ast.Str):
-    """Base class for nodes in this intermediate representation."""
-    pass
+    Attributes:
+        - _fields (tuple): Names of the node's fields, in the order
+            that they are passed to the constructor.
+
+    """
+    __slots__ = ()
+    _fields = ()
+
+    def iter_fields(self):
+        """Yield (name, value) for each field of this node."""
+        for name in self._fields:
+            yield name, getattr(self, name)
+
+    def dump(self, annotate_fields=True):
+        """Get a formatted dump of this node and its children."""
+        return dump_value(self, annotate_fields)
+
+def dump_value(value, annotate_fields=True):
+    """Get a formatted dump of a field value."""
+    parts = []
+    # Items are (True, text) or (False, value to dump), with the next item last.
+    todo = [(False, value)]
+    while todo:
+        is_text, item = todo.pop()
+        if is_text:
+            parts.append(item)
+        elif isinstance(item, ScriptOp) and item.__class__.dump == ScriptOp.dump:
+            items = [(True, '%s(' % item.__class__.__name__)]
+            for i, (name, field) in enumerate(item.iter_fields()):
+                if i:
+                    items.append((True, ', '))
+                if annotate_fields:
+                    items.append((True, '%s=' % name))
+                items.append((False, field))
+            items.append((True, ')'))
+            todo.extend(reversed(items))
+        elif isinstance(item, ScriptOp):
+            # Nodes that format themselves (e.g. Push) have no children.
+            parts.append(item.dump(annotate_fields))
+        elif isinstance(item, ast.AST):
+            # Values that the structural IR keeps from the source (e.g. the names in assume statements).
+            items = [(True, '%s(' % item.__class__.__name__)]
+            for i, (name, field) in enumerate(ast.iter_fields(item)):
+                if i:
+                    items.append((True, ', '))
+                if annotate_fields:
+                    items.append((True, '%s=' % name))
+                items.append((False, field))
+            items.append((True, ')'))
+            todo.extend(reversed(items))
+        elif isinstance(item, list):
+            items = [(True, '[')]
+            for i, field in enumerate(item):
+                if i:
+                    items.append((True, ', '))
+                items.append((False, field))
+            items.append((True, ']'))
+            todo.extend(reversed(items))
+        else:
+            parts.append(repr(item))
+    return ''.join(parts)
+
+def iter_child_nodes(node):
+    """Yield the nodes that are direct children of node."""
+    for _, value in node.iter_fields():
+        if isinstance(value, ScriptOp):
+            yield value
+        elif isinstance(value, list):
+            for i in value:
+                if isinstance(i, ScriptOp):
+                    yield i
+
+def walk(node):
+    """Yield node and all of its descendants, in no particular order."""
+    todo = [node]
+    while todo:
+        node = todo.pop()
+        todo.extend(iter_child_nodes(node))
+        yield node
+
+def postorder(node):
+    """Get node and its descendants, each once, with children before their parents."""
+    result = []
+    seen = set()
+    # Items are (node, whether its children have been added).
+    todo = [(node, False)]
+    while todo:
+        node, expanded = todo.pop()
+        if expanded:
+            result.append(node)
+        elif id(node) not in seen:
+            seen.add(id(node))
+            todo.append((node, True))
+            todo.extend((child, False) for child in reversed(list(iter_child_nodes(node))))
+    return result
 
 class Script(ScriptOp):
     """A complete script."""
-    _fields = ('statements',)
-
-    def dump(self, *args):
-        return ast.dump(self, *args)
+    __slots__ = _fields = ('statements',)
+    def __init__(self, statements=None):
+        self.statements = statements
 
 class InnerScript(ScriptOp):
     """A script contained inside a script."""
-    _fields = ('statements',)
+    __slots__ = _fields = ('statements',)
+    def __init__(self, statements=None):
+        self.statements = statements
 
 class Symbol(ScriptOp):
     """A symbol occurrence."""
-    _fields = ('name')
+    __slots__ = _fields = ('name',)
+    def __init__(self, name=None):
+        self.name = name
 
 class Assignment(ScriptOp):
     """An assignment to a symbol."""
-    _fields = ('name', 'value')
+    __slots__ = _fields = ('name', 'value')
+    def __init__(self, name=None, value=None):
+        self.name = name
+        self.value = value
 
 class Push(ScriptOp):
     """A data push operation.
 
-    Data is hex-encoded.
+    Data is hex-encoded. Integers are script numbers.
     """
-    _fields = ('data',)
+    __slots__ = _fields = ('data',)
+    def __init__(self, data=None):
+        self.data = data
 
     def __int__(self):
-        return int(self.data, 16) if self.data else 0
+        return formats.scriptnum_to_int(formats.hex_to_bytearray(self.data))
 
     def __str__(self):
         return self.data
 
-    def dump(self, annotate_fields=False):
+    def dump(self, annotate_fields=True):
         return 'Push(%s0x%s)' % ('data=' if annotate_fields else '', self.data)
 
 class OpCode(ScriptOp):
     """An opcode."""
-    _fields = ('name',)
+    __slots__ = _fields = ('name',)
+    def __init__(self, name=None):
+        self.name = name
 
 class VerifyOpCode(OpCode):
     """An opcode that consumes a value and fails if it is not truthy."""
-    _fields = OpCode._fields + ('test',)
+    __slots__ = ('test',)
+    _fields = OpCode._fields + __slots__
+    def __init__(self, name=None, test=None):
+        self.name = name
+        self.test = test
 
 class UnaryOpCode(OpCode):
     """An opcode that performs a unary operation."""
-    _fields = OpCode._fields + ('operand',)
+    __slots__ = ('operand',)
+    _fields = OpCode._fields + __slots__
+    def __init__(self, name=None, operand=None):
+        self.name = name
+        self.operand = operand
 
 class BinOpCode(OpCode):
     """An opcode that performs a binary operation."""
-    _fields = OpCode._fields + ('left', 'right',)
+    __slots__ = ('left', 'right',)
+    _fields = OpCode._fields + __slots__
+    def __init__(self, name=None, left=None, right=None):
+        self.name = name
+        self.left = left
+        self.right = right
 
 class VariableArgsOpCode(OpCode):
     """An opcode that takes a variable number of arguments."""
-    _fields = OpCode._fields + ('operands',)
+    __slots__ = ('operands',)
+    _fields = OpCode._fields + __slots__
+    def __init__(self, name=None, operands=None):
+        self.name = name
+        self.operands = operands
@@ -1,15 +1,11 @@
-import ast
-from functools import wraps
-
-import hexs
-
-from txsc.transformer import BaseTransformer
+from txsc.transformer import BaseTransformer, Result
 from txsc.ir import formats
+from txsc.ir.const_evaluator import ConstEvaluator
 import txsc.ir.structural_nodes as types
 
 def get_const(op):
     """Get whether op represents a constant value."""
-    return isinstance(op, types.Push)
+    return isinstance(op, (types.Push, types.InnerScript))
 
 def get_all_const(*ops):
     """Get whether ops all represent constant values."""
@@ -35,14 +31,22 @@ logical_equivalents = {
 }
 
 class StructuralOptimizer(BaseTransformer):
-    """Performs optimizations on the structural IR."""
+    """Performs optimizations on the structural IR.
+
+    Visitor methods of nodes that contain other nodes are generators
+    (see BaseTransformer.visit()), so that deep expressions can be optimized.
+    """
     def __init__(self):
         self.evaluator = ConstEvaluator()
+        # {symbol name: (symbol table version, optimized value), ...}
+        self.optimized_symbols = {}
 
     def optimize(self, instructions, symbol_table, evaluate_expressions=True):
         self.evaluator.enabled = evaluate_expressions
         script = instructions.script
         self.symbol_table = symbol_table
+        self.evaluator.symbol_table = symbol_table
+        self.optimized_symbols.clear()
         new = map(self.visit, script.statements)
         script.statements = filter(lambda i: i is not None, new)
 
@@ -83,186 +87,94 @@ class StructuralOptimizer(BaseTransformer):
             node.name = logical_equivalents[node.name]
             node.left, node.right = node.right, node.left
 
-    def visit(self, node):
-        method = getattr(self, 'visit_%s' % node.__class__.__name__, None)
-        if not method:
-            return node
-        return method(node)
+    def generic_visit(self, node):
+        return node
+
+    def visit_InnerScript(self, node):
+        new = yield self.visit_list(node.statements)
+        node.statements = filter(lambda i: i is not None, new)
+        yield Result(node)
 
     def visit_Assignment(self, node):
-        node.value = self.visit(node.value)
-        return node
+        symbol = self.symbol_table.lookup(node.name)
+        # Optimize the value as the symbol's value, so that it is not optimized again when the symbol is used.
+        if symbol and symbol.type_ == self.symbol_table.Expr and symbol.value is node.value:
+            node.value = yield self.optimize_symbol(symbol)
+        else:
+            node.value = yield node.value
+        yield Result(node)
 
     def visit_Symbol(self, node):
         """Attempt to simplify the value of a symbol."""
         symbol = self.symbol_table.lookup(node.name)
         # Try to optimize the expression.
-        if symbol.type_ == 'expression':
-            expr = self.visit(symbol.value)
-            if isinstance(expr, types.Push):
-                symbol.value = formats.hex_to_list(expr.data)
-                symbol.type_ = self.symbol_table.ByteArray
-
-        return node
+        if symbol.type_ == self.symbol_table.Expr:
+            yield self.optimize_symbol(symbol)
+
+        # Substitute constant values, so that expressions that use them can be evaluated.
+        if self.evaluator.enabled:
+            if symbol.type_ == self.symbol_table.ByteArray:
+                yield Result(types.Push(''.join(symbol.value)))
+                return
+            elif isinstance(symbol.value, types.InnerScript):
+                yield Result(symbol.value)
+                return
+        yield Result(node)
+
+    def optimize_symbol(self, symbol):
+        """Optimize the value of an expression symbol, and get the optimized value.
+
+        The value of each symbol is only optimized once, unless the symbol
+        table has changed since then. This is a generator, like the
+        visitor methods that use it.
+        """
+        version, expr = self.optimized_symbols.get(symbol.name, (None, None))
+        if version == self.symbol_table.version:
+            yield Result(expr)
+            return
+        self.optimized_symbols[symbol.name] = (self.symbol_table.version, symbol.value)
+        expr = yield symbol.value
+        self.optimized_symbols[symbol.name] = (self.symbol_table.version, expr)
+        if isinstance(expr, types.Push):
+            symbol.value = formats.hex_to_list(expr.data)
+            symbol.type_ = self.symbol_table.ByteArray
+        else:
+            symbol.value = expr
+        yield Result(expr)
 
     def visit_UnaryOpCode(self, node):
-        node.operand = self.visit(node.operand)
+        node.operand = yield node.operand
         # Return the node if its operand isn't a constant value.
         if not get_const(node.operand):
-            return node
+            yield Result(node)
+            return
 
-        return self.evaluator.eval_op(node.name, node.operand) or node
+        yield Result(self.evaluator.eval_op(node.name, node.operand) or node)
 
     def visit_BinOpCode(self, node):
-        node.left, node.right = map(self.visit, [node.left, node.right])
+        node.left = yield node.left
+        node.right = yield node.right
 
         # Optimize order if commutative.
         self.commute_operands(node)
         # Return the node if both operands aren't constant values.
         if not get_all_const(node.left, node.right):
-            return node
+            yield Result(node)
+            return
 
         result = self.evaluator.eval_op(node.name, node.left, node.right)
-        return result or node
+        yield Result(result or node)
 
     def visit_VariableArgsOpCode(self, node):
-        node.operands = map(self.visit, node.operands)
+        node.operands = yield self.visit_list(node.operands)
         # Return the node if not all operands are constant values.
         if not get_all_const(*node.operands):
-            return node
+            yield Result(node)
+            return
 
         result = self.evaluator.eval_op(node.name, *node.operands)
-        return result or node
+        yield Result(result or node)
 
     def visit_VerifyOpCode(self, node):
-        node.test = self.visit(node.test)
-        return node
-
-def params(cls):
-    """Causes the arguments to a method to be converted to cls."""
-    def method_decorator(method):
-        @wraps(method)
-        def wrapper(self, *args):
-            return method(self, *map(cls, args))
-        return wrapper
-    return method_decorator
-
-class ConstEvaluator(object):
-    """Evaluates expressions containing only constant values."""
-    def __init__(self):
-        self.enabled = True
-
-    def eval_op(self, op_name, *args):
-        """Evaluate an opcode."""
-        if not self.enabled:
-            return
-
-        method = getattr(self, op_name, None)
-        if method is None:
-            return
-        result = method(*args)
-        # Convert result to a Push instance.
-        if isinstance(result, int):
-            result = types.Push(hexs.hexs(result))
-        elif isinstance(result, str):
-            if len(result) % 2:
-                result = '0' + result
-            result = types.Push(hexs.format_hex(result))
-        return result
-
-    @params(int)
-    def OP_ABS(self, value):
-        return abs(value)
-
-    @params(int)
-    def OP_NOT(self, value):
-        return int(value == 0)
-
-    @params(int)
-    def OP_0NOTEQUAL(self, value):
-        return int(value != 0)
-
-    @params(int)
-    def OP_NEGATE(self, value):
-        return -value
-
-    @params(int)
-    def OP_ADD(self, left, right):
-        return left + right
-
-    @params(int)
-    def OP_SUB(self, left, right):
-        return left - right
-
-    @params(int)
-    def OP_MUL(self, left, right):
-        return left * right
-
-    @params(int)
-    def OP_DIV(self, left, right):
-        return left / right
-
-    @params(int)
-    def OP_MOD(self, left, right):
-        return left % right
-
-    @params(int)
-    def OP_LSHIFT(self, left, right):
-        return left << right
-
-    @params(int)
-    def OP_RSHIFT(self, left, right):
-        return left >> right
-
-    @params(int)
-    def OP_LESSTHAN(self, left, right):
-        return left < right
-
-    @params(int)
-    def OP_LESSTHANOREQUAL(self, left, right):
-        return left <= right
-
-    @params(int)
-    def OP_GREATERTHAN(self, left, right):
-        return left > right
-
-    @params(int)
-    def OP_GREATERTHANOREQUAL(self, left, right):
-        return left >= right
-
-    @params(int)
-    def OP_MIN(self, left, right):
-        return min(left, right)
-
-    @params(int)
-    def OP_MAX(self, left, right):
-        return max(left, right)
-
-    @params(int)
-    def OP_WITHIN(self, value, min_, max_):
-        return min_ <= value and value < max_
-
-    @params(int)
-    def OP_NUMEQUAL(self, left, right):
-        return left == right
-
-    @params(int)
-    def OP_NUMNOTEQUAL(self, left, right):
-        return left != right
-
-    @params(int)
-    def OP_BOOLAND(self, left, right):
-        return left != 0 and right != 0
-
-    @params(int)
-    def OP_BOOLOR(self, left, right):
-        return left != 0 or right != 0
-
-
-    @params(str)
-    def OP_SIZE(self, s):
-        return len(s) / 2
-
-    @params(str)
-    def OP_EQUAL(self, left, right):
-        return left == right
+        node.test = yield node.test
+        yield Result(node)
@@ -1,8 +1,8 @@
 from functools import wraps
 
-from txsc.transformer import SourceVisitor
+from txsc.transformer import Result, SourceVisitor
 from txsc.ir import formats, structural_nodes
-from txsc.ir.instructions import LInstructions
+from txsc.ir.instructions import CompactInstructions, LInstructions
 import txsc.ir.linear_nodes as types
 
 def returnlist(func):
@@ -18,86 +18,191 @@ def returnlist(func):
         return result
     return wrapper
 
+def shareable(func):
+    """Decorator for visitor methods of nodes whose result can be shared.
+
+    The operations of a shared node are moved before the statement that
+    first uses it, and each use is a reference to the stack item that
+    they produce.
+    """
+    def share(self, node):
+        ops = yield func(self, node)
+        if self.should_share(node, ops):
+            name = 'cse.%d' % len(self.temporaries)
+            self.temporaries[id(node)] = name
+            self.hoisted.extend(ops + [types.Assumption(name, None)])
+            ops = [types.Assumption(name, None)]
+        yield Result(ops)
+
+    @wraps(func)
+    def wrapper(self, node):
+        # Nodes that are used once are not shared.
+        if self.inner_scripts or self.uses.get(id(node), 0) < 2:
+            return func(self, node)
+        name = self.temporaries.get(id(node))
+        if name is None:
+            return share(self, node)
+        return [types.Assumption(name, None)]
+    return wrapper
+
 class StructuralVisitor(SourceVisitor):
-    """Tranforms a structural representation into a linear one."""
-    def transform(self, node, symbol_table=None):
+    """Tranforms a structural representation into a linear one.
+
+    If share_subexpressions is True, a node that is used more than once
+    (i.e. the structural IR is a DAG, see txsc.ir.structural_cse) is
+    computed once, before the statement that first uses it. Its result
+    is named by an assumption with a depth of None: The first occurrence
+    names the item on top of the stack, and the others refer to it.
+    Inlining replaces the references with stack operations like those of
+    other assumptions.
+
+    Visitor methods are generators (see BaseTransformer.visit()), so that
+    deep expressions can be lowered.
+    """
+    def transform(self, node, symbol_table=None, share_subexpressions=False):
         self.symbol_table = symbol_table
+        # {id(node): number of uses, ...}
+        self.uses = {}
+        # {name: number of uses, ...} for assumed stack items.
+        self.item_uses = {}
+        # {id(node): name of the shared result, ...}
+        self.temporaries = {}
+        # Number of inner scripts that are being visited.
+        self.inner_scripts = 0
+        # Operations of shared nodes that the current statement uses first.
+        self.hoisted = []
+        if share_subexpressions:
+            for stmt in node.statements:
+                self.count_uses(stmt)
         self.instructions = LInstructions(self.visit(node))
         return self.instructions
 
-    @returnlist
+    def count_uses(self, node):
+        """Count the uses of node and the nodes it contains."""
+        todo = [node]
+        while todo:
+            node = todo.pop()
+            if isinstance(node, structural_nodes.Symbol):
+                symbol = self.symbol_table.lookup(node.name) if self.symbol_table else None
+                if symbol and symbol.type_ == 'stack_item':
+                    self.item_uses[node.name] = self.item_uses.get(node.name, 0) + 1
+                if not symbol or symbol.type_ != 'expression':
+                    continue
+                node = symbol.value
+            self.uses[id(node)] = self.uses.get(id(node), 0) + 1
+            # Nodes that are shared are only computed once.
+            if self.uses[id(node)] > 1:
+                continue
+            if isinstance(node, structural_nodes.VerifyOpCode):
+                todo.append(node.test)
+            elif isinstance(node, structural_nodes.UnaryOpCode):
+                todo.append(node.operand)
+            elif isinstance(node, structural_nodes.BinOpCode):
+                todo.extend([node.right, node.left])
+            elif isinstance(node, structural_nodes.VariableArgsOpCode):
+                todo.extend(reversed(node.operands))
+
+    def should_share(self, node, ops):
+        """Get whether the result of node (whose operations are ops) should be shared."""
+        uses = self.uses.get(id(node), 0)
+        if uses < 2 or types.opcode_by_name(node.name).verifier:
+            return False
+        # Referring to the shared result costs about as much as OP_PICK.
+        return (uses - 1) * self.ops_cost(ops) > 2 * uses
+
+    def ops_cost(self, ops):
+        """Estimate the size of ops in bytes after inlining."""
+        cost = 0
+        for op in ops:
+            if isinstance(op, types.Push):
+                cost += len(op.data) + 1
+            elif isinstance(op, types.Assumption):
+                # Items that are used elsewhere are near the top of the stack, or must be copied anyway.
+                cost += 2 if self.item_uses.get(op.var_name) == 1 else 1
+            elif isinstance(op, types.InnerScript):
+                cost += 2
+            else:
+                cost += 1
+        return cost
+
     def visit_Script(self, node):
         return_value = []
         for stmt in node.statements:
-            return_value.extend(self.visit(stmt))
-        return return_value
+            self.hoisted = []
+            ops = yield stmt
+            return_value.extend(self.hoisted + ops)
+        yield Result(return_value)
 
-    @returnlist
     def visit_InnerScript(self, node):
         ops = []
-        for stmt in node.statements:
-            ops.extend(self.visit(stmt))
-        return types.InnerScript(ops=ops)
+        self.inner_scripts += 1
+        try:
+            for stmt in node.statements:
+                ops.extend((yield stmt))
+        finally:
+            self.inner_scripts -= 1
+        yield Result([types.InnerScript(ops=CompactInstructions(ops))])
 
     @returnlist
     def visit_Assignment(self, node):
         return None
 
-    @returnlist
     def visit_Symbol(self, node):
         if not self.symbol_table:
             raise Exception('Cannot process symbol: No symbol table was supplied.')
         symbol = self.symbol_table.lookup(node.name)
         if not symbol:
-            raise Exception('Symbol "%s" was not declared.' % node.name)
+            raise NameError('Symbol "%s" was not declared.' % node.name)
         # Add an assumption for the stack item.
         if symbol.type_ == 'stack_item':
-            return types.Assumption(symbol.name, symbol.value)
+            yield Result([types.Assumption(symbol.name, symbol.value)])
         # Push the bytes of the byte array.
         elif symbol.type_ == 'byte_array':
-            return self.visit(structural_nodes.Push(''.join(symbol.value)))
+            yield Result((yield structural_nodes.Push(''.join(symbol.value))))
         # If the type is an expression, then StructuralOptimizer could not simplify it.
         # Evaluate the expression as if it were encountered in the structural IR.
         elif symbol.type_ == 'expression':
-            return self.visit(symbol.value)
+            yield Result((yield symbol.value))
 
     @returnlist
     def visit_Push(self, node):
+        data = formats.hex_to_bytearray(node.data)
         smallint = types.small_int_opcode(int(node))
-        if smallint:
+        # Small integer opcodes push minimally-encoded numbers.
+        if smallint and formats.int_to_scriptnum(int(node)) == data:
             return smallint()
         else:
-            return types.Push(formats.hex_to_bytearray(node.data))
+            return types.Push(data)
 
     @returnlist
     def visit_OpCode(self, node):
         op = types.opcode_by_name(node.name)()
         return op
 
-    @returnlist
     def visit_VerifyOpCode(self, node):
-        return_value = self.visit(node.test)
-        op = types.opcode_by_name(node.name)()
-        return return_value + [op]
+        return_value = yield node.test
+        return_value.append(types.opcode_by_name(node.name)())
+        yield Result(return_value)
 
-    @returnlist
+    @shareable
     def visit_UnaryOpCode(self, node):
-        return_value = self.visit(node.operand)
-        op = types.opcode_by_name(node.name)()
-        return return_value + [op]
+        return_value = yield node.operand
+        return_value.append(types.opcode_by_name(node.name)())
+        yield Result(return_value)
 
-    @returnlist
+    @shareable
     def visit_BinOpCode(self, node):
-        return_value = self.visit(node.left)
-        return_value.extend(self.visit(node.right))
-        op = types.opcode_by_name(node.name)()
-        return return_value + [op]
+        # The operations of the left operand are extended, since chains of operations are usually left-deep.
+        return_value = yield node.left
+        return_value.extend((yield node.right))
+        return_value.append(types.opcode_by_name(node.name)())
+        yield Result(return_value)
 
-    @returnlist
+    @shareable
     def visit_VariableArgsOpCode(self, node):
         return_value = []
         for arg in node.operands:
-            return_value.extend(self.visit(arg))
-        op = types.opcode_by_name(node.name)()
-        return return_value + [op]
+            return_value.extend((yield arg))
+        return_value.append(types.opcode_by_name(node.name)())
+        yield Result(return_value)
 
@@ -0,0 +1,436 @@
+"""Superoptimization of linear instructions.
+
+The superoptimizer replaces windows of instructions with the shortest
+(in bytes) sequences that have the same effect. Sequences are compared
+with a symbolic model of the stack: Values are terms built from the items
+that were on the stack before the window (inputs), the data that the
+window pushes, and the operations that the window performs on them.
+Operations are not evaluated, so two sequences are only equivalent if
+they produce the same terms (up to the commutativity of some operations,
+and the definitions of composite hash opcodes).
+
+A sequence that evaluates a numeric operation may fail where a sequence
+that does not evaluate it succeeds, so equivalent sequences must also
+evaluate the same set of operations that can fail.
+
+Searching is expensive, so its results are stored in a
+SuperoptimizerDatabase, and later compilations only look them up.
+"""
+import errno
+import heapq
+import json
+import os
+import tempfile
+
+from txsc.ir.instructions import CompactInstructions
+from txsc.ir.rule_matcher import parse_node
+import txsc.ir.linear_nodes as types
+
+# Version of the search and the model. Results of other versions are not used.
+SEARCH_VERSION = 1
+# Default path of the database of results.
+DEFAULT_DB_PATH = os.path.join(os.path.expanduser('~'), '.txsc', 'superoptimizer.json')
+
+# {opcode name: (number of items consumed, indices of the consumed items that are output), ...}
+stack_ops = {
+    'OP_DUP': (1, [0, 0]),
+    'OP_DROP': (1, []),
+    'OP_2DROP': (2, []),
+    'OP_NIP': (2, [1]),
+    'OP_SWAP': (2, [1, 0]),
+    'OP_OVER': (2, [0, 1, 0]),
+    'OP_ROT': (3, [1, 2, 0]),
+    'OP_TUCK': (2, [1, 0, 1]),
+    'OP_2DUP': (2, [0, 1, 0, 1]),
+    'OP_3DUP': (3, [0, 1, 2, 0, 1, 2]),
+    'OP_2OVER': (4, [0, 1, 2, 3, 0, 1]),
+    'OP_2SWAP': (4, [2, 3, 0, 1]),
+    'OP_2ROT': (6, [2, 3, 4, 5, 0, 1]),
+}
+
+# {opcode name: (arity, whether it can fail), ...}
+functions = {
+    'OP_1ADD': (1, True),
+    'OP_1SUB': (1, True),
+    'OP_NEGATE': (1, True),
+    'OP_ABS': (1, True),
+    'OP_NOT': (1, True),
+    'OP_0NOTEQUAL': (1, True),
+    'OP_RIPEMD160': (1, False),
+    'OP_SHA1': (1, False),
+    'OP_SHA256': (1, False),
+    'OP_HASH160': (1, False),
+    'OP_HASH256': (1, False),
+    'OP_ADD': (2, True),
+    'OP_SUB': (2, True),
+    'OP_BOOLAND': (2, True),
+    'OP_BOOLOR': (2, True),
+    'OP_NUMEQUAL': (2, True),
+    'OP_NUMNOTEQUAL': (2, True),
+    'OP_LESSTHAN': (2, True),
+    'OP_GREATERTHAN': (2, True),
+    'OP_LESSTHANOREQUAL': (2, True),
+    'OP_GREATERTHANOREQUAL': (2, True),
+    'OP_MIN': (2, True),
+    'OP_MAX': (2, True),
+    'OP_EQUAL': (2, False),
+    'OP_CHECKSIG': (2, True),
+    'OP_WITHIN': (3, True),
+}
+
+# {opcode name: name of the operation of its canonical term, ...} for opcodes that differ.
+result_operations = {
+    'OP_1ADD': 'OP_ADD',
+    'OP_1SUB': 'OP_SUB',
+    'OP_HASH160': 'OP_RIPEMD160',
+    'OP_HASH256': 'OP_SHA256',
+    'OP_GREATERTHAN': 'OP_LESSTHAN',
+    'OP_GREATERTHANOREQUAL': 'OP_LESSTHANOREQUAL',
+}
+
+# Operations whose arguments can be reordered.
+commutative = frozenset(['OP_ADD', 'OP_BOOLAND', 'OP_BOOLOR', 'OP_NUMEQUAL', 'OP_NUMNOTEQUAL',
+                         'OP_MIN', 'OP_MAX', 'OP_EQUAL'])
+
+class ModelError(Exception):
+    """Exception raised when instructions cannot be modeled."""
+    pass
+
+def pushed_data(op):
+    """Get the data that op pushes, or None if it is not a push."""
+    if isinstance(op, types.Push):
+        return op.data
+    if isinstance(op, types.SmallIntOpCode):
+        return chr(op.value) if op.value else ''
+    if isinstance(op, types.NegativeOne):
+        return '\x81'
+    return None
+
+def data_to_small_int(data):
+    """Get the non-negative small integer that data encodes, or None."""
+    if data == '':
+        return 0
+    if len(data) == 1 and ord(data) < 0x80:
+        return ord(data)
+    return None
+
+def shortest_push(data):
+    """Get the shortest node that pushes data."""
+    if data == '\x81':
+        return types.NegativeOne()
+    value = data_to_small_int(data)
+    if value is not None and value <= 16:
+        return types.small_int_opcode(value)()
+    return types.Push(data=data)
+
+def byte_length(ops):
+    """Get the length of ops when they are serialized."""
+    return len(CompactInstructions(ops).serialize())
+
+def make_term(name, args):
+    """Get the canonical term of applying the operation name to args."""
+    if name == 'OP_1ADD':
+        return make_term('OP_ADD', [args[0], ('const', '\x01')])
+    if name == 'OP_1SUB':
+        return make_term('OP_SUB', [args[0], ('const', '\x01')])
+    if name == 'OP_HASH160':
+        return ('OP_RIPEMD160', ('OP_SHA256', args[0]))
+    if name == 'OP_HASH256':
+        return ('OP_SHA256', ('OP_SHA256', args[0]))
+    if name == 'OP_GREATERTHAN':
+        return ('OP_LESSTHAN', args[1], args[0])
+    if name == 'OP_GREATERTHANOREQUAL':
+        return ('OP_LESSTHANOREQUAL', args[1], args[0])
+    if name in commutative:
+        args = sorted(args)
+    return (name,) + tuple(args)
+
+def can_fail(term):
+    """Get whether evaluating term (its outermost operation) can fail."""
+    if term[0] in ('in', 'const'):
+        return False
+    return functions[term[0]][1]
+
+def subterms(term, result):
+    """Add term and all of its subterms to result."""
+    result.add(term)
+    if term[0] not in ('in', 'const'):
+        for arg in term[1:]:
+            subterms(arg, result)
+    return result
+
+def is_modeled(op):
+    """Get whether op can be modeled."""
+    if pushed_data(op) is not None:
+        return True
+    return op.name in stack_ops or op.name in functions or isinstance(op, (types.Pick, types.Roll))
+
+class SymbolicStack(object):
+    """Symbolic model of the stack.
+
+    Attributes:
+        - items (list): Terms on the stack, with the top item last.
+        - num_inputs (int): Number of items from before the modeled instructions.
+        - evaluated (set): Terms of operations that can fail that have been evaluated.
+        - fixed (bool): Whether the inputs are fixed. If they are not, inputs
+            are added when instructions consume more items than there are.
+
+    """
+    def __init__(self, num_inputs=0, fixed=False):
+        self.items = [('in', i) for i in reversed(range(num_inputs))]
+        self.num_inputs = num_inputs
+        self.evaluated = set()
+        self.fixed = fixed
+
+    def pop(self, count):
+        """Pop count items, and return them (top item last)."""
+        while len(self.items) < count:
+            if self.fixed:
+                raise ModelError('Stack underflow')
+            self.items.insert(0, ('in', self.num_inputs))
+            self.num_inputs += 1
+        values = self.items[len(self.items) - count:]
+        del self.items[len(self.items) - count:]
+        return values
+
+    def execute(self, op):
+        """Model the execution of op."""
+        data = pushed_data(op)
+        if data is not None:
+            self.items.append(('const', data))
+        elif op.name in stack_ops:
+            count, outputs = stack_ops[op.name]
+            values = self.pop(count)
+            self.items.extend(values[i] for i in outputs)
+        elif isinstance(op, (types.Pick, types.Roll)):
+            arg = self.pop(1)[0]
+            n = data_to_small_int(arg[1]) if arg[0] == 'const' else None
+            if n is None:
+                raise ModelError('Argument of %s is not known' % op.name)
+            values = self.pop(n + 1)
+            item = values[0]
+            if isinstance(op, types.Roll):
+                del values[0]
+            self.items.extend(values)
+            self.items.append(item)
+        elif op.name in functions:
+            arity = functions[op.name][0]
+            args = self.pop(arity)
+            term = make_term(op.name, args)
+            if can_fail(term):
+                self.evaluated.add(term)
+            self.items.append(term)
+        else:
+            raise ModelError('Cannot model %s' % op.name)
+
+    def state(self):
+        return (tuple(self.items), frozenset(self.evaluated))
+
+def model(ops, num_inputs=0, fixed=False):
+    """Model the execution of ops, and return the resulting SymbolicStack."""
+    stack = SymbolicStack(num_inputs, fixed)
+    for op in ops:
+        stack.execute(op)
+    return stack
+
+def search(ops, max_states=5000):
+    """Find the shortest sequence that is equivalent to ops.
+
+    This is an A* search over states of the stack, ordered by the length
+    in bytes of the sequence that leads to a state plus a lower bound of
+    the length of the rest: the number of terms of the result that remain
+    to be computed. The search stops when a sequence is equivalent to ops,
+    no shorter sequence exists, or max_states states have been examined.
+    Returns a list of nodes that is shorter than ops, or None if none was found.
+
+    Raises ModelError if ops cannot be modeled.
+    """
+    original = model(ops)
+    num_inputs = original.num_inputs
+    target = original.state()
+    max_cost = byte_length(ops)
+    max_height = max(len(target[0]), num_inputs) + 2
+
+    # Values that a sequence may compute. Other values are either useless or
+    # operations that ops does not evaluate.
+    useful = set(target[1])
+    for term in target[0] + tuple(target[1]):
+        subterms(term, useful)
+    computed = frozenset(i for i in useful if i[0] != 'in')
+
+    def remaining(items):
+        """Get the number of terms that still have to be computed."""
+        present = set()
+        for term in items:
+            subterms(term, present)
+        return len(computed - present)
+
+    # Steps that sequences are built from: (nodes, cost) tuples.
+    steps = [([types.opcode_by_name(name)()], 1) for name in sorted(stack_ops)]
+    # Operations whose results are not useful are not tried.
+    operations = set(term[0] for term in computed)
+    for name in sorted(functions):
+        if result_operations.get(name, name) in operations:
+            steps.append(([types.opcode_by_name(name)()], 1))
+    for term in sorted(useful):
+        if term[0] == 'const':
+            node = shortest_push(term[1])
+            steps.append(([node], byte_length([node])))
+    for n in range(2, min(max_height, 17)):
+        arg = types.small_int_opcode(n)()
+        steps.append(([arg, types.Pick()], 2))
+        steps.append(([arg, types.Roll()], 2))
+
+    start = SymbolicStack(num_inputs, fixed=True)
+    # {state: cost, ...}
+    best = {start.state(): 0}
+    queue = [(remaining(start.items), 0, 0, start.state(), [])]
+    counter = 0
+    while queue and counter < max_states:
+        _, cost, _, state, path = heapq.heappop(queue)
+        if state == target:
+            return path
+        if cost > best.get(state, cost):
+            continue
+        for nodes, step_cost in steps:
+            new_cost = cost + step_cost
+            if new_cost >= max_cost:
+                continue
+            stack = SymbolicStack(fixed=True)
+            stack.items, stack.evaluated, stack.num_inputs = list(state[0]), set(state[1]), num_inputs
+            try:
+                for node in nodes:
+                    stack.execute(node)
+            except ModelError:
+                continue
+            if len(stack.items) > max_height or not stack.evaluated.issubset(target[1]):
+                continue
+            if stack.items and stack.items[-1] not in useful and stack.items[-1][0] != 'in':
+                continue
+            estimate = new_cost + remaining(stack.items)
+            new_state = stack.state()
+            if estimate < max_cost and new_cost < best.get(new_state, max_cost):
+                best[new_state] = new_cost
+                counter += 1
+                heapq.heappush(queue, (estimate, new_cost, counter, new_state, path + nodes))
+    return None
+
+def node_to_token(node):
+    """Get the token that represents node in a SuperoptimizerDatabase."""
+    if isinstance(node, types.Push):
+        return '0x' + node.data.encode('hex')
+    return node.name
+
+class SuperoptimizerDatabase(object):
+    """Persistent table of superoptimization results.
+
+    Results are stored in a JSON file. Keys are the tokens (opcode names or
+    hex pushes) of windows of instructions, separated by spaces. Values are
+    the tokens of their replacements, or None if no shorter sequence exists.
+
+    The database may be shared by several processes. It is written to a
+    temporary file and renamed into place, and the results in the file are
+    merged with new results when it is saved.
+    """
+    def __init__(self, path=None):
+        self.path = path or DEFAULT_DB_PATH
+        self.results = self.read()
+        # Results that have not been saved.
+        self.new_results = {}
+
+    def read(self):
+        """Read the results that are stored in the database file."""
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except (IOError, ValueError):
+            return {}
+        if data.get('version') != SEARCH_VERSION:
+            return {}
+        return data.get('results', {})
+
+    def key(self, ops):
+        return ' '.join(node_to_token(i) for i in ops)
+
+    def get(self, ops):
+        """Get (found, replacement) for ops."""
+        key = self.key(ops)
+        if key not in self.results:
+            return False, None
+        tokens = self.results[key]
+        return True, None if tokens is None else [parse_node(i) for i in tokens.split()]
+
+    def put(self, ops, replacement):
+        key = self.key(ops)
+        value = None if replacement is None else self.key(replacement)
+        self.results[key] = self.new_results[key] = value
+
+    def save(self):
+        """Write new results to the database file."""
+        if not self.new_results:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            os.makedirs(directory)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+        results = self.read()
+        results.update(self.new_results)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'version': SEARCH_VERSION, 'results': results}, f, indent=0, sort_keys=True)
+        os.rename(tmp_path, self.path)
+        self.results = results
+        self.new_results = {}
+
+class Superoptimizer(object):
+    """Replaces windows of linear instructions with shorter equivalent sequences.
+
+    Attributes:
+        - database (SuperoptimizerDatabase): Results of previous searches.
+        - max_window (int): Maximum number of instructions in a window.
+        - max_states (int): Maximum number of states examined by a search.
+        - searches (int): Number of searches that have been performed.
+
+    """
+    def __init__(self, database, max_window=5, max_states=5000):
+        self.database = database
+        self.max_window = max_window
+        self.max_states = max_states
+        self.searches = 0
+
+    def replacement(self, ops):
+        """Get the replacement of ops, or None if there is no shorter sequence."""
+        found, result = self.database.get(ops)
+        if found:
+            return result
+        self.searches += 1
+        try:
+            result = search(ops, self.max_states)
+        except ModelError:
+            result = None
+        self.database.put(ops, result)
+        return result
+
+    def optimize(self, instructions):
+        """Superoptimize instructions. Returns whether they were modified."""
+        changed = False
+        i = 0
+        while i < len(instructions):
+            # Length of the run of instructions that can be modeled from i.
+            run = 0
+            while run < self.max_window and i + run < len(instructions) and is_modeled(instructions[i + run]):
+                run += 1
+            for length in range(run, 1, -1):
+                result = self.replacement(instructions[i:i + length])
+                if result is not None:
+                    instructions.replace_slice(i, i + length, result)
+                    changed = True
+                    break
+            else:
+                i += 1
+                continue
+            # Replacements are shorter, so this terminates.
+            i = max(0, i - self.max_window + 1)
+        return changed
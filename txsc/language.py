@@ -1,3 +1,7 @@
+import os
+import sys
+
+from txsc.profiler import null_profiler
 
 class Language(object):
     """A language that source may be written in.
@@ -22,14 +26,202 @@ class Language(object):
     def has_target_visitor(cls):
         return cls.target_visitor is not None
 
-    def process_source(self, *args):
+    @classmethod
+    def prepare(cls):
+        """Build what compiling source in this language needs (e.g. its parser) ahead of time."""
+        pass
+
+    def process_source(self, *args, **kwargs):
         if not self.has_source_visitor():
             raise NotImplementedError()
         visitor = self.source_visitor()
+        if kwargs.get('profiler'):
+            visitor.profiler = kwargs['profiler']
         return visitor.transform(*args)
 
-    def compile_instructions(self, *args):
+    def compile_instructions(self, *args, **kwargs):
         if not self.has_target_visitor():
             raise NotImplementedError()
         visitor = self.target_visitor()
-        return visitor.compile(*args)
+        profiler = kwargs.get('profiler') or null_profiler
+        with profiler.stage('target', args[0] if args else None):
+            return visitor.compile(*args)
+
+def iter_entry_points(group, paths=None):
+    """Yield (name, spec) for every entry point in group.
+
+    Entry points are read from the metadata of the distributions installed
+    in paths (Default: sys.path). Unlike pkg_resources, this does not import
+    anything. spec has the form 'module:attribute'.
+    """
+    if paths is None:
+        paths = sys.path
+    for path in paths:
+        for metadata_dir in _iter_metadata_dirs(path or '.'):
+            filename = os.path.join(metadata_dir, 'entry_points.txt')
+            try:
+                with open(filename, 'r') as f:
+                    lines = f.readlines()
+            except IOError:
+                continue
+            for entry_point in _parse_entry_points(lines, group):
+                yield entry_point
+
+def _iter_metadata_dirs(path):
+    """Yield the distribution metadata directories in path."""
+    try:
+        filenames = os.listdir(path)
+    except OSError:
+        return
+    for filename in sorted(filenames):
+        if filename.endswith(('.egg-info', '.dist-info')):
+            yield os.path.join(path, filename)
+        elif filename.endswith('.egg'):
+            yield os.path.join(path, filename, 'EGG-INFO')
+
+def _parse_entry_points(lines, group):
+    """Yield (name, spec) for the entry points in group of an entry_points.txt file."""
+    section = None
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith(('#', ';')):
+            continue
+        if line.startswith('['):
+            section = line.strip('[]').strip()
+            continue
+        if section != group or '=' not in line:
+            continue
+        name, spec = [i.strip() for i in line.split('=', 1)]
+        # Remove any extras.
+        spec = spec.split('[')[0].strip()
+        yield name, spec
+
+def load_spec(spec):
+    """Load the object that spec ('module:attribute') refers to."""
+    module_name, _, attrs = spec.partition(':')
+    obj = __import__(module_name, fromlist=['__name__'])
+    for attr in filter(None, attrs.split('.')):
+        obj = getattr(obj, attr)
+    return obj
+
+class LanguageRegistry(object):
+    """Registry of languages that are loaded when they are first requested.
+
+    Languages are registered by name with a spec ('module:attribute') that
+    refers to either a Language subclass or a callable that returns a
+    Language subclass or instance (e.g. a plugin's get_lang function).
+    Modules are not imported until a language is requested by name.
+
+    Entry points in entry_point_group are only looked up if a requested
+    name was not registered explicitly. Entry point names are expected to
+    be language names (they are compared case-insensitively), so a name
+    that is neither registered nor an entry point is unknown, and nothing
+    is imported to look it up.
+    """
+    def __init__(self, entry_point_group=None):
+        self.entry_point_group = entry_point_group
+        # {name: spec, ...}
+        self.specs = {}
+        # {name: Language subclass, ...}
+        self.loaded = {}
+        self.entry_points_added = False
+
+    def register(self, name, spec):
+        """Register the language name. Existing registrations take precedence."""
+        self.specs.setdefault(name.lower(), spec)
+
+    def add_entry_points(self):
+        """Register the languages provided by entry points."""
+        if self.entry_points_added or not self.entry_point_group:
+            return
+        self.entry_points_added = True
+        for name, spec in iter_entry_points(self.entry_point_group):
+            self.register(name, spec)
+
+    def names(self):
+        """Get the names of all languages without loading them."""
+        self.add_entry_points()
+        return sorted(set(self.specs.keys()) | set(self.loaded.keys()))
+
+    def get(self, name):
+        """Get the language name, loading it if necessary. Returns None if there is no such language."""
+        key = name.lower()
+        lang = self.loaded.get(key)
+        if lang is None:
+            if key not in self.specs:
+                self.add_entry_points()
+            if key not in self.specs:
+                return None
+            lang = self._load_name(key)
+        if lang.name != name:
+            return None
+        return lang
+
+    def load(self, spec):
+        """Load the Language subclass that spec refers to."""
+        lang = load_spec(spec)
+        if not (isinstance(lang, type) and issubclass(lang, Language)):
+            lang = lang()
+        if isinstance(lang, Language):
+            lang = lang.__class__
+        return lang
+
+    def _load_name(self, key):
+        lang = self.load(self.specs[key])
+        self.loaded[key] = lang
+        self.loaded.setdefault(lang.name.lower(), lang)
+        return lang
+
+    def load_all(self):
+        """Load every registered language."""
+        self.add_entry_points()
+        for key in sorted(self.specs.keys()):
+            if key not in self.loaded:
+                self._load_name(key)
+
+    def languages(self):
+        """Load and return all languages."""
+        self.load_all()
+        langs = set(self.loaded.values())
+        return sorted(langs, key=lambda lang: lang.name)
+
+class LanguageMap(object):
+    """Read-only mapping of names to the languages of a registry that satisfy predicate.
+
+    Languages are loaded as they are looked up, so a membership test only
+    loads the language that is tested.
+    """
+    def __init__(self, registry, predicate):
+        self.registry = registry
+        self.predicate = predicate
+
+    def get(self, name, default=None):
+        lang = self.registry.get(name)
+        if lang is None or not self.predicate(lang):
+            return default
+        return lang
+
+    def __getitem__(self, name):
+        lang = self.get(name)
+        if lang is None:
+            raise KeyError(name)
+        return lang
+
+    def __contains__(self, name):
+        return self.get(name) is not None
+
+    def keys(self):
+        """Get the names of matching languages. This loads every language."""
+        return [lang.name for lang in self.registry.languages() if self.predicate(lang)]
+
+    def values(self):
+        return [self[name] for name in self.keys()]
+
+    def items(self):
+        return [(name, self[name]) for name in self.keys()]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
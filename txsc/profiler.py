@@ -0,0 +1,202 @@
+"""Instrumentation of compilation stages.
+
+A Profiler records a Stage for every part of a compilation that is wrapped
+in profiler.stage(). Each stage records its wall time, the peak memory
+allocated while it ran, and the number of instructions or nodes before and
+after it ran. Stages may be nested.
+
+Memory is traced with tracemalloc if it supports reset_peak() (Python 3.9
+or later). Otherwise, the peak memory of a stage is how much it raised the
+peak resident memory of the process (resource.getrusage()), which is zero
+for stages that stay below an earlier peak.
+
+Code that is instrumented uses null_profiler by default, whose stages do
+nothing, so instrumentation costs almost nothing when profiling is off.
+"""
+import ast
+import sys
+import timeit
+
+from txsc.ir import structural_nodes
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+try:
+    from time import perf_counter as timer
+except ImportError:
+    timer = timeit.default_timer
+
+def count_nodes(instructions):
+    """Get the number of instructions or nodes in instructions.
+
+    Returns None if instructions is not an intermediate representation.
+    """
+    if isinstance(instructions, list):
+        return len(instructions)
+    script = getattr(instructions, 'script', instructions)
+    if isinstance(script, structural_nodes.ScriptOp):
+        return sum(1 for _ in structural_nodes.walk(script))
+    elif isinstance(script, ast.AST):
+        return sum(1 for _ in ast.walk(script))
+    return None
+
+def max_rss():
+    """Get the peak resident memory of the process in bytes."""
+    # ru_maxrss is in bytes on macOS, and in KiB elsewhere.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+
+class Stage(object):
+    """A stage of compilation that is being profiled."""
+    def __init__(self, profiler, name, instructions):
+        self.profiler = profiler
+        self.name = name
+        self.instructions = instructions
+        self.record = None
+
+    def set_output(self, instructions):
+        """Set the instructions that the stage produced."""
+        self.instructions = instructions
+
+    def __enter__(self):
+        self.record = self.profiler.enter(self.name, count_nodes(self.instructions))
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.profiler.exit(self.record, count_nodes(self.instructions))
+        self.instructions = None
+        return False
+
+class Profiler(object):
+    """Records the stages of a compilation.
+
+    Use a Profiler as a context manager around the compilation.
+
+    Attributes:
+        - stages (list): A dict for every stage that ran, in the order
+            that they started. Each has the keys:
+                - name (str): Name of the stage.
+                - depth (int): Number of stages that the stage is nested in.
+                - time (float): Wall time in seconds.
+                - peak_memory (int): Peak memory in bytes (see memory_measure), or
+                    None if memory is not measured.
+                - count_before (int): Number of instructions or nodes before the stage.
+                - count_after (int): Number of instructions or nodes after the stage.
+        - trace_memory (bool): Whether memory allocations are traced.
+        - memory_measure (str): How peak memory is measured: 'tracemalloc' (peak
+            allocated memory), 'max_rss' (increase in peak resident memory), or
+            None if it is not measured.
+
+    """
+    enabled = True
+    def __init__(self, trace_memory=True):
+        self.stages = []
+        self.trace_memory = trace_memory and tracemalloc is not None and hasattr(tracemalloc, 'reset_peak')
+        if self.trace_memory:
+            self.memory_measure = 'tracemalloc'
+        elif trace_memory and resource is not None:
+            self.memory_measure = 'max_rss'
+        else:
+            self.memory_measure = None
+        # Records of the stages that are running.
+        self.stack = []
+        self.started_tracing = False
+        self.start_time = self.total_time = None
+
+    def __enter__(self):
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+        self.start_time = timer()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.total_time = timer() - self.start_time
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+        return False
+
+    def stage(self, name, instructions=None):
+        """Get a context manager that profiles the stage name."""
+        return Stage(self, name, instructions)
+
+    def enter(self, name, count_before):
+        record = {'name': name, 'depth': len(self.stack), 'time': None, 'peak_memory': None,
+                  'count_before': count_before, 'count_after': None}
+        self.stages.append(record)
+        memory = None
+        if self.trace_memory:
+            # Save the peak of the enclosing stage before resetting it.
+            current, peak = tracemalloc.get_traced_memory()
+            if self.stack:
+                parent = self.stack[-1]
+                parent[1] = max(parent[1], peak)
+            tracemalloc.reset_peak()
+            memory = current
+        elif self.memory_measure:
+            memory = max_rss()
+        # [record, peak memory of nested stages, memory at start, start time].
+        self.stack.append([record, 0, memory, timer()])
+        return record
+
+    def exit(self, record, count_after):
+        end = timer()
+        frame = self.stack.pop()
+        assert frame[0] is record
+        record['time'] = end - frame[3]
+        record['count_after'] = count_after
+        if self.trace_memory:
+            peak = max(frame[1], tracemalloc.get_traced_memory()[1])
+            record['peak_memory'] = peak - frame[2]
+            if self.stack:
+                parent = self.stack[-1]
+                parent[1] = max(parent[1], peak)
+        elif self.memory_measure:
+            record['peak_memory'] = max_rss() - frame[2]
+
+    def report(self):
+        """Get the recorded data as a JSON-serializable dict."""
+        return {
+            'total_time': self.total_time,
+            'memory_traced': self.trace_memory,
+            'memory_measure': self.memory_measure,
+            'stages': [dict(i) for i in self.stages],
+        }
+
+class NullStage(object):
+    """Stage that does nothing."""
+    def set_output(self, instructions):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+class NullProfiler(object):
+    """Profiler that does nothing."""
+    enabled = False
+    _stage = NullStage()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def stage(self, name, instructions=None):
+        return self._stage
+
+    def report(self):
+        return None
+
+null_profiler = NullProfiler()
@@ -1,33 +1,73 @@
 from collections import OrderedDict
 import ast
-import sys
-from pkg_resources import iter_entry_points
 
-from txsc.txscript import TxScriptLanguage
-from txsc.asm import ASMLanguage
-from txsc.btcscript import BtcScriptLanguage
+from txsc.cache import CacheEntry, CompilationCache, DEFAULT_MAX_SIZE
+from txsc.language import LanguageMap, LanguageRegistry
+from txsc.profiler import Profiler, null_profiler
 from txsc.symbols import SymbolTable
-from txsc.ir.instructions import LINEAR, STRUCTURAL
-from txsc.ir.structural_visitor import StructuralVisitor
-from txsc.ir.structural_optimizer import StructuralOptimizer
-from txsc.ir.linear_optimizer import LinearOptimizer
-
-# Load known languages in case we're running locally.
-languages = [ASMLanguage, BtcScriptLanguage, TxScriptLanguage]
-for entry_point in iter_entry_points(group='txsc.language'):
-    lang_maker = entry_point.load()
-    lang = lang_maker()
-    if lang.name not in [i.name for i in languages]:
-        languages.append(lang)
-
-class DirectiveError(Exception):
+from txsc.ir.instructions import LINEAR, STRUCTURAL, SerializationError
+from txsc.ir.linear_optimizer import get_matcher
+from txsc.ir.passes import PassManager, PeepholePass, parse_passes, pipelines
+
+# Known languages. Languages added by plugins are discovered through the
+# txsc.language entry point group when they are first requested.
+# Nothing is imported until a language is used.
+languages = LanguageRegistry('txsc.language')
+languages.register('asm', 'txsc.asm.asm_language:ASMLanguage')
+languages.register('btc', 'txsc.btcscript:BtcScriptLanguage')
+languages.register('txscript', 'txsc.txscript.txscript_language:TxScriptLanguage')
+
+def read_source_file(filename, source_langs):
+    """Read the source lines of a file.
+
+    Returns a tuple of (source_lines, source_lang). source_lang is the name
+    of the language in source_langs that the file extension refers to, or
+    None if the extension does not refer to one.
+    """
+    with open(filename, 'r') as f:
+        source_lines = f.readlines()
+    source_lang = None
+    # Detect source language from file extension.
+    names = filename.split('.')
+    if len(names) > 1 and names[-1] in source_langs:
+        source_lang = names[-1]
+    return source_lines, source_lang
+
+class CompilationError(Exception):
+    """Exception raised when source cannot be compiled."""
+    pass
+
+class SourceError(CompilationError):
+    """Exception raised when source is invalid."""
+    pass
+
+class DirectiveError(CompilationError):
     """Exception raised when a directive-related error is encountered."""
     def __init__(self, msg):
         super(DirectiveError, self).__init__('Directive error: %s' % msg)
 
+class PassError(CompilationError):
+    """Exception raised when an invalid pipeline is specified."""
+    def __init__(self, msg):
+        super(PassError, self).__init__('Pass error: %s' % msg)
+
+class LanguageError(CompilationError):
+    """Exception raised when an unknown language is specified."""
+    def __init__(self, msg):
+        super(LanguageError, self).__init__('Language error: %s' % msg)
+
+def unexpected_error(e):
+    """Get a CompilationError for an exception that compilation did not expect."""
+    return CompilationError('%s: %s' % (e.__class__.__name__, e))
+
 class OptimizationLevel(object):
-    """Level of optimization."""
-    max_optimization = 3
+    """Level of optimization.
+
+    Level 4 (superoptimization) is only used if it is requested.
+    """
+    max_optimization = 4
+    # Level that is used if no level is specified.
+    default_optimization = 3
     def __init__(self, value):
         self.set_value(value)
 
@@ -39,6 +79,10 @@ class OptimizationLevel(object):
         self.optimize_structural = value > 1
         # Whether to evaluate constant expressions in the structural IR.
         self.evaluate_structural = value > 2
+        # Whether to search for the shortest equivalents of linear IR sequences.
+        self.superoptimize = value > 3
+        # Name of the pipeline of passes for this level.
+        self.pipeline = 'O%d' % max(0, min(value, self.max_optimization))
 
 class Verbosity(object):
     """Options that depend on verbosity."""
@@ -58,31 +102,68 @@ class ScriptCompiler(object):
     def __init__(self):
         self.outputs = OrderedDict()
         self.symbol_table = None
+        # Optimized linear IR (CompactInstructions) of the last compilation.
+        self.instructions = None
+        self.cache = None
+        self.profiler = null_profiler
+        # Profiling data of the last compilation, if profiling is enabled.
+        self.profile = None
         self.setup_languages()
 
     def setup_languages(self):
-        self.langs = list(languages)
-        self.input_languages = {i.name: i for i in filter(lambda cls: cls.has_source_visitor(), self.langs)}
-        self.output_languages = {i.name: i for i in filter(lambda cls: cls.has_target_visitor(), self.langs)}
+        self.input_languages = LanguageMap(languages, lambda cls: cls.has_source_visitor())
+        self.output_languages = LanguageMap(languages, lambda cls: cls.has_target_visitor())
+
+    @property
+    def langs(self):
+        """All available languages. This loads every language."""
+        return languages.languages()
 
     def setup_options(self, options):
         self.options = options
-        self.optimization = OptimizationLevel(getattr(self.options, 'optimization', OptimizationLevel.max_optimization))
+        self.optimization = OptimizationLevel(getattr(self.options, 'optimization', OptimizationLevel.default_optimization))
         self.verbosity = Verbosity(self.options.verbosity)
 
         # Compilation source and target.
-        self.source_lang = self.input_languages[self.options.source_lang]
-        self.target_lang = self.output_languages[self.options.target_lang]
+        self.source_lang = self.input_languages.get(self.options.source_lang)
+        if self.source_lang is None:
+            raise LanguageError('Invalid source language: "%s" (Known languages: %s)' % (self.options.source_lang, ', '.join(languages.names())))
+        self.target_lang = self.output_languages.get(self.options.target_lang)
+        if self.target_lang is None:
+            raise LanguageError('Invalid target language: "%s" (Known languages: %s)' % (self.options.target_lang, ', '.join(languages.names())))
 
         self.output_file = self.options.output_file
 
+        # Compilation passes.
+        try:
+            pass_names = pipelines[self.optimization.pipeline]
+            spec = getattr(self.options, 'passes', None)
+            if spec:
+                pass_names = parse_passes(spec, pass_names)
+            self.pass_manager = PassManager(pass_names)
+        except ValueError as e:
+            raise PassError(str(e))
+        self.profiling = bool(getattr(self.options, 'profile', None))
+
+        # Compilation cache.
+        cache_dir = getattr(self.options, 'cache_dir', None)
+        if not cache_dir:
+            self.cache = None
+        else:
+            if self.cache is None or self.cache.directory != cache_dir:
+                self.cache = CompilationCache(cache_dir)
+            self.cache.max_size = getattr(self.options, 'cache_size', None) or DEFAULT_MAX_SIZE
+
     def process_directives(self, source_lines):
-        """Parse any directives in source_lines."""
+        """Parse any directives in source_lines.
+
+        Returns the lines of source_lines that are not directives.
+        """
         # Extract directive lines from source_lines.
         directives = {}
         directive_lines = filter(lambda line: line.startswith('@'), source_lines)
+        source_lines = filter(lambda line: not line.startswith('@'), source_lines)
         for i in directive_lines:
-            source_lines.remove(i)
             try:
                 key, value = i[1:].split(' ')
             except ValueError:
@@ -93,7 +174,7 @@ class ScriptCompiler(object):
         # Target language.
         target = directives.get('target')
         if target:
-            if target not in self.output_languages.keys():
+            if target not in self.output_languages:
                 raise DirectiveError('Invalid choice for target: "%s"' % target)
             else:
                 self.target_lang = self.output_languages[target]
@@ -108,56 +189,96 @@ class ScriptCompiler(object):
             else:
                 self.verbosity.set_value(verbosity)
 
+        return source_lines
 
     def compile(self, source_lines):
+        self.profiler = Profiler() if self.profiling else null_profiler
+        with self.profiler:
+            self.compile_lines(source_lines)
+        self.profile = self.profiler.report()
+
+    def compile_lines(self, source_lines):
         self.outputs.clear()
-        self.process_directives(source_lines)
+        source_lines = self.process_directives(source_lines)
 
         if self.verbosity.echo_input:
             self.outputs['Input'] = source_lines
 
+        # Results can only be cached if no intermediate representations are shown.
+        cache_key = None
+        if self.cache and self.verbosity.quiet:
+            pass_names = self.pass_manager.names
+            rules = get_matcher().digest() if PeepholePass.name in pass_names else ''
+            cache_key = self.cache.key(source_lines, self.source_lang.name, self.target_lang.name, ','.join(pass_names), rules)
+            entry = self.cache.get(cache_key)
+            if entry:
+                self.instructions = entry.instructions
+                self.outputs[self.target_lang.name] = entry.output
+                return
+
         self.symbol_table = SymbolTable()
         # Add symbol_table to arguments if the source lang supports it.
         args = [source_lines]
         if self.source_lang.supports_symbol_table:
             args.append(self.symbol_table)
 
+        kwargs = {'profiler': self.profiler} if self.profiler.enabled else {}
+        try:
+            instructions = self.source_lang().process_source(*args, **kwargs)
+        except (SyntaxError, NameError) as e:
+            raise SourceError(str(e))
+        except CompilationError:
+            raise
+        except Exception as e:
+            raise unexpected_error(e)
+
         try:
-            instructions = self.source_lang().process_source(*args)
-        except SyntaxError as e:
-            print('Error encountered during compilation of source:')
-            print(e)
-            sys.exit(1)
+            self.process_ir(instructions)
+        except SerializationError as e:
+            # e.g. An inner script contains assumptions.
+            raise SourceError(str(e))
+        except CompilationError:
+            raise
+        except Exception as e:
+            raise unexpected_error(e)
 
-        self.process_ir(instructions)
+        if cache_key:
+            self.cache.put(cache_key, CacheEntry(self.outputs[self.target_lang.name], self.instructions))
 
     def process_ir(self, instructions):
         """Process intermediate representation."""
+        manager = self.pass_manager
+        manager.cache = self.cache
+        context = manager.context(self.symbol_table, self.profiler)
+        context.superoptimizer_db = getattr(self.options, 'superopt_db', None)
         # Convert structural to linear representation.
         if instructions.ir_type == STRUCTURAL:
             if self.verbosity.show_structural_ir:
                 self.outputs['Structural Intermediate Representation'] = instructions.dump()
             # Optimize structural IR.
-            if self.optimization.optimize_structural:
-                StructuralOptimizer().optimize(instructions, self.symbol_table, self.optimization.evaluate_structural)
+            if manager.structural_passes:
+                instructions = manager.run(instructions, context, manager.structural_passes)
                 if self.verbosity.show_structural_ir:
                     self.outputs['Optimized Structural Representation'] = instructions.dump()
-            instructions = StructuralVisitor().transform(instructions.script, self.symbol_table)
+            instructions = manager.run(instructions, context, manager.lowering_passes)
 
         if self.verbosity.show_linear_ir:
             self.outputs['Linear Intermediate Representation'] = str(instructions)
 
-        # Perform linear IR optimizations. Perform peephole optimizations if specified.
+        # Perform linear IR optimizations.
         # TODO: If the target language supports symbols, do not inline.
-        LinearOptimizer().optimize(instructions, peephole=self.optimization.optimize_linear, inline=True)
+        instructions = manager.run(instructions, context, manager.linear_passes)
         if self.verbosity.show_linear_ir:
             self.outputs['Optimized Linear Representation'] = str(instructions)
+        self.symbol_table = context.symbol_table
 
+        self.instructions = instructions.compact()
         self.process_targets(instructions)
 
     def process_targets(self, instructions):
         """Process compilation targets."""
-        self.outputs[self.target_lang.name] = self.target_lang().compile_instructions(instructions)
+        kwargs = {'profiler': self.profiler} if self.profiler.enabled else {}
+        self.outputs[self.target_lang.name] = self.target_lang().compile_instructions(instructions, **kwargs)
 
     def output(self):
         """Output results."""
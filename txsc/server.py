@@ -0,0 +1,173 @@
+"""Long-running compile server.
+
+The server keeps a single ScriptCompiler (and the languages it has loaded)
+alive between compilations. Requests and responses are newline-delimited
+JSON objects, read from a stream (e.g. stdin) or from a Unix socket.
+
+Request fields:
+    - source (str or list): Source to compile. Required.
+    - id: Opaque value that is echoed in the response.
+    - source_lang (str): Source language.
+    - target_lang (str): Target language.
+    - optimization (int): Optimization level.
+    - verbosity (int): Verbosity level.
+    - passes (str): Passes to run (see --passes).
+
+Omitted fields default to the options the server was started with.
+
+Response fields:
+    - id: The id of the request.
+    - output (str): The compiled output, if compilation succeeded.
+    - error (str): A description of the failure, if compilation failed.
+
+"""
+import copy
+import errno
+import json
+import os
+import socket
+import stat
+
+try:
+    import SocketServer as socketserver
+except ImportError:
+    import socketserver
+
+from txsc.script_compiler import ScriptCompiler
+
+# Request fields that override the server's default options.
+option_fields = ('source_lang', 'target_lang', 'optimization', 'verbosity', 'passes')
+
+class RequestError(Exception):
+    """Exception raised when a request is malformed."""
+    def __init__(self, msg):
+        super(RequestError, self).__init__('Request error: %s' % msg)
+
+class ServerError(Exception):
+    """Exception raised when the server cannot be started."""
+    def __init__(self, msg):
+        super(ServerError, self).__init__('Server error: %s' % msg)
+
+def remove_stale_socket(path):
+    """Remove the Unix socket at path if no server is listening on it.
+
+    Raises ServerError if path is not a socket or a server is listening on it.
+    """
+    try:
+        st = os.lstat(path)
+    except OSError as e:
+        if e.errno == errno.ENOENT:
+            return
+        raise ServerError('Cannot access "%s": %s' % (path, e.strerror))
+    if not stat.S_ISSOCK(st.st_mode):
+        raise ServerError('"%s" exists and is not a socket.' % path)
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except socket.error:
+        # The server that created the socket is gone.
+        os.remove(path)
+        return
+    finally:
+        sock.close()
+    raise ServerError('A server is already listening on "%s".' % path)
+
+def _to_str(value):
+    """Convert a decoded JSON string to a native str."""
+    if not isinstance(value, str):
+        value = value.encode('utf-8')
+    return value
+
+class CompileServer(object):
+    """Compiles requests using one warm ScriptCompiler."""
+    def __init__(self, defaults, compiler=None):
+        self.defaults = defaults
+        self.compiler = compiler if compiler is not None else ScriptCompiler()
+
+    def request_options(self, request):
+        """Get the compilation options for request."""
+        options = copy.copy(self.defaults)
+        options.output_file = None
+        for key in option_fields:
+            value = request.get(key)
+            if value is None:
+                continue
+            if key == 'passes':
+                value = _to_str(value)
+            elif key in ('source_lang', 'target_lang'):
+                value = _to_str(value)
+                languages = self.compiler.input_languages if key == 'source_lang' else self.compiler.output_languages
+                if value not in languages:
+                    raise RequestError('Invalid choice for %s: "%s"' % (key, value))
+            setattr(options, key, value)
+        return options
+
+    def request_source(self, request):
+        """Get the source lines of request."""
+        source = request.get('source')
+        if source is None:
+            raise RequestError('No source was supplied.')
+        if isinstance(source, list):
+            return [_to_str(i) for i in source]
+        return _to_str(source).splitlines(True)
+
+    def handle_request(self, request):
+        """Compile request and return a response."""
+        response = {'id': request.get('id')}
+        try:
+            options = self.request_options(request)
+            source = self.request_source(request)
+            self.compiler.setup_options(options)
+            self.compiler.compile(source)
+            response['output'] = self.compiler.output()
+        except Exception as e:
+            response['error'] = str(e)
+        return response
+
+    def handle_line(self, line):
+        """Handle a JSON-encoded request and return a JSON-encoded response."""
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise RequestError('Request must be an object.')
+        except ValueError as e:
+            response = {'id': None, 'error': 'Request error: %s' % e}
+        except RequestError as e:
+            response = {'id': None, 'error': str(e)}
+        else:
+            response = self.handle_request(request)
+        return json.dumps(response)
+
+    def serve_stream(self, infile, outfile):
+        """Serve requests from infile until it is exhausted."""
+        # readline() is used instead of iteration so that requests are
+        # answered as they arrive rather than when a read buffer fills.
+        for line in iter(infile.readline, ''):
+            if not line.strip():
+                continue
+            outfile.write(self.handle_line(line) + '\n')
+            outfile.flush()
+
+    def make_unix_server(self, path):
+        """Create a server that listens on the Unix socket at path.
+
+        A socket that is left at path by a server that is gone is replaced.
+        """
+        compile_server = self
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                compile_server.serve_stream(self.rfile, self.wfile)
+
+        remove_stale_socket(path)
+        return socketserver.UnixStreamServer(path, Handler)
+
+    def serve_unix(self, path):
+        """Serve requests from connections to the Unix socket at path."""
+        server = self.make_unix_server(path)
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+            if os.path.exists(path):
+                os.remove(path)
@@ -8,7 +8,11 @@ class Symbol(object):
         self.value = value
 
 class SymbolTable(object):
-    """A symbol table."""
+    """A symbol table.
+
+    version is incremented whenever a symbol is assigned, so that results
+    computed from the values of symbols can be invalidated.
+    """
     # Symbol type constants.
     ByteArray = 'byte_array'
     Expr = 'expression'
@@ -16,15 +20,18 @@ class SymbolTable(object):
 
     def __init__(self):
         self.symbols = {}
+        self.version = 0
 
     def insert(self, symbol):
         self.symbols[symbol.name] = symbol
+        self.version += 1
 
     def lookup(self, name):
         return self.symbols.get(name)
 
     def clear(self):
         self.symbols.clear()
+        self.version += 1
 
     def add_symbol(self, name, value, type_):
         self.insert(Symbol(name=name, value=value, type_=type_))
@@ -0,0 +1,66 @@
+import unittest
+
+try:
+    from txsc import aio
+except ImportError:
+    aio = None
+
+from txsc import SourceError
+
+
+@unittest.skipIf(aio is None, 'asyncio is not available')
+class AsyncCompilerTest(unittest.TestCase):
+    def setUp(self):
+        self.loop = aio.asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def _wait(self, futures):
+        return self.loop.run_until_complete(aio.asyncio.gather(*futures, loop=self.loop, return_exceptions=True))
+
+    def test_compile(self):
+        compiler = aio.AsyncCompiler(loop=self.loop)
+        results = self._wait([compiler.compile('2 + 5;', target_lang='asm'), compiler.compile('2 5 ADD', 'asm', 'btc')])
+        self.assertEqual(['2 5 ADD', '525593'], [i.output for i in results])
+
+    def test_coalesce(self):
+        compiler = aio.AsyncCompiler(loop=self.loop)
+        futures = [compiler.compile('2 + 5;', target_lang='asm') for _ in range(10)]
+        futures.append(compiler.compile(['2 + 5;'], target_lang='asm'))
+        futures.append(compiler.compile('2 + 5;', target_lang='btc'))
+        results = self._wait(futures)
+        self.assertEqual(['2 5 ADD'] * 11 + ['525593'], [i.output for i in results])
+        self.assertEqual(2, compiler.compilations)
+        self.assertEqual(10, compiler.coalesced)
+        self.assertEqual({}, compiler.in_flight)
+
+        # Requests are only coalesced while they are in flight.
+        self._wait([compiler.compile('2 + 5;', target_lang='asm')])
+        self.assertEqual(3, compiler.compilations)
+
+    def test_errors(self):
+        compiler = aio.AsyncCompiler(loop=self.loop)
+        results = self._wait([compiler.compile('2 +;'), compiler.compile('2 +;'), compiler.compile('2 + 5;')])
+        self.assertIsInstance(results[0], SourceError)
+        self.assertIsInstance(results[1], SourceError)
+        self.assertEqual('525593', results[2].output)
+
+    def test_cancel(self):
+        compiler = aio.AsyncCompiler(loop=self.loop)
+        futures = [compiler.compile('2 + 5;') for _ in range(2)]
+        futures[0].cancel()
+        self.assertEqual('525593', self.loop.run_until_complete(futures[1]).output)
+
+    def test_backpressure(self):
+        compiler = aio.AsyncCompiler(max_workers=1, max_pending=1, loop=self.loop)
+        futures = [compiler.compile('2 + 5;'), compiler.compile('3 + 5;')]
+        self.assertEqual(1, compiler.running)
+        self.assertEqual(1, len(compiler.pending))
+        self.assertRaises(aio.asyncio.QueueFull, compiler.compile, '4 + 5;')
+        # Identical requests are joined instead of queued.
+        futures.append(compiler.compile('3 + 5;'))
+
+        results = self._wait(futures)
+        self.assertEqual(['525593', '535593', '535593'], [i.output for i in results])
+        self.assertEqual('545593', self._wait([compiler.compile('4 + 5;')])[0].output)
@@ -0,0 +1,87 @@
+import unittest
+from multiprocessing.pool import ThreadPool
+
+import txsc
+from txsc import compile_source, CompilationError, DirectiveError, LanguageError, SourceError
+from txsc.ir.instructions import CompactInstructions
+from txsc.script_compiler import ScriptCompiler
+
+
+class CompileSourceTest(unittest.TestCase):
+    def test_compile(self):
+        result = compile_source('2 + 5 == 7;', target_lang='asm')
+        self.assertEqual('2 5 ADD 7 EQUAL', result.output)
+        self.assertEqual('txscript', result.source_lang)
+        self.assertEqual('asm', result.target_lang)
+        self.assertIsInstance(result.instructions, CompactInstructions)
+        self.assertEqual(5, len(result.instructions))
+        self.assertRaises(AttributeError, setattr, result, 'output', '')
+
+    def test_source_lines(self):
+        src = ['assume a;\n', 'a + 5;\n']
+        result = compile_source(src, target_lang='asm')
+        self.assertEqual('5 ADD', result.output)
+        self.assertEqual(['assume a;\n', 'a + 5;\n'], src)
+
+    def test_directives(self):
+        src = ['@target asm\n', '2 + 5;\n']
+        result = compile_source(src)
+        self.assertEqual('2 5 ADD', result.output)
+        self.assertEqual('asm', result.target_lang)
+        # The caller's source is not modified.
+        self.assertEqual(2, len(src))
+
+    def test_errors(self):
+        for src, source_lang, exc in [
+            ('2 +;', 'txscript', SourceError),
+            ('2 $ 5;', 'txscript', SourceError),
+            ('b + 5;', 'txscript', SourceError),
+            ('foo(1);', 'txscript', SourceError),
+            ('assume a, b; x = {a;}; x;', 'txscript', SourceError),
+            ('2 FOO', 'asm', SourceError),
+            ('4c', 'btc', SourceError),
+            ('@target foo\n2 + 5;', 'txscript', DirectiveError),
+            ('2 + 5;', 'foo', LanguageError),
+        ]:
+            self.assertRaises(exc, compile_source, src, source_lang)
+            self.assertRaises(CompilationError, compile_source, src, source_lang)
+
+    def test_unexpected_errors(self):
+        def process_targets(self, instructions):
+            raise KeyError('foo')
+        original = ScriptCompiler.process_targets
+        ScriptCompiler.process_targets = process_targets
+        try:
+            with self.assertRaises(CompilationError) as cm:
+                compile_source('2 + 5;')
+        finally:
+            ScriptCompiler.process_targets = original
+        self.assertEqual("KeyError: 'foo'", str(cm.exception))
+
+    def test_concurrent(self):
+        # (source, source language, target language, expected output).
+        jobs = [
+            ('%d + %d;' % (i, i + 1), 'txscript', 'asm', '%d %d ADD' % (i, i + 1))
+            for i in range(2, 15)
+        ] + [
+            ('525593', 'btc', 'asm', '2 5 ADD'),
+            ('2 5 ADD 7 EQUAL', 'asm', 'btc', '5255935787'),
+            ('2 $ 5;', 'txscript', 'asm', None),
+        ] * 8
+        def compile_one(job):
+            src, source_lang, target_lang, _ = job
+            try:
+                return compile_source(src, source_lang, target_lang).output
+            except CompilationError:
+                return None
+
+        pool = ThreadPool(8)
+        try:
+            outputs = pool.map(compile_one, jobs * 4)
+        finally:
+            pool.close()
+            pool.join()
+        self.assertEqual([i[3] for i in jobs] * 4, outputs)
+
+    def test_package_exports(self):
+        self.assertIs(compile_source, txsc.compile_source)
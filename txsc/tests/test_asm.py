@@ -1,6 +1,10 @@
+import threading
 import unittest
 
+from ply import lex, yacc
+
 from txsc.asm import ASMLanguage
+from txsc.asm import asm_parser, lextab, parsetab
 
 class BaseASMTest(unittest.TestCase):
     def _do_test(self, expected, script):
@@ -14,3 +18,23 @@ class TestInput(BaseASMTest):
     def test_input(self):
         self._do_test('OP_1 OP_2 OP_ADD', '1 2 ADD')
         self._do_test('70 OP_2 OP_ADD', '0x01 0x70 2 ADD')
+
+class ParserTablesTest(unittest.TestCase):
+    def test_parser_per_thread(self):
+        self.assertIs(asm_parser.get_parser(), asm_parser.get_parser())
+        parsers = []
+        thread = threading.Thread(target=lambda: parsers.append(asm_parser.get_parser()))
+        thread.start()
+        thread.join()
+        self.assertIsNot(asm_parser.get_parser(), parsers[0])
+
+    def test_parsetab_is_current(self):
+        parser = asm_parser.get_parser()
+        pinfo = yacc.ParserReflect(dict((k, getattr(parser, k)) for k in dir(parser)))
+        pinfo.get_all()
+        self.assertEqual(pinfo.signature(), parsetab._lr_signature)
+
+    def test_lextab_is_current(self):
+        lexobj = lex.lex(module=asm_parser.get_parser())
+        for state, retext in lexobj.lexstateretext.items():
+            self.assertEqual(retext, [i[0] for i in lextab._lexstatere[state]])
@@ -0,0 +1,86 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from argparse import Namespace
+
+from txsc import batch
+from txsc.asm import asm_parser
+from txsc.batch import compile_batch, expand_batch_sources
+from txsc.txscript import script_parser
+
+
+class BaseBatchTest(unittest.TestCase):
+    # (filename, source, expected output).
+    sources = [
+        ('a.txscript', '2 + 5;', '2 5 ADD'),
+        ('b.btc', '525593', '2 5 ADD'),
+        ('c.txscript', 'assume a;\na + 5;\n', '5 ADD'),
+        ('d.asm', '2 5 ADD', '2 5 ADD'),
+    ]
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.paths = []
+        for filename, src, _ in self.sources:
+            path = os.path.join(self.tmpdir, filename)
+            with open(path, 'w') as f:
+                f.write(src)
+            self.paths.append(path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _options(self):
+        return Namespace(optimization=2, output_file=None, source_lang='txscript',
+                target_lang='asm', verbosity=0)
+
+class CompileBatchTest(BaseBatchTest):
+    def _test(self, processes):
+        results = list(compile_batch(self.paths, self._options(), processes))
+        self.assertEqual(self.paths, [i.path for i in results])
+        self.assertEqual([i[2] for i in self.sources], [i.output for i in results])
+        self.assertTrue(all(i.error is None for i in results))
+
+    def test_single_process(self):
+        self._test(1)
+
+    def test_process_pool(self):
+        self._test(2)
+
+    def test_errors(self):
+        path = os.path.join(self.tmpdir, 'e.txscript')
+        with open(path, 'w') as f:
+            f.write('2 +;')
+        paths = [path, self.paths[0], os.path.join(self.tmpdir, 'missing.txscript')]
+        results = list(compile_batch(paths, self._options(), 2))
+        self.assertEqual(paths, [i.path for i in results])
+        self.assertIsNotNone(results[0].error)
+        self.assertEqual('2 5 ADD', results[1].output)
+        self.assertIsNotNone(results[2].error)
+
+    def test_init_worker(self):
+        # Parsers are per thread, so a new thread has none until a worker is initialized in it.
+        parsers = []
+        def init():
+            batch._init_worker(Namespace(source_lang='txscript', target_lang='asm'))
+            parsers.extend([getattr(script_parser._local, 'parser', None), getattr(asm_parser._local, 'parser', None)])
+        thread = threading.Thread(target=init)
+        thread.start()
+        thread.join()
+        self.assertIsNotNone(parsers[0])
+        self.assertIsNone(parsers[1])
+
+class ExpandSourcesTest(BaseBatchTest):
+    def test_manifest(self):
+        manifest = os.path.join(self.tmpdir, 'manifest.txt')
+        with open(manifest, 'w') as f:
+            f.write('# Comment.\nb.btc\n\na.txscript\n')
+        expected = [os.path.join(self.tmpdir, i) for i in ['b.btc', 'a.txscript']]
+        self.assertEqual(expected, expand_batch_sources(manifest))
+
+    def test_glob(self):
+        pattern = os.path.join(self.tmpdir, '*.txscript')
+        expected = [os.path.join(self.tmpdir, i) for i in ['a.txscript', 'c.txscript']]
+        self.assertEqual(expected, expand_batch_sources(pattern))
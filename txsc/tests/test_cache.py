@@ -0,0 +1,163 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from argparse import Namespace
+
+from txsc import cache as cache_module
+from txsc.cache import CacheEntry, CompilationCache
+from txsc.ir import linear_optimizer
+from txsc.ir.rule_matcher import RuleMatcher, parse_rules
+from txsc.script_compiler import ScriptCompiler, SourceError
+from txsc.txscript import TxScriptLanguage
+
+
+class BaseCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+class CompilationCacheTest(BaseCacheTest):
+    def test_key(self):
+        key = CompilationCache.key(['2 + 5;'], 'txscript', 'asm', 2)
+        self.assertEqual(key, CompilationCache.key(['2 + 5;'], 'txscript', 'asm', 2))
+        for args in [
+            (['2 + 6;'], 'txscript', 'asm', 2),
+            (['2 + 5;'], 'txscript', 'btc', 2),
+            (['2 + 5;'], 'txscript', 'asm', 3),
+            (['2 +', ' 5;'], 'txscript', 'asm', 2),
+            (['2 + 5;'], 'txscript', 'asm', 2, 'rules'),
+        ]:
+            self.assertNotEqual(key, CompilationCache.key(*args))
+
+    def test_key_format_version(self):
+        key = CompilationCache.key(['2 + 5;'], 'txscript', 'asm', 2)
+        pass_key = CompilationCache.pass_key('lower', '', 'state')
+        version = cache_module.CACHE_FORMAT_VERSION
+        cache_module.CACHE_FORMAT_VERSION = version + 1
+        try:
+            self.assertNotEqual(key, CompilationCache.key(['2 + 5;'], 'txscript', 'asm', 2))
+            self.assertNotEqual(pass_key, CompilationCache.pass_key('lower', '', 'state'))
+        finally:
+            cache_module.CACHE_FORMAT_VERSION = version
+
+    def test_get_and_put(self):
+        cache = CompilationCache(self.tmpdir)
+        key = cache.key(['5;'], 'txscript', 'asm', 2)
+        self.assertIsNone(cache.get(key))
+        cache.put(key, CacheEntry('5', None))
+        self.assertEqual(CacheEntry('5', None), cache.get(key))
+        self.assertEqual((1, 1), (cache.hits, cache.misses))
+
+    def test_corrupt_entry(self):
+        cache = CompilationCache(self.tmpdir)
+        key = cache.key(['5;'], 'txscript', 'asm', 2)
+        cache.put(key, CacheEntry('5', None))
+        with open(cache.entry_path(key), 'wb') as f:
+            f.write('corrupt')
+        self.assertIsNone(cache.get(key))
+        self.assertFalse(os.path.exists(cache.entry_path(key)))
+
+    def test_lru_eviction(self):
+        cache = CompilationCache(self.tmpdir)
+        keys = [cache.key([str(i)], 'txscript', 'asm', 2) for i in range(4)]
+        for i, key in enumerate(keys):
+            cache.put(key, CacheEntry('x' * 100, None))
+            # Give entries distinct modification times.
+            os.utime(cache.entry_path(key), (i, i))
+        # Use the oldest entry so that it is the most recently used.
+        cache.get(keys[0])
+
+        cache.max_size = cache.size() - 1
+        cache.evict()
+        self.assertIsNotNone(cache.get(keys[0]))
+        self.assertIsNone(cache.get(keys[1]))
+        self.assertIsNotNone(cache.get(keys[2]))
+
+    def test_put_evicts_when_full(self):
+        cache = CompilationCache(self.tmpdir)
+        evictions = []
+        evict = cache.evict
+        def record_evict(*args):
+            evictions.append(args)
+            evict(*args)
+        cache.evict = record_evict
+
+        key = cache.key(['0'], 'txscript', 'asm', 2)
+        cache.put(key, CacheEntry('x' * 100, None))
+        cache.max_size = cache.size() * 4
+        for i in range(1, 4):
+            cache.put(cache.key([str(i)], 'txscript', 'asm', 2), CacheEntry('x' * 100, None))
+        self.assertEqual([], evictions)
+        self.assertEqual(cache.max_size, cache.size())
+
+        # Exceeding the maximum size evicts entries until the cache is well under it.
+        cache.put(cache.key(['4'], 'txscript', 'asm', 2), CacheEntry('x' * 100, None))
+        self.assertEqual(1, len(evictions))
+        self.assertLessEqual(cache.size(), cache.max_size * cache_module.EVICTION_RATIO)
+
+class CompilerCacheTest(BaseCacheTest):
+    def _options(self, **kwargs):
+        options = Namespace(optimization=2, output_file=None, source_lang='txscript',
+                target_lang='asm', verbosity=0, cache_dir=self.tmpdir)
+        for k, v in kwargs.items():
+            setattr(options, k, v)
+        return options
+
+    def _compile(self, compiler, src, **kwargs):
+        compiler.setup_options(self._options(**kwargs))
+        compiler.compile(src)
+        return compiler.output()
+
+    def test_cache_hit(self):
+        src = ['assume a;', 'a + 5;']
+        self.assertEqual('5 ADD', self._compile(ScriptCompiler(), list(src)))
+
+        compiler = ScriptCompiler()
+        # Parsing fails if the cache is not used.
+        class UnparsableLanguage(TxScriptLanguage):
+            def process_source(self, *args):
+                raise SyntaxError('Source was parsed.')
+        compiler.input_languages = {'txscript': UnparsableLanguage}
+        self.assertEqual('5 ADD', self._compile(compiler, list(src)))
+        self.assertEqual(['OP_5', 'OP_ADD'], [str(i) for i in compiler.instructions])
+        self.assertEqual(1, compiler.cache.hits)
+
+    def test_cache_miss(self):
+        compiler = ScriptCompiler()
+        self._compile(compiler, ['2 + 5;'])
+        self.assertEqual((0, 6), (compiler.cache.hits, compiler.cache.misses))
+        self.assertEqual('525593', self._compile(compiler, ['2 + 5;'], target_lang='btc'))
+        # The results of the passes are reused.
+        self.assertEqual((5, 7), (compiler.cache.hits, compiler.cache.misses))
+
+    def test_pass_cache(self):
+        compiler = ScriptCompiler()
+        self._compile(compiler, ['2 + 5;'])
+        self.assertEqual('2 5 ADD', self._compile(compiler, ['2 + 5;'], passes='-peephole'))
+        # Only the results of passes that do not depend on the peephole pass are reused.
+        self.assertEqual((3, 8), (compiler.cache.hits, compiler.cache.misses))
+
+    def test_rules_change(self):
+        compiler = ScriptCompiler()
+        self.assertEqual('5 ADD', self._compile(compiler, ['assume a;', 'a + 5;']))
+        # Loading other peephole rules invalidates the results that depend on them.
+        linear_optimizer._matcher = RuleMatcher(parse_rules('5 ADD => 1ADD'))
+        try:
+            self.assertEqual('1ADD', self._compile(compiler, ['assume a;', 'a + 5;']))
+        finally:
+            linear_optimizer._matcher = None
+
+    def test_verbose_compilation_is_not_cached(self):
+        compiler = ScriptCompiler()
+        self._compile(compiler, ['2 + 5;'], verbosity=1)
+
+        compiler = ScriptCompiler()
+        class UnparsableLanguage(TxScriptLanguage):
+            def process_source(self, *args):
+                raise SyntaxError('Source was parsed.')
+        compiler.input_languages = {'txscript': UnparsableLanguage}
+        self.assertRaises(SourceError, self._compile, compiler, ['2 + 5;'])
@@ -0,0 +1,55 @@
+import pickle
+import unittest
+
+from txsc import compile_source
+from txsc.ir.instructions import CompactInstructions, LInstructions
+import txsc.ir.linear_nodes as types
+
+
+class CompactInstructionsTest(unittest.TestCase):
+    def _instructions(self):
+        return LInstructions([types.Assumption('a', 0), types.Push(data='\x11' * 20), types.Zero(), types.IfDup(),
+                              types.Pick(), types.Add(), types.InnerScript(ops=[types.Two(), types.Dup()])])
+
+    def test_round_trip(self):
+        instructions = self._instructions()
+        compact = CompactInstructions(instructions)
+        self.assertEqual(len(instructions), len(compact))
+        self.assertEqual(instructions, list(compact))
+        self.assertEqual(instructions, compact.expand())
+        self.assertIsInstance(compact.expand(), LInstructions)
+        self.assertEqual(str(LInstructions(instructions[:-1])), str(compact[:-1]))
+        self.assertEqual(['assume', 'push', 'OP_0', 'OP_IFDUP', 'OP_PICK', 'OP_ADD', 'innerscript'], compact.names())
+
+    def test_views(self):
+        compact = self._instructions().compact()
+        self.assertIs(types.Add(), compact[-2])
+        self.assertEqual('\x11' * 20, compact[1].data)
+        self.assertRaises(IndexError, compact.__getitem__, 7)
+        # Views are copies.
+        compact[1].data = ''
+        self.assertEqual('\x11' * 20, compact[1].data)
+        self.assertEqual([types.Zero(), types.IfDup()], list(compact[2:4]))
+        self.assertIsInstance(compact[2:4], CompactInstructions)
+
+    def test_equality(self):
+        self.assertEqual(self._instructions().compact(), self._instructions().compact())
+        self.assertNotEqual(CompactInstructions([types.One()]), CompactInstructions([types.Two()]))
+
+    def test_pickle(self):
+        compact = self._instructions().compact()
+        self.assertEqual(compact, pickle.loads(pickle.dumps(compact, pickle.HIGHEST_PROTOCOL)))
+
+    def test_serialize(self):
+        compact = CompactInstructions([types.Zero(), types.Push(data='\x11' * 80), types.Add(),
+                                       types.InnerScript(ops=[types.Two(), types.Dup()])])
+        self.assertEqual('\x00\x4c\x50' + '\x11' * 80 + '\x93\x02\x52\x76', compact.serialize())
+        self.assertRaises(ValueError, CompactInstructions([types.Assumption('a')]).serialize)
+
+    def test_unsupported_node(self):
+        self.assertRaises(TypeError, CompactInstructions, [types.OpCode()])
+
+class CompileInnerScriptTest(unittest.TestCase):
+    def test_inner_script(self):
+        self.assertEqual('0x04 0x52528700', compile_source('{2 == 2; 0;}', target_lang='asm').output)
+        self.assertEqual('0452528700', compile_source('{2 == 2; 0;}').output)
@@ -49,6 +49,22 @@ class CompileTxScriptTest(BaseCompilerTest):
         ]:
             self._test(test)
 
+    def test_trailing_verifications(self):
+        for optimization in [2, 3]:
+            self.compiler.setup_options(self._options())
+            for test in [
+                # Only a verification that is the last statement is redundant.
+                Test('SWAP VERIFY', 'assume a, b; verify a; b;'),
+                Test('15 VERIFY', 'assume a; verify 15; a;'),
+                Test('', 'assume a; verify a;'),
+                Test('', 'assume a; verify a; a;'),
+            ]:
+                options = self._options()
+                options.optimization = optimization
+                self.compiler.setup_options(options)
+                self.compiler.compile(test.src)
+                self.assertEqual(test.expected, self.compiler.output(), test.src)
+
     def test_inner_script(self):
         for test in [
             Test('0x03 0x525393 SWAP 7 ADD', 'assume a; {2 + 3;} a + 7;'),
@@ -63,6 +79,20 @@ class CompileTxScriptTest(BaseCompilerTest):
                'checkSig(sig, pubkey);']
         self._test(Test('DUP HASH160 0x14 0x1111111111111111111111111111111111111111 EQUALVERIFY CHECKSIG', src))
 
+class CompileVerboseTest(BaseCompilerTest):
+    @classmethod
+    def _options(cls):
+        namespace = super(CompileVerboseTest, cls)._options()
+        namespace.verbosity = 2
+        return namespace
+
+    def test_assumptions(self):
+        self._compile('assume a, b;\nverify a == b;')
+        self.assertEqual("Script(statements=[Assignment(name='_stack', value=List(elts=[Name(id='a', ctx=Load()), "
+                         "Name(id='b', ctx=Load())], ctx=Store())), VerifyOpCode(name='OP_VERIFY', "
+                         "test=BinOpCode(name='OP_EQUAL', left=Symbol(name='a'), right=Symbol(name='b')))])",
+                         self.compiler.outputs['Structural Intermediate Representation'])
+
 class CompileBtcScriptTest(BaseCompilerTest):
     @classmethod
     def _options(cls):
@@ -137,3 +167,64 @@ class CompileTxScriptOptimizationsTest(BaseCompilerTest):
             EqualTest('10 LESSTHAN 2 5 LESSTHAN BOOLAND', 'assume a; 2 < 5 and a < 10;', 'assume a; a < 10 and 2 < 5;'),
         ]:
             self._test(test)
+
+class CompileSharedSubexpressionsTest(BaseCompilerTest):
+    @classmethod
+    def _options(cls):
+        namespace = super(CompileSharedSubexpressionsTest, cls)._options()
+        namespace.optimization = 2
+        return namespace
+
+    def test_shared_subexpressions(self):
+        for test in [
+            Test('CHECKSIG', 'assume sig, pk; x = checkSig(sig, pk); verify x; x;'),
+            Test('5 ADD DUP 2 GREATERTHAN VERIFY DUP 9 LESSTHAN VERIFY', 'assume a; x = a + 5; verify x > 2; verify x < 9; x;'),
+            Test('0x05 0x0102030405 SHA256 DUP EQUAL', "sha256('0102030405') == sha256('0102030405');"),
+        ]:
+            self._test(test)
+
+    def test_cheap_subexpressions(self):
+        # Recomputing a + b is cheaper than keeping its result on the stack.
+        self._test(Test('2DUP ADD 0 GREATERTHAN VERIFY OVER ADD 9 LESSTHAN VERIFY',
+                        'assume a, b; verify a + b > 0; verify a + b < 9; a;'))
+
+    def test_trailing_verifications(self):
+        for optimization in [2, 3]:
+            for test in [
+                # Only a verification that is the last statement is redundant.
+                Test('SWAP VERIFY', 'assume a, b; verify a; b;'),
+                Test('15 VERIFY', 'assume a; verify 15; a;'),
+                Test('', 'assume a; verify a;'),
+                Test('', 'assume a; verify a; a;'),
+            ]:
+                options = self._options()
+                options.optimization = optimization
+                self.compiler.setup_options(options)
+                self.compiler.compile(test.src)
+                self.assertEqual(test.expected, self.compiler.output(), test.src)
+
+    def test_inner_script(self):
+        # Inner scripts are executed with their own stack.
+        self._test(Test('0x0f 0x050102030405a8050102030405a887', "{sha256('0102030405') == sha256('0102030405');}"))
+
+class CompileDeepExpressionsTest(BaseCompilerTest):
+    # Deeper than the recursion limit.
+    depth = 2000
+
+    @classmethod
+    def _options(cls):
+        namespace = super(CompileDeepExpressionsTest, cls)._options()
+        namespace.optimization = 3
+        return namespace
+
+    def test_left_deep(self):
+        self._test(Test('0x02 0xd007', ' + '.join(['1'] * self.depth) + ';'))
+        result = self._compile('assume a;\nverify %s > 0;' % ' + '.join(['a'] + ['2'] * self.depth))
+        self.assertEqual(' '.join(['2 ADD'] * self.depth + ['0 GREATERTHAN']), result)
+
+    def test_right_deep(self):
+        result = self._compile('assume a;\n%s;' % ('(2 - ' * self.depth + 'a' + ')' * self.depth))
+        self.assertEqual(['SUB'] * self.depth, result.split()[-self.depth:])
+
+    def test_unary(self):
+        self._test(Test(' '.join(['NOT'] * self.depth), 'assume a;\n%sa;' % ('not ' * self.depth)))
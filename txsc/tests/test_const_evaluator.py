@@ -0,0 +1,110 @@
+import hashlib
+import unittest
+
+from txsc import compile_source
+from txsc.ir.const_evaluator import ConstEvaluator
+from txsc.ir.ripemd160 import ripemd160
+import txsc.ir.structural_nodes as types
+
+
+class ConstEvaluatorTest(unittest.TestCase):
+    def setUp(self):
+        self.evaluator = ConstEvaluator()
+
+    def _eval(self, op_name, *args):
+        result = self.evaluator.eval_op(op_name, *[types.Push(i) for i in args])
+        return result.data if result is not None else None
+
+    def test_arithmetic(self):
+        self.assertEqual('c800', self._eval('OP_ADD', '64', '64'))
+        self.assertEqual('83', self._eval('OP_SUB', '02', '05'))
+        self.assertEqual('', self._eval('OP_SUB', '02', '02'))
+        self.assertEqual('85', self._eval('OP_NEGATE', '05'))
+        self.assertEqual('01', self._eval('OP_LESSTHAN', '81', '01'))
+        self.assertEqual('', self._eval('OP_NOT', '01'))
+        self.assertEqual('01', self._eval('OP_WITHIN', '03', '01', '05'))
+
+    def test_division(self):
+        # Division rounds towards zero, and the remainder has the sign of the dividend.
+        self.assertEqual('82', self._eval('OP_DIV', '87', '03'))
+        self.assertEqual('81', self._eval('OP_MOD', '87', '03'))
+        self.assertEqual(None, self._eval('OP_DIV', '05', ''))
+        self.assertEqual(None, self._eval('OP_MOD', '05', ''))
+
+    def test_shifts(self):
+        self.assertEqual('08', self._eval('OP_LSHIFT', '01', '03'))
+        self.assertEqual('82', self._eval('OP_RSHIFT', '85', '01'))
+        self.assertEqual(None, self._eval('OP_LSHIFT', '01', '81'))
+
+    def test_numeric_operands(self):
+        # Results may be longer than four bytes, but operands may not.
+        self.assertEqual('0000008000', self._eval('OP_ADD', 'ffffff7f', '01'))
+        self.assertEqual(None, self._eval('OP_ADD', '0000008000', '01'))
+        # Operands must be minimally encoded.
+        self.assertEqual(None, self._eval('OP_ADD', '0100', '01'))
+        self.assertEqual(None, self._eval('OP_ADD', '00', '01'))
+
+    def test_splice(self):
+        self.assertEqual('abcd', self._eval('OP_CAT', 'ab', 'cd'))
+        self.assertEqual(None, self._eval('OP_CAT', 'ab' * 520, 'cd'))
+        self.assertEqual('bbcc', self._eval('OP_SUBSTR', 'aabbccdd', '01', '02'))
+        self.assertEqual('ccdd', self._eval('OP_SUBSTR', 'aabbccdd', '02', '05'))
+        self.assertEqual(None, self._eval('OP_SUBSTR', 'aabbccdd', '81', '02'))
+        self.assertEqual('aabb', self._eval('OP_LEFT', 'aabbcc', '02'))
+        self.assertEqual('bbcc', self._eval('OP_RIGHT', 'aabbcc', '02'))
+        self.assertEqual('aabbcc', self._eval('OP_RIGHT', 'aabbcc', '05'))
+        self.assertEqual('02', self._eval('OP_SIZE', '00ab'))
+
+    def test_bitwise(self):
+        self.assertEqual('f00f', self._eval('OP_INVERT', '0ff0'))
+        self.assertEqual('0300', self._eval('OP_AND', '0fff', 'f3'))
+        self.assertEqual('ffff', self._eval('OP_OR', '0fff', 'f0'))
+        self.assertEqual('fcff', self._eval('OP_XOR', '0fff', 'f3'))
+        self.assertEqual('01', self._eval('OP_EQUAL', '00ab', '00ab'))
+        self.assertEqual('', self._eval('OP_EQUAL', 'ab', '00ab'))
+
+    def test_hashes(self):
+        self.assertEqual(hashlib.sha256('\xab').hexdigest(), self._eval('OP_SHA256', 'ab'))
+        self.assertEqual(hashlib.sha1('').hexdigest(), self._eval('OP_SHA1', ''))
+        self.assertEqual(hashlib.sha256(hashlib.sha256('\xab').digest()).hexdigest(), self._eval('OP_HASH256', 'ab'))
+
+    def test_ripemd160(self):
+        self.assertEqual('9c1185a5c5e9fc54612808977ee8f548b2258d31', self._eval('OP_RIPEMD160', ''))
+        self.assertEqual('b472a266d0bd89c13706a4132ccfb16f7c3b9fcb', self._eval('OP_HASH160', ''))
+
+    def test_ripemd160_fallback(self):
+        for data, digest in [
+            ('', '9c1185a5c5e9fc54612808977ee8f548b2258d31'),
+            ('abc', '8eb208f7e05d987a9b044a8e98c6b087f15a0bfc'),
+            ('message digest', '5d0689ef49d2fae572b881b123a85ffa21595f36'),
+            ('1234567890' * 8, '9b752e45573d4b39f4dbd3323cab82bf63326bfb'),
+        ]:
+            self.assertEqual(digest, ripemd160(data).encode('hex'))
+
+    def test_disabled(self):
+        self.evaluator.enabled = False
+        self.assertEqual(None, self._eval('OP_ADD', '01', '02'))
+
+class CompileConstantsTest(unittest.TestCase):
+    def _compile(self, src, optimization=3):
+        return compile_source(src, target_lang='asm', optimization=optimization).output
+
+    def test_symbols(self):
+        self.assertEqual('6', self._compile('x = 2 + 3;\nx + 1;'))
+        self.assertEqual('0x20 0x%s' % hashlib.sha256('\x00\xab').hexdigest(), self._compile("x = '00ab';\nsha256(x);"))
+
+    def test_inner_script(self):
+        # The hash is of the script that is pushed.
+        self.assertEqual('0x01 0x55', self._compile('s = {2 + 3;};\ns;'))
+        self.assertEqual('0x20 0x%s' % hashlib.sha256('\x55').hexdigest(), self._compile('s = {2 + 3;};\nsha256(s);'))
+        self.assertEqual('0x03 0x525393 SHA256', self._compile('s = {2 + 3;};\nsha256(s);', optimization=2))
+
+    def test_zero(self):
+        # OP_0 is a full byte in raw scripts.
+        self.assertEqual('00', compile_source('2 - 2;', target_lang='btc', optimization=3).output)
+        self.assertEqual('0100', compile_source("'00';", target_lang='btc', optimization=3).output)
+
+    def test_failing_operations(self):
+        # Operations that fail when they are executed still fail.
+        self.assertEqual('5 0 DIV', self._compile('5 / 0;'))
+        self.assertEqual('0x05 0x0000008000 1ADD', self._compile('2147483647 + 1 + 1;'))
@@ -0,0 +1,73 @@
+import unittest
+
+from txsc.ir.instructions import LInstructions, SliceView
+import txsc.ir.linear_nodes as types
+
+
+class SliceViewTest(unittest.TestCase):
+    def setUp(self):
+        self.instructions = LInstructions([types.One(), types.Two(), types.Add(), types.Three(), types.Equal()])
+
+    def test_read(self):
+        view = self.instructions.view_slice(1, 4)
+        self.assertEqual(3, len(view))
+        self.assertIs(types.Two(), view[0])
+        self.assertIs(types.Three(), view[-1])
+        self.assertEqual([types.Add(), types.Three()], view[1:])
+        self.assertEqual([types.Two(), types.Add(), types.Three()], list(view))
+        self.assertEqual([types.Two(), types.Add(), types.Three()], view)
+        self.assertRaises(IndexError, view.__getitem__, 3)
+
+    def test_copy_on_write(self):
+        view = self.instructions.view_slice(1, 4)
+        view.append(types.Verify())
+        view[0] = types.Five()
+        self.assertEqual([types.Five(), types.Add(), types.Three(), types.Verify()], list(view))
+        self.assertEqual([types.One(), types.Two(), types.Add(), types.Three(), types.Equal()], self.instructions)
+
+    def test_replace(self):
+        def callback(values):
+            self.assertIsInstance(values, SliceView)
+            values.pop(0)
+            return values
+        self.instructions.replace(0, 2, callback)
+        self.assertEqual([types.Two(), types.Add(), types.Three(), types.Equal()], self.instructions)
+
+    def test_replace_unmodified(self):
+        self.instructions.replace(0, 2, lambda values: values)
+        self.assertEqual(5, len(self.instructions))
+        self.instructions.replace(0, 3, lambda values: values[1:])
+        self.assertEqual([types.Two(), types.Add(), types.Three(), types.Equal()], self.instructions)
+
+class TrackChangesTest(unittest.TestCase):
+    def setUp(self):
+        self.instructions = LInstructions([types.One(), types.Two(), types.Three(), types.Four(), types.Five(), types.Six()])
+
+    def test_untracked(self):
+        self.instructions.append(types.Add())
+        self.assertIsNone(self.instructions.dirty)
+
+    def test_track(self):
+        self.instructions.track_changes()
+        self.assertEqual([(0, 6)], self.instructions.dirty)
+        self.instructions.untrack_changes()
+        self.assertIsNone(self.instructions.dirty)
+
+    def test_ranges(self):
+        instructions = self.instructions
+        instructions.track_changes()
+        instructions.dirty = []
+        instructions.replace_slice(4, 5, [types.Add(), types.Add()])
+        self.assertEqual([(4, 6)], instructions.dirty)
+        # Ranges after an edit are shifted.
+        instructions.replace_slice(0, 2, [])
+        self.assertEqual([(0, 0), (2, 4)], instructions.dirty)
+        # Overlapping ranges are merged.
+        instructions.insert(3, types.Sub())
+        self.assertEqual([(0, 0), (2, 5)], instructions.dirty)
+        instructions.pop()
+        instructions.append(types.Verify())
+        self.assertEqual([(0, 0), (2, 6)], instructions.dirty)
+        del instructions[0]
+        self.assertEqual([(0, 0), (1, 5)], instructions.dirty)
+        self.assertEqual([types.Four(), types.Add(), types.Sub(), types.Add(), types.Verify()], instructions)
@@ -0,0 +1,98 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from txsc.language import LanguageMap, LanguageRegistry, iter_entry_points
+from txsc.script_compiler import languages
+
+
+plugin_module = '''
+from txsc.language import Language
+
+class FakeLanguage(Language):
+    """Fake language."""
+    name = 'fake'
+    source_visitor = object
+
+def get_lang():
+    return FakeLanguage()
+'''
+
+class BaseRegistryTest(unittest.TestCase):
+    module_name = 'txsc_fake_plugin'
+
+    def setUp(self):
+        # Create a fake distribution with a language entry point.
+        self.tmpdir = tempfile.mkdtemp()
+        with open(os.path.join(self.tmpdir, self.module_name + '.py'), 'w') as f:
+            f.write(plugin_module)
+        metadata_dir = os.path.join(self.tmpdir, 'txsc_fake_plugin-0.1.egg-info')
+        os.mkdir(metadata_dir)
+        with open(os.path.join(metadata_dir, 'entry_points.txt'), 'w') as f:
+            f.write('[console_scripts]\nfake = %s:main\n\n' % self.module_name)
+            f.write('[txsc.language]\nFake = %s:get_lang\n' % self.module_name)
+        sys.path.insert(0, self.tmpdir)
+
+    def tearDown(self):
+        sys.path.remove(self.tmpdir)
+        sys.modules.pop(self.module_name, None)
+        shutil.rmtree(self.tmpdir)
+
+class EntryPointsTest(BaseRegistryTest):
+    def test_iter_entry_points(self):
+        entry_points = list(iter_entry_points('txsc.language', [self.tmpdir]))
+        self.assertEqual([('Fake', '%s:get_lang' % self.module_name)], entry_points)
+
+class LanguageRegistryTest(BaseRegistryTest):
+    def _registry(self):
+        registry = LanguageRegistry('txsc.language')
+        registry.register('btc', 'txsc.btcscript:BtcScriptLanguage')
+        return registry
+
+    def test_names_do_not_load_plugins(self):
+        registry = self._registry()
+        self.assertIn('fake', registry.names())
+        self.assertIn('btc', registry.names())
+        self.assertNotIn(self.module_name, sys.modules)
+
+    def test_load_on_demand(self):
+        registry = self._registry()
+        self.assertEqual('btc', registry.get('btc').name)
+        self.assertNotIn(self.module_name, sys.modules)
+
+        lang = registry.get('fake')
+        self.assertIsInstance(lang, type)
+        self.assertEqual('fake', lang.name)
+        self.assertIsNone(registry.get('unknown'))
+
+    def test_unknown_name_does_not_load_plugins(self):
+        registry = self._registry()
+        self.assertIsNone(registry.get('unknown'))
+        self.assertNotIn(self.module_name, sys.modules)
+        self.assertEqual([], registry.loaded.keys())
+
+    def test_language_map(self):
+        registry = self._registry()
+        input_languages = LanguageMap(registry, lambda cls: cls.has_source_visitor())
+        output_languages = LanguageMap(registry, lambda cls: cls.has_target_visitor())
+        self.assertIn('fake', input_languages)
+        self.assertNotIn('fake', output_languages)
+        self.assertRaises(KeyError, output_languages.__getitem__, 'fake')
+        self.assertEqual(['btc'], output_languages.keys())
+
+class StartupTest(unittest.TestCase):
+    def test_import_is_lazy(self):
+        """Importing the compiler does not load languages or pkg_resources."""
+        root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        modules = ['pkg_resources', 'ply', 'txsc.txscript', 'txsc.asm', 'txsc.btcscript']
+        code = ('import sys; import txsc.script_compiler; '
+                'print(",".join(m for m in %r if sys.modules.get(m)))' % modules)
+        env = dict(os.environ, PYTHONPATH=root)
+        output = subprocess.check_output([sys.executable, '-c', code], env=env)
+        self.assertEqual('', output.strip())
+
+    def test_builtin_languages(self):
+        self.assertEqual(['asm', 'btc', 'txscript'], [lang.name for lang in languages.languages()])
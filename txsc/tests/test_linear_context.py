@@ -1,3 +1,5 @@
+import copy
+import pickle
 import unittest
 
 from txsc.ir import formats
@@ -18,8 +20,9 @@ class PickRollTest(BaseContextTest):
         self._do_context(script)
         pick = script[4]
         self.assertIsInstance(pick, types.Pick)
-        self.assertEqual([1, 4], pick.args)
-        node = script[pick.idx - pick.args[1]]
+        args = self.contextualizer.args[4]
+        self.assertEqual([1, 4], args)
+        node = script[4 - args[1]]
         self.assertEqual(5, node.value)
 
 class TestIfDup(BaseContextTest):
@@ -32,14 +35,16 @@ class TestIfDup(BaseContextTest):
             self._do_context(script)
             ifdup = script[2]
             self.assertIsInstance(ifdup, types.IfDup)
-            self.assertEqual(expected_delta, ifdup.delta)
+            self.assertEqual(expected_delta, self.contextualizer.deltas[2])
 
     def test_push(self):
         script = LInstructions([types.One(), types.Push(formats.int_to_bytearray(20)), types.IfDup()])
         self._do_context(script)
         ifdup = script[2]
         self.assertIsInstance(ifdup, types.IfDup)
-        self.assertEqual(1, ifdup.delta)
+        self.assertEqual(1, self.contextualizer.deltas[2])
+        # The delta is not stored on the (shared) node.
+        self.assertIsNone(ifdup.delta)
 
 class TestMultiSig(BaseContextTest):
     def test_multisig(self):
@@ -55,5 +60,20 @@ class TestMultiSig(BaseContextTest):
 
         checkmultisig = script[6]
         self.assertIsInstance(checkmultisig, types.CheckMultiSig)
-        self.assertEqual(2, checkmultisig.num_pubkeys)
-        self.assertEqual(1, checkmultisig.num_sigs)
+        self.assertEqual((2, 1), self.contextualizer.multisig_counts[6])
+        self.assertEqual(range(6), self.contextualizer.args[6])
+
+class OpcodeSingletonTest(unittest.TestCase):
+    def test_singletons(self):
+        self.assertIs(types.Add(), types.Add())
+        self.assertIs(types.small_int_opcode(5)(), types.Five())
+        self.assertIsNot(types.Zero(), types.False_())
+        self.assertIsInstance(types.False_(), types.Zero)
+
+    def test_immutable(self):
+        self.assertRaises(AttributeError, setattr, types.Add(), 'delta', 0)
+        self.assertRaises(AttributeError, setattr, types.Add(), 'idx', 0)
+
+    def test_copy(self):
+        self.assertIs(types.Add(), copy.deepcopy(types.Add()))
+        self.assertIs(types.Add(), pickle.loads(pickle.dumps(types.Add(), pickle.HIGHEST_PROTOCOL)))
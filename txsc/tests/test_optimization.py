@@ -1,7 +1,14 @@
+import os
+import shutil
+import sys
+import tempfile
 import unittest
 
 from txsc.ir.instructions import LInstructions
-from txsc.ir.linear_optimizer import LinearOptimizer
+from txsc.ir import linear_optimizer
+from txsc.ir.linear_optimizer import LinearOptimizer, PeepholeOptimizer, get_matcher
+from txsc.ir.passes import InlinePass, PassContext, PeepholePass
+from txsc.ir.rule_matcher import Rule, RuleMatcher, RuleSyntaxError, parse_rules
 import txsc.ir.linear_nodes as types
 
 class BaseOptimizationTest(unittest.TestCase):
@@ -103,11 +110,185 @@ class InlineTest(BaseOptimizationTest):
         self._do_test('OP_5 OP_ADD', script)
 
     def test_assume_to_pick_or_roll(self):
-        script = LInstructions([types.Five(), types.Assumption('testItem', 0), types.Add()])
-        self._do_test('OP_5 OP_SWAP OP_ADD', script)
+        script = LInstructions([types.Five(), types.Assumption('testItem', 0), types.Sub()])
+        self._do_test('OP_5 OP_SWAP OP_SUB', script)
 
         script = LInstructions([types.Five(), types.Five(), types.Assumption('testItem', 0), types.Add()])
-        self._do_test('OP_5 OP_5 OP_2 OP_ROLL OP_ADD', script)
+        self._do_test('OP_5 OP_5 OP_ROT OP_ADD', script)
 
         script = LInstructions([types.Five(), types.Five(), types.Assumption('testItem', 0), types.Add(), types.Assumption('testItem', 0)])
-        self._do_test('OP_5 OP_5 OP_2 OP_PICK OP_ADD OP_2 OP_ROLL', script)
+        self._do_test('OP_5 OP_5 OP_2 OP_PICK OP_ADD OP_ROT', script)
+
+    def test_commutative_operands(self):
+        # The operands of OP_ADD do not need to be swapped.
+        script = LInstructions([types.Five(), types.Assumption('testItem', 0), types.Add()])
+        self._do_test('OP_5 OP_ADD', script)
+        # OP_LESSTHAN is replaced with OP_GREATERTHAN instead of swapping its operands.
+        script = LInstructions([types.Five(), types.Assumption('testItem', 0), types.LessThan()])
+        self._do_test('OP_5 OP_GREATERTHAN', script)
+
+    def test_resume_after_optimization(self):
+        script = LInstructions([types.Five(), types.Assumption('a', 0), types.Drop(), types.Assumption('b', 1), types.Add()])
+        self._do_test('OP_5 OP_NIP OP_ADD', script)
+
+    def test_many_references(self):
+        refs = 300
+        script = LInstructions([types.Assumption('a', 0), types.Verify()] * refs + [types.Assumption('a', 0)])
+        LinearOptimizer().optimize(script)
+        # The last reference leaves a on the stack, so verifying copies of it is redundant.
+        self.assertEqual([], script)
+
+    def test_zero_add_requires_single_value(self):
+        script = LInstructions([types.Zero(), types.TwoSwap(), types.Add()])
+        PeepholeOptimizer().optimize(script)
+        self.assertEqual([types.Zero(), types.TwoSwap(), types.Add()], script)
+        script = LInstructions([types.Zero(), types.Five(), types.Add()])
+        PeepholeOptimizer().optimize(script)
+        self.assertEqual([types.Five()], script)
+
+class RuleMatcherTest(unittest.TestCase):
+    def test_priority(self):
+        first = Rule([types.One(), types.Roll()], [types.Swap()])
+        second = Rule([types.One(), None], [])
+        matcher = RuleMatcher([first, second])
+        script = LInstructions([types.One(), types.Roll()])
+        self.assertIs(first, matcher.match(script, 0))
+        self.assertIs(second, matcher.match(LInstructions([types.One(), types.Pick()]), 0))
+        self.assertIsNone(matcher.match(script, 1))
+
+    def test_class_edges(self):
+        strict = Rule([types.Push('\x05'), types.Add()], [])
+        loose = Rule([types.SmallIntOpCode(), types.Push(), types.Add()], [], strict=False)
+        matcher = RuleMatcher([strict, loose])
+        self.assertIs(strict, matcher.match(LInstructions([types.Push('\x05'), types.Add()]), 0))
+        self.assertIsNone(matcher.match(LInstructions([types.Push('\x06'), types.Add()]), 0))
+        self.assertIs(loose, matcher.match(LInstructions([types.Seven(), types.Push('\x06'), types.Add()]), 0))
+        self.assertIsNone(RuleMatcher([Rule([types.SmallIntOpCode()], [])]).match(LInstructions([types.Seven()]), 0))
+
+    def test_apply_cascades(self):
+        # Removing OP_0 OP_ROLL creates a match of OP_DROP OP_DROP.
+        matcher = RuleMatcher([Rule([types.Zero(), types.Roll()], []),
+                               Rule([types.Drop(), types.Drop()], [types.TwoDrop()])])
+        script = LInstructions([types.Drop(), types.Zero(), types.Roll(), types.Drop()])
+        self.assertTrue(matcher.apply(script))
+        self.assertEqual([types.TwoDrop()], script)
+        self.assertFalse(matcher.apply(script))
+
+    def test_rules_must_remove_instructions(self):
+        self.assertRaises(ValueError, RuleMatcher, [Rule([types.Swap()], [types.Swap(), types.Swap()])])
+        # The length of a static replacement is used, rather than a declared cost.
+        self.assertRaises(ValueError, RuleMatcher, [Rule([types.Swap()], [types.Swap()], cost=-1)])
+
+    def test_apply_skips_replacements_that_are_not_shorter(self):
+        rule = Rule([types.Swap()], lambda values: [types.Swap(), types.Swap()], cost=-1)
+        script = LInstructions([types.Swap()])
+        self.assertFalse(RuleMatcher([rule]).apply(script))
+        self.assertEqual([types.Swap()], script)
+
+    def test_digest(self):
+        rules = parse_rules('1 PICK => OVER\n0 ROLL =>')
+        digest = RuleMatcher(rules).digest()
+        self.assertEqual(digest, RuleMatcher(parse_rules('1 PICK => OVER\n0 ROLL =>')).digest())
+        for other in [rules[:1], list(reversed(rules)), parse_rules('1 PICK => OVER\n1 ROLL => SWAP')]:
+            self.assertNotEqual(digest, RuleMatcher(other).digest())
+        # Rules that are not from rule files are described by their replacements.
+        self.assertNotEqual(RuleMatcher([Rule([types.Dup(), types.Drop()], [])]).digest(),
+                            RuleMatcher([Rule([types.Dup(), types.Drop()], lambda values: [])]).digest())
+
+    def test_compiled_once(self):
+        self.assertIs(get_matcher(), get_matcher())
+
+class PeepholeOptimizerTest(unittest.TestCase):
+    def test_incremental(self):
+        optimizer = PeepholeOptimizer()
+        script = LInstructions([types.Five(), types.Drop(), types.Drop(), types.Seven()])
+        optimizer.optimize(script)
+        self.assertEqual([types.Five(), types.TwoDrop(), types.Seven()], script)
+        self.assertEqual([], script.dirty)
+        # Only the modified range is examined, but matches that overlap it are found.
+        script[2:3] = [types.Sha256(), types.Equal(), types.Verify()]
+        optimizer.optimize(script)
+        self.assertEqual([types.Five(), types.TwoDrop(), types.Sha256(), types.EqualVerify()], script)
+
+    def test_no_pass_limit(self):
+        # Each OP_1 OP_ROLL OP_1 OP_ROLL removal exposes another one.
+        script = LInstructions([types.Seven()] + [types.One(), types.Roll()] * 20 + [types.One(), types.Roll()] * 20)
+        PeepholeOptimizer().optimize(script)
+        self.assertEqual([types.Seven()], script)
+
+class RuleFileTest(unittest.TestCase):
+    def test_parse(self):
+        rules = parse_rules('''
+            # Comment.
+            [stack]
+            1 PICK => OP_OVER
+            $x 0 ADD => $x  # Trailing comment.
+            $x:PUSH 2 MUL => $x 2MUL ; loose
+            0x0102 20 DROP DROP =>
+        ''')
+        self.assertEqual(['stack'] * 4, [rule.name for rule in rules])
+        self.assertEqual([types.One(), types.Pick()], rules[0].template)
+        self.assertEqual([types.Over()], rules[0].callback(None))
+        self.assertEqual([None, types.Zero(), types.Add()], rules[1].template)
+        self.assertEqual([types.Five()], rules[1].callback([types.Five(), types.Zero(), types.Add()]))
+        self.assertFalse(rules[2].strict)
+        self.assertEqual([types.Push(), types.Two(), types.Mul()], rules[2].template)
+        self.assertEqual([-1, -2, -1, -4], [rule.cost for rule in rules])
+        self.assertEqual(types.Push('\x01\x02'), rules[3].template[0])
+        self.assertEqual(types.Push('\x14'), rules[3].template[1])
+
+    def test_errors(self):
+        for text in ['1 PICK OVER', 'DUP => NOTANOPCODE', '$x => $y', '$x $x ADD => $x',
+                     '$x:PUSH ADD => $x', '1 ADD => 1ADD ; fast', '=>', 'OVER => 1 PICK', 'OVER => OVER',
+                     'SWAP => SWAP SWAP ; cost=-1', 'SWAP => ; cost=-1']:
+            self.assertRaises(RuleSyntaxError, parse_rules, text)
+
+    def test_builtin_rules(self):
+        rules = linear_optimizer.builtin_rules()
+        self.assertTrue(rules)
+        self.assertTrue(all(rule.cost < 0 for rule in rules))
+
+class PluginRulesTest(unittest.TestCase):
+    module_name = 'txsc_fake_rules_plugin'
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        with open(os.path.join(self.tmpdir, self.module_name + '.py'), 'w') as f:
+            f.write('from txsc.ir.rule_matcher import parse_rules\n')
+            f.write('def get_rules():\n    return parse_rules("SWAP SWAP =>")\n')
+        metadata_dir = os.path.join(self.tmpdir, 'txsc_fake_rules_plugin-0.1.egg-info')
+        os.mkdir(metadata_dir)
+        with open(os.path.join(metadata_dir, 'entry_points.txt'), 'w') as f:
+            f.write('[txsc.peephole]\nswaps = %s:get_rules\n' % self.module_name)
+        sys.path.insert(0, self.tmpdir)
+        linear_optimizer._matcher = None
+
+    def tearDown(self):
+        sys.path.remove(self.tmpdir)
+        sys.modules.pop(self.module_name, None)
+        shutil.rmtree(self.tmpdir)
+        linear_optimizer._matcher = None
+
+    def test_plugin_rules_must_remove_instructions(self):
+        with open(os.path.join(self.tmpdir, self.module_name + '.py'), 'w') as f:
+            f.write('from txsc.ir.rule_matcher import Rule\n')
+            f.write('import txsc.ir.linear_nodes as types\n')
+            f.write('def get_rules():\n    return [Rule([types.Swap()], [types.Swap(), types.Swap()], cost=-1)]\n')
+        self.assertRaises(ValueError, get_matcher)
+
+    def test_plugin_rules_cache_token(self):
+        context = PassContext(pass_names=['inline', 'peephole'])
+        tokens = [PeepholePass().cache_token(context), InlinePass().cache_token(context)]
+        sys.path.remove(self.tmpdir)
+        linear_optimizer._matcher = None
+        try:
+            self.assertNotEqual(tokens[0], PeepholePass().cache_token(context))
+            self.assertNotEqual(tokens[1], InlinePass().cache_token(context))
+        finally:
+            sys.path.insert(0, self.tmpdir)
+
+    def test_plugin_rules(self):
+        script = LInstructions([types.Five(), types.Swap(), types.Swap()])
+        PeepholeOptimizer().optimize(script)
+        self.assertEqual([types.Five()], script)
+        self.assertEqual('swaps', get_matcher().match(LInstructions([types.Swap(), types.Swap()]), 0).name)
@@ -0,0 +1,54 @@
+import unittest
+
+from txsc import compile_source, PassError
+from txsc.ir.passes import PassManager, parse_passes, pipelines
+
+
+class ParsePassesTest(unittest.TestCase):
+    def test_pipeline(self):
+        self.assertEqual(pipelines['O1'], parse_passes('O1', pipelines['O3']))
+
+    def test_explicit(self):
+        self.assertEqual(['peephole', 'inline'], parse_passes('peephole, inline', pipelines['O3']))
+
+    def test_modify_default(self):
+        self.assertEqual(['structural-optimize', 'structural-cse', 'lower', 'inline'], parse_passes('-peephole', pipelines['O2']))
+        self.assertEqual(pipelines['O1'] + ['structural-evaluate'], parse_passes('+structural-evaluate', pipelines['O1']))
+        self.assertEqual(pipelines['O2'], parse_passes('+peephole', pipelines['O2']))
+
+    def test_unknown(self):
+        self.assertRaises(ValueError, parse_passes, 'foo', [])
+        self.assertRaises(ValueError, parse_passes, '-foo', [])
+
+class PassManagerTest(unittest.TestCase):
+    def test_order(self):
+        manager = PassManager(['peephole', 'structural-evaluate', 'inline', 'lower'])
+        self.assertEqual(['structural-evaluate', 'lower', 'peephole', 'inline'], manager.names)
+
+    def test_required_passes(self):
+        manager = PassManager(['peephole'])
+        self.assertEqual(['lower', 'peephole', 'inline'], manager.names)
+
+    def test_unknown(self):
+        self.assertRaises(ValueError, PassManager, ['foo'])
+
+class CompilePassesTest(unittest.TestCase):
+    src = 'assume a;\nverify a + 2 == 7;\nverify 2 + 5 == 7;\n'
+
+    def test_pipelines_match_optimization_levels(self):
+        for level in range(4):
+            self.assertEqual(compile_source(self.src, target_lang='asm', optimization=level).output,
+                             compile_source(self.src, target_lang='asm', passes='O%d' % level).output)
+
+    def test_modify_pipeline(self):
+        self.assertEqual('0 ROLL 2 ADD 7 EQUAL VERIFY 2 5 ADD 7 EQUAL VERIFY',
+                         compile_source(self.src, target_lang='asm', optimization=2, passes='-peephole').output)
+        self.assertEqual('2 ADD 7 EQUALVERIFY 1',
+                         compile_source(self.src, target_lang='asm', optimization=2, passes='+structural-evaluate').output)
+
+    def test_linear_source(self):
+        # Structural passes do not apply to linear sources.
+        self.assertEqual('2 5 ADD', compile_source('2 5 ADD', 'asm', 'asm', passes='structural-evaluate').output)
+
+    def test_invalid(self):
+        self.assertRaises(PassError, compile_source, self.src, passes='foo')
@@ -0,0 +1,66 @@
+import unittest
+
+from txsc import compile_source
+from txsc.ir.linear_optimizer import peephole_optimizers
+from txsc.profiler import Profiler, null_profiler
+
+
+class ProfilerTest(unittest.TestCase):
+    def test_stages(self):
+        profiler = Profiler()
+        with profiler:
+            with profiler.stage('outer', [1, 2, 3]) as stage:
+                with profiler.stage('inner', [1]):
+                    pass
+                stage.set_output([1])
+        stages = profiler.report()['stages']
+        self.assertEqual(['outer', 'inner'], [i['name'] for i in stages])
+        self.assertEqual([0, 1], [i['depth'] for i in stages])
+        self.assertEqual((3, 1), (stages[0]['count_before'], stages[0]['count_after']))
+        self.assertEqual((1, 1), (stages[1]['count_before'], stages[1]['count_after']))
+        self.assertGreaterEqual(stages[0]['time'], stages[1]['time'])
+        self.assertIsNotNone(profiler.report()['total_time'])
+
+    def test_memory(self):
+        profiler = Profiler()
+        with profiler:
+            with profiler.stage('allocate'):
+                [[i] for i in range(100000)]
+        report = profiler.report()
+        self.assertIn(report['memory_measure'], ['tracemalloc', 'max_rss'])
+        self.assertGreaterEqual(report['stages'][0]['peak_memory'], 0)
+
+        profiler = Profiler(trace_memory=False)
+        with profiler:
+            with profiler.stage('allocate'):
+                pass
+        self.assertIsNone(profiler.report()['memory_measure'])
+        self.assertIsNone(profiler.report()['stages'][0]['peak_memory'])
+
+    def test_null_profiler(self):
+        self.assertIs(null_profiler.stage('a'), null_profiler.stage('b', []))
+        with null_profiler:
+            with null_profiler.stage('a') as stage:
+                stage.set_output([])
+        self.assertIsNone(null_profiler.report())
+
+class CompileProfileTest(unittest.TestCase):
+    def test_profile(self):
+        result = compile_source('assume a, b;\nverify a + b == 7;\n', profile=True)
+        names = [i['name'] for i in result.profile['stages']]
+        for name in ['parse', 'ScriptTransformer', 'structural-optimize', 'lower', 'inline',
+                     'StackScheduler', 'peephole', 'peephole_rules', 'target']:
+            self.assertIn(name, names)
+        for func in peephole_optimizers:
+            self.assertIn(func.__name__, names)
+        self.assertEqual('target', names[-1])
+        self.assertEqual(['parse', 'ScriptTransformer'], names[:2])
+
+    def test_linear_source(self):
+        result = compile_source('2 5 ADD', 'asm', profile=True)
+        stage = result.profile['stages'][0]
+        self.assertEqual('parse', stage['name'])
+        self.assertEqual(3, stage['count_after'])
+
+    def test_no_profile(self):
+        self.assertIsNone(compile_source('2 + 5;').profile)
@@ -0,0 +1,130 @@
+import json
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import unittest
+from argparse import Namespace
+from StringIO import StringIO
+
+from txsc.server import CompileServer, ServerError
+
+
+class BaseServerTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = CompileServer(cls._options())
+
+    @classmethod
+    def _options(cls):
+        return Namespace(optimization=2, output_file=None, source_lang='txscript',
+                target_lang='asm', verbosity=0)
+
+    def _request(self, **kwargs):
+        return json.loads(self.server.handle_line(json.dumps(kwargs)))
+
+class HandleRequestTest(BaseServerTest):
+    def test_compile(self):
+        response = self._request(id=1, source='2 + 5 == 7;')
+        self.assertEqual({'id': 1, 'output': '2 5 ADD 7 EQUAL'}, response)
+
+    def test_source_lines(self):
+        response = self._request(id=2, source=['assume a;', 'a + 5;'])
+        self.assertEqual('5 ADD', response['output'])
+
+    def test_options(self):
+        response = self._request(id=3, source='525593', source_lang='btc')
+        self.assertEqual('2 5 ADD', response['output'])
+
+        response = self._request(id=4, source='2 + 5;', target_lang='btc')
+        self.assertEqual('525593', response['output'])
+
+    def test_directives(self):
+        response = self._request(id=5, source='@target btc\n2 + 5;\n')
+        self.assertEqual('525593', response['output'])
+        # Directives do not leak into the next request.
+        response = self._request(id=6, source='2 + 5;')
+        self.assertEqual('2 5 ADD', response['output'])
+
+    def test_errors(self):
+        for request in [
+            {'id': 7, 'source': '2 +;'},
+            {'id': 7, 'source': '2 + 5;', 'target_lang': 'unknown'},
+            {'id': 7},
+        ]:
+            response = self._request(**request)
+            self.assertEqual(7, response['id'])
+            self.assertIn('error', response)
+            self.assertNotIn('output', response)
+
+        response = json.loads(self.server.handle_line('not json'))
+        self.assertIn('error', response)
+
+class ServeTest(BaseServerTest):
+    def test_serve_stream(self):
+        requests = [
+            json.dumps({'id': 1, 'source': '2 + 5;'}),
+            '',
+            json.dumps({'id': 2, 'source': '2 +;'}),
+            json.dumps({'id': 3, 'source': '5;'}),
+        ]
+        outfile = StringIO()
+        self.server.serve_stream(StringIO('\n'.join(requests) + '\n'), outfile)
+        responses = [json.loads(i) for i in outfile.getvalue().splitlines()]
+        self.assertEqual([1, 2, 3], [i['id'] for i in responses])
+        self.assertEqual('2 5 ADD', responses[0]['output'])
+        self.assertIn('error', responses[1])
+        self.assertEqual('5', responses[2]['output'])
+
+    def test_serve_unix(self):
+        tmpdir = tempfile.mkdtemp()
+        path = os.path.join(tmpdir, 'txsc.sock')
+        unix_server = self.server.make_unix_server(path)
+        thread = threading.Thread(target=unix_server.handle_request)
+        thread.start()
+        try:
+            client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            client.connect(path)
+            client.sendall(json.dumps({'id': 1, 'source': '2 + 5;'}) + '\n')
+            client.shutdown(socket.SHUT_WR)
+            response = json.loads(client.makefile().readline())
+            client.close()
+        finally:
+            thread.join()
+            unix_server.server_close()
+            shutil.rmtree(tmpdir)
+        self.assertEqual({'id': 1, 'output': '2 5 ADD'}, response)
+
+    def test_stale_socket(self):
+        tmpdir = tempfile.mkdtemp()
+        path = os.path.join(tmpdir, 'txsc.sock')
+        try:
+            # A socket that nothing listens on is replaced.
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.bind(path)
+            sock.close()
+            self.server.make_unix_server(path).server_close()
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_existing_path(self):
+        tmpdir = tempfile.mkdtemp()
+        path = os.path.join(tmpdir, 'txsc.sock')
+        try:
+            with open(path, 'w') as f:
+                f.write('data')
+            self.assertRaises(ServerError, self.server.make_unix_server, path)
+            with open(path) as f:
+                self.assertEqual('data', f.read())
+
+            # A socket that a server listens on is not replaced.
+            os.remove(path)
+            unix_server = self.server.make_unix_server(path)
+            try:
+                self.assertRaises(ServerError, self.server.make_unix_server, path)
+                self.assertTrue(os.path.exists(path))
+            finally:
+                unix_server.server_close()
+        finally:
+            shutil.rmtree(tmpdir)
@@ -0,0 +1,65 @@
+import random
+import unittest
+
+from txsc.ir.instructions import LInstructions
+from txsc.ir.stack_index import node_delta
+import txsc.ir.linear_nodes as types
+
+
+def brute_height(instructions, idx):
+    total, previous = 0, None
+    for op in instructions[:idx]:
+        delta = node_delta(op, previous)
+        if delta is None:
+            return None
+        total += delta
+        previous = op
+    return total
+
+class StackIndexTest(unittest.TestCase):
+    def test_height(self):
+        instructions = LInstructions([types.One(), types.Two(), types.Add(), types.Zero(), types.IfDup(), types.Drop()])
+        index = instructions.build_index()
+        self.assertEqual([0, 1, 2, 1, 2, 2, 1], [index.height(i) for i in range(7)])
+        # The delta of OP_IFDUP depends on the instruction before it.
+        instructions[3] = types.Five()
+        self.assertEqual([2, 3, 2], [index.height(i) for i in range(4, 7)])
+        instructions[3] = types.Dup()
+        self.assertEqual([None, None], [index.height(i) for i in range(5, 7)])
+        self.assertEqual(2, index.height(4))
+
+    def test_occurrences(self):
+        instructions = LInstructions([types.Assumption('a', 0), types.Assumption('b', 1), types.Add(), types.Assumption('a', 0)])
+        index = instructions.build_index()
+        self.assertEqual([1, 1, 1, 0], [index.occurrences_after('a', i) for i in range(4)])
+        instructions.replace_slice(1, 3, [types.Assumption('a', 0), types.Two()])
+        self.assertEqual([2, 1, 1, 0], [index.occurrences_after('a', i) for i in range(4)])
+        self.assertEqual(0, index.occurrences_after('b', 0))
+        del instructions[0]
+        self.assertEqual([1, 1, 0], [index.occurrences_after('a', i) for i in range(3)])
+
+    def test_drop_index(self):
+        instructions = LInstructions([types.One()])
+        index = instructions.build_index()
+        instructions.drop_index()
+        instructions.append(types.Two())
+        self.assertIsNone(instructions.stack_index)
+        self.assertEqual(1, len(index))
+
+    def test_random_edits(self):
+        rng = random.Random(0)
+        pool = [types.Zero(), types.One(), types.Add(), types.Dup(), types.IfDup(), types.Drop(),
+                types.Push(data='\x05'), types.Assumption('a', 0), types.Assumption('b', 1)]
+        for _ in range(50):
+            instructions = LInstructions([rng.choice(pool) for _ in range(rng.randint(0, 30))])
+            index = instructions.build_index()
+            for _ in range(10):
+                start = rng.randint(0, len(instructions))
+                end = rng.randint(start, len(instructions))
+                instructions.replace_slice(start, end, [rng.choice(pool) for _ in range(rng.randint(0, 4))])
+                self.assertEqual(len(instructions), len(index))
+                for i in range(len(instructions) + 1):
+                    self.assertEqual(brute_height(instructions, i), index.height(i))
+                for i in range(len(instructions)):
+                    expected = len([op for op in instructions[i+1:] if isinstance(op, types.Assumption) and op.var_name == 'a'])
+                    self.assertEqual(expected, index.occurrences_after('a', i))
@@ -0,0 +1,95 @@
+import random
+import unittest
+
+from txsc.ir.instructions import LInstructions
+from txsc.ir.linear_context import LinearInliner
+from txsc.ir.linear_optimizer import PeepholeOptimizer
+from txsc.ir.stack_scheduler import StackScheduler, ScheduleError
+from txsc.ir.superoptimizer import SymbolicStack
+import txsc.ir.linear_nodes as types
+
+
+def reference_stack(ops, num_inputs):
+    """Model ops, with each assumption copying its item, or moving it if it is the last occurrence."""
+    stack = SymbolicStack(num_inputs, fixed=True)
+    for i, op in enumerate(ops):
+        if isinstance(op, types.Assumption):
+            if not any(isinstance(j, types.Assumption) and j.var_name == op.var_name for j in ops[i + 1:]):
+                stack.items.remove(('in', op.depth))
+            stack.items.append(('in', op.depth))
+        else:
+            stack.execute(op)
+    return stack
+
+def random_program(rng, num_inputs):
+    ops, height = [], 0
+    binary = [types.Add, types.Sub, types.LessThan, types.Equal, types.Max]
+    for _ in range(rng.randint(1, 14)):
+        r = rng.random()
+        if r < 0.5:
+            depth = rng.randrange(num_inputs)
+            ops.append(types.Assumption('v%d' % depth, depth))
+            height += 1
+        elif r < 0.55:
+            ops.append(types.Five())
+            height += 1
+        elif height >= 2 and r < 0.8:
+            ops.append(rng.choice(binary)())
+            height -= 1
+        elif height >= 1 and r < 0.9:
+            ops.append(types.Sha256())
+        elif height >= 1:
+            ops.append(types.Drop())
+            height -= 1
+    return ops
+
+class StackSchedulerTest(unittest.TestCase):
+    def _do_test(self, expected, ops):
+        self.assertEqual(expected.split(' '), [str(i) for i in StackScheduler().schedule(ops)])
+
+    def test_stack_ops(self):
+        ops = [types.Assumption('a', 2), types.Assumption('b', 1), types.CheckSig(), types.Assumption('c', 0)]
+        self._do_test('OP_ROT OP_ROT OP_CHECKSIG OP_SWAP', ops)
+
+        ops = [types.Assumption('a', 1), types.Assumption('b', 0), types.Add(), types.Verify(),
+               types.Assumption('a', 1), types.Assumption('b', 0), types.Sub()]
+        self._do_test('OP_2DUP OP_ADD OP_VERIFY OP_SUB', ops)
+
+    def test_multisig(self):
+        ops = [types.Zero(), types.Assumption('sig', 1), types.One(), types.Push('\x02' * 33), types.One(),
+               types.CheckMultiSig(), types.Assumption('x', 0), types.Add()]
+        self._do_test('OP_0 OP_ROT OP_1 %s OP_1 OP_CHECKMULTISIG OP_ADD' % ('02' * 33), ops)
+
+    def test_unknown_stack_effect(self):
+        ops = [types.Assumption('b', 0), types.Two(), types.Pick(), types.Add(), types.Assumption('a', 1)]
+        self.assertRaises(ScheduleError, StackScheduler().schedule, ops)
+        # The inliner replaces the assumptions one by one instead.
+        instructions = LInstructions(ops)
+        LinearInliner().inline(instructions, PeepholeOptimizer())
+        self.assertEqual([types.Two(), types.Pick(), types.Add(), types.Swap()], instructions)
+
+    def test_unknown_stack_effect_optimized_once(self):
+        class CountingOptimizer(PeepholeOptimizer):
+            runs = 0
+            def optimize(self, instructions):
+                self.runs += 1
+                super(CountingOptimizer, self).optimize(instructions)
+        ops = [types.Two(), types.Pick()]
+        for i in range(20):
+            ops.extend([types.Assumption('x%d' % i, i), types.Add()])
+        optimizer = CountingOptimizer()
+        LinearInliner().inline(LInstructions(ops), optimizer)
+        # Peephole optimizations run before scheduling and once after the assumptions are replaced.
+        self.assertEqual(2, optimizer.runs)
+
+    def test_equivalence(self):
+        rng = random.Random(0)
+        for _ in range(200):
+            num_inputs = rng.randint(1, 4)
+            ops = random_program(rng, num_inputs)
+            result = SymbolicStack(num_inputs, fixed=True)
+            for op in StackScheduler().schedule(ops):
+                result.execute(op)
+            expected = reference_stack(ops, num_inputs)
+            self.assertEqual(expected.items, result.items)
+            self.assertEqual(expected.evaluated, result.evaluated)
@@ -0,0 +1,67 @@
+import pickle
+import unittest
+
+import txsc.ir.structural_nodes as types
+from txsc.transformer import BaseTransformer, Result
+
+
+def example_script():
+    add = types.BinOpCode(name='OP_ADD', left=types.Push(data='05'), right=types.Symbol(name='x'))
+    return types.Script(statements=[types.VerifyOpCode(name='OP_VERIFY', test=add)])
+
+class StructuralNodesTest(unittest.TestCase):
+    def test_slots(self):
+        for node in types.walk(example_script()):
+            self.assertFalse(hasattr(node, '__dict__'))
+
+    def test_dump(self):
+        script = example_script()
+        self.assertEqual("Script([VerifyOpCode('OP_VERIFY', BinOpCode('OP_ADD', Push(0x05), Symbol('x')))])",
+                         script.dump(annotate_fields=False))
+        self.assertEqual("Script(statements=[VerifyOpCode(name='OP_VERIFY', test=BinOpCode(name='OP_ADD', "
+                         "left=Push(data=0x05), right=Symbol(name='x')))])", script.dump())
+
+    def test_pickle(self):
+        script = example_script()
+        self.assertEqual(script.dump(), pickle.loads(pickle.dumps(script, pickle.HIGHEST_PROTOCOL)).dump())
+
+    def test_walk(self):
+        self.assertEqual(['BinOpCode', 'Push', 'Script', 'Symbol', 'VerifyOpCode'],
+                         sorted(i.__class__.__name__ for i in types.walk(example_script())))
+
+class VisitorDispatchTest(unittest.TestCase):
+    def test_dispatch(self):
+        class Visitor(BaseTransformer):
+            def visit_Push(self, node):
+                return 'push'
+            def generic_visit(self, node):
+                return 'generic'
+
+        visitor = Visitor()
+        self.assertEqual('push', visitor.visit(types.Push(data='01')))
+        self.assertEqual('generic', visitor.visit(types.Symbol(name='x')))
+        # Subclasses have their own methods.
+        class SymbolVisitor(Visitor):
+            def visit_Symbol(self, node):
+                return 'symbol'
+        self.assertEqual('symbol', SymbolVisitor().visit(types.Symbol(name='x')))
+        self.assertEqual('generic', visitor.visit(types.Symbol(name='x')))
+
+    def test_generator_methods(self):
+        class Visitor(BaseTransformer):
+            def visit_BinOpCode(self, node):
+                left = yield node.left
+                right = yield node.right
+                yield Result(left + right)
+            def visit_Push(self, node):
+                return int(node)
+            def visit_Symbol(self, node):
+                raise NameError(node.name)
+
+        # Deeper than the recursion limit.
+        node = types.Push(data='01')
+        for _ in range(5000):
+            node = types.BinOpCode(name='OP_ADD', left=node, right=types.Push(data='01'))
+        self.assertEqual(5001, Visitor().visit(node))
+        # Exceptions are raised where the node was yielded.
+        self.assertRaises(NameError, Visitor().visit, types.BinOpCode(name='OP_ADD', left=node, right=types.Symbol(name='x')))
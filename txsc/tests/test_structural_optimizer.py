@@ -0,0 +1,45 @@
+import unittest
+
+from txsc.ir.structural_optimizer import StructuralOptimizer
+from txsc.symbols import SymbolTable
+from txsc.txscript import TxScriptLanguage
+
+
+class CountingOptimizer(StructuralOptimizer):
+    """Counts the operations that are visited."""
+    def __init__(self):
+        super(CountingOptimizer, self).__init__()
+        self.visits = 0
+
+    def visit_BinOpCode(self, node):
+        self.visits += 1
+        return super(CountingOptimizer, self).visit_BinOpCode(node)
+
+class SymbolOptimizationTest(unittest.TestCase):
+    def _optimize(self, src):
+        symbol_table = SymbolTable()
+        instructions = TxScriptLanguage().process_source(src, symbol_table)
+        optimizer = CountingOptimizer()
+        optimizer.optimize(instructions, symbol_table)
+        return optimizer, symbol_table
+
+    def test_symbols_are_optimized_once(self):
+        # Each symbol refers to the previous one twice, so its expanded expression doubles in size.
+        lines = ['assume a;', 'x0 = a + 1;']
+        lines.extend('x%d = x%d + x%d;' % (i, i - 1, i - 1) for i in range(1, 40))
+        lines.append('verify x39 > 0;')
+        optimizer, symbol_table = self._optimize('\n'.join(lines))
+        # The value of each assignment, and the statement.
+        self.assertEqual(41, optimizer.visits)
+
+    def test_folded_symbol(self):
+        optimizer, symbol_table = self._optimize('x = 2 + 3;\nx;\nx;')
+        self.assertEqual(symbol_table.ByteArray, symbol_table.lookup('x').type_)
+        self.assertEqual(['05'], symbol_table.lookup('x').value)
+        self.assertEqual(1, optimizer.visits)
+
+    def test_reassignment(self):
+        symbol_table = SymbolTable()
+        version = symbol_table.version
+        symbol_table.add_symbol('x', 1, symbol_table.ByteArray)
+        self.assertNotEqual(version, symbol_table.version)
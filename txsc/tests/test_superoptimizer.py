@@ -0,0 +1,102 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from txsc import compile_source
+from txsc.ir.instructions import LInstructions
+from txsc.ir import superoptimizer
+from txsc.ir.superoptimizer import ModelError, Superoptimizer, SuperoptimizerDatabase, model, search
+import txsc.ir.linear_nodes as types
+
+
+class SymbolicStackTest(unittest.TestCase):
+    def test_inputs(self):
+        stack = model([types.Swap(), types.Drop()])
+        self.assertEqual(2, stack.num_inputs)
+        self.assertEqual([('in', 0)], stack.items)
+
+    def test_canonical_terms(self):
+        self.assertEqual(model([types.Add()]).state(), model([types.Swap(), types.Add()]).state())
+        self.assertEqual(model([types.Sha256(), types.Sha256()]).state(), model([types.Hash256()]).state())
+        self.assertEqual(model([types.Add1()]).state(), model([types.One(), types.Add()]).state())
+        self.assertNotEqual(model([types.Sub()]).state(), model([types.Swap(), types.Sub()]).state())
+
+    def test_evaluated(self):
+        # OP_ADD can fail, so it cannot be removed even if its result is dropped.
+        self.assertEqual(1, len(model([types.Add(), types.Drop()]).evaluated))
+        self.assertEqual(0, len(model([types.Sha256(), types.Drop()]).evaluated))
+
+    def test_pick_and_roll(self):
+        self.assertEqual([('in', 1), ('in', 0), ('in', 1)], model([types.One(), types.Pick()]).items)
+        self.assertEqual([('in', 1), ('in', 0), ('in', 2)], model([types.Two(), types.Roll()]).items)
+        self.assertRaises(ModelError, model, [types.Dup(), types.Pick()])
+        self.assertRaises(ModelError, model, [types.Verify()])
+
+class SearchTest(unittest.TestCase):
+    def _search(self, ops):
+        result = search(ops)
+        return None if result is None else [i.name for i in result]
+
+    def test_stack_ops(self):
+        self.assertEqual(['OP_2DUP'], self._search([types.Over(), types.Over()]))
+        self.assertEqual(['OP_3DUP'], self._search([types.Two(), types.Pick()] * 3))
+        self.assertEqual(['OP_2SWAP'], self._search([types.Three(), types.Roll()] * 2))
+        self.assertEqual([], self._search([types.Swap(), types.Swap()]))
+
+    def test_operations(self):
+        self.assertEqual(['OP_ADD'], self._search([types.Swap(), types.Add()]))
+        self.assertEqual(['OP_HASH256'], self._search([types.Sha256(), types.Sha256()]))
+        self.assertEqual(['OP_ADD'], self._search([types.Over(), types.Over(), types.Add(), types.Nip(), types.Nip()]))
+
+    def test_no_shorter_sequence(self):
+        self.assertIsNone(self._search([types.Add(), types.Drop()]))
+        self.assertIsNone(self._search([types.Dup(), types.Add(), types.Seven(), types.Equal()]))
+
+class SuperoptimizerTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'db', 'superoptimizer.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_optimize(self):
+        script = LInstructions([types.Five(), types.Over(), types.Over(), types.Verify(), types.Swap(), types.Drop()])
+        optimizer = Superoptimizer(SuperoptimizerDatabase(self.path))
+        self.assertTrue(optimizer.optimize(script))
+        self.assertEqual([types.Five(), types.TwoDup(), types.Verify(), types.Nip()], script)
+
+    def test_database(self):
+        database = SuperoptimizerDatabase(self.path)
+        optimizer = Superoptimizer(database)
+        optimizer.optimize(LInstructions([types.Over(), types.Over()]))
+        self.assertEqual(1, optimizer.searches)
+        database.save()
+
+        # Later compilations look up results.
+        optimizer = Superoptimizer(SuperoptimizerDatabase(self.path))
+        script = LInstructions([types.Over(), types.Over()])
+        optimizer.optimize(script)
+        self.assertEqual(0, optimizer.searches)
+        self.assertEqual([types.TwoDup()], script)
+        # Windows without a shorter sequence are recorded too.
+        self.assertFalse(optimizer.optimize(LInstructions([types.Add(), types.Drop()])))
+        self.assertEqual((True, None), optimizer.database.get([types.Add(), types.Drop()]))
+
+    def test_database_version(self):
+        database = SuperoptimizerDatabase(self.path)
+        database.put([types.Over(), types.Over()], [types.TwoDup()])
+        database.save()
+        superoptimizer.SEARCH_VERSION += 1
+        try:
+            self.assertEqual((False, None), SuperoptimizerDatabase(self.path).get([types.Over(), types.Over()]))
+        finally:
+            superoptimizer.SEARCH_VERSION -= 1
+
+    def test_compile(self):
+        source = 'assume a, b; verify sha256(a) == b; sha256(a) == sha256(b);'
+        self.assertEqual('2DUP SWAP SHA256 EQUALVERIFY SWAP SHA256 SWAP SHA256 EQUAL',
+                         compile_source(source, target_lang='asm', optimization=3).output)
+        self.assertEqual('2DUP SWAP SHA256 EQUALVERIFY SHA256 SWAP SHA256 EQUAL',
+                         compile_source(source, target_lang='asm', optimization=4, superopt_db=self.path).output)
@@ -1,9 +1,11 @@
+import threading
 import unittest
 import ast
 
-from ply import yacc
+from ply import lex, yacc
 
 from txsc.txscript import ScriptParser, ScriptTransformer
+from txsc.txscript import lexer, lextab, parsetab, script_parser
 
 
 def setUpModule():
@@ -41,6 +43,13 @@ class SingleStatementTest(BaseScriptTransformerTest):
         self._test_transform('max(1, 2);', "[BinOpCode('OP_MAX', Push(0x01), Push(0x02))]")
         self._test_transform('verify max(1, 2) == 2;', "[VerifyOpCode('OP_VERIFY', BinOpCode('OP_EQUAL', BinOpCode('OP_MAX', Push(0x01), Push(0x02)), Push(0x02)))]")
 
+    def test_literals(self):
+        # Integers are script numbers, and hex strings keep leading zero bytes.
+        self._test_transform('200;', "[Push(0xc800)]")
+        self._test_transform('0;', "[Push(0x)]")
+        self._test_transform("'00ab';", "[Push(0x00ab)]")
+        self._test_transform("sha256('ab');", "[UnaryOpCode('OP_SHA256', Push(0xab))]")
+
     def test_boolops(self):
         self._test_transform('5 or 2;', "[BinOpCode('OP_BOOLOR', Push(0x05), Push(0x02))]")
         self._test_transform('5 or 2 or 8;', "[BinOpCode('OP_BOOLOR', Push(0x05), BinOpCode('OP_BOOLOR', Push(0x02), Push(0x08)))]")
@@ -60,3 +69,29 @@ class CompoundStatementTest(BaseScriptTransformerTest):
 
     def test_comment(self):
         self._test_transform('1 + 2;\n#Comment line.\n3 + 4;', "[BinOpCode('OP_ADD', Push(0x01), Push(0x02)), BinOpCode('OP_ADD', Push(0x03), Push(0x04))]")
+
+class ParserTablesTest(unittest.TestCase):
+    def test_parser_per_thread(self):
+        self.assertIs(script_parser.get_parser(), script_parser.get_parser())
+        parsers = []
+        thread = threading.Thread(target=lambda: parsers.append(script_parser.get_parser()))
+        thread.start()
+        thread.join()
+        self.assertIsNot(script_parser.get_parser(), parsers[0])
+
+    def test_parsetab_is_current(self):
+        parser = script_parser.get_parser()
+        pinfo = yacc.ParserReflect(dict((k, getattr(parser, k)) for k in dir(parser)))
+        pinfo.get_all()
+        self.assertEqual(pinfo.signature(), parsetab._lr_signature)
+
+    def test_lextab_is_current(self):
+        lexobj = lex.lex(module=lexer)
+        for state, retext in lexobj.lexstateretext.items():
+            self.assertEqual(retext, [i[0] for i in lextab._lexstatere[state]])
+
+    def test_lexer_state_is_not_shared(self):
+        parser = script_parser.get_parser()
+        parser.parse('1;\n2;\n')
+        parser.parse('3;\n')
+        self.assertEqual(1, parser.lexer.lineno)
@@ -1,15 +1,113 @@
 import ast
 import binascii
+import sys
+from types import GeneratorType
 
 from bitcoin.core import _bignum
 from bitcoin.core.script import CScriptOp
 
 import txsc.ir.linear_nodes as types
 from txsc.ir.instructions import LINEAR, get_instructions_class
+from txsc.ir.structural_nodes import ScriptOp
+from txsc.profiler import null_profiler
+
+# {(transformer class, node class): visitor method, ...}
+_visitor_methods = {}
+
+class Result(object):
+    """The result of a visitor method that is a generator (see BaseTransformer.visit)."""
+    __slots__ = ('value',)
+    def __init__(self, value):
+        self.value = value
 
 class BaseTransformer(ast.NodeTransformer):
     """Base class for transformers."""
     debug = False
+    def visit(self, node):
+        """Visit a node.
+
+        The method that visits a class of node is looked up once for
+        each transformer class, rather than by name for every node.
+
+        Visitor methods may be generators, so that deep trees are visited
+        without recursion: A generator yields each node that it visits,
+        and is sent the result of visiting it. It may also yield another
+        generator, which is run in the same way. It finishes by yielding
+        Result(value), or by returning (which results in None).
+        """
+        result = self.visitor_method(node)(self, node)
+        if isinstance(result, GeneratorType):
+            result = self.run(result)
+        return result
+
+    def visitor_method(self, node):
+        """Get the (unbound) method that visits node."""
+        key = (self.__class__, node.__class__)
+        method = _visitor_methods.get(key)
+        if method is None:
+            method = getattr(self.__class__, 'visit_' + node.__class__.__name__, None)
+            if method is None:
+                method = self.__class__.generic_visit
+            _visitor_methods[key] = method
+        return method
+
+    def run(self, generator):
+        """Run generator (see visit()) and get its result.
+
+        The generators that are running are kept on an explicit stack.
+        Exceptions are raised in the generator that yielded the node
+        or generator that raised them.
+        """
+        stack = [generator]
+        value = None
+        error = None
+        while stack:
+            try:
+                if error is not None:
+                    exc_info, error = error, None
+                    item = stack[-1].throw(*exc_info)
+                else:
+                    item = stack[-1].send(value)
+            except StopIteration:
+                stack.pop()
+                value = None
+                continue
+            except Exception:
+                stack.pop()
+                if not stack:
+                    raise
+                error = sys.exc_info()
+                continue
+
+            cls = item.__class__
+            if cls is Result:
+                stack.pop().close()
+                value = item.value
+            elif cls is GeneratorType:
+                stack.append(item)
+                value = None
+            else:
+                method = _visitor_methods.get((self.__class__, cls)) or self.visitor_method(item)
+                try:
+                    value = method(self, item)
+                except Exception:
+                    error = sys.exc_info()
+                    continue
+                if value.__class__ is GeneratorType:
+                    stack.append(value)
+                    value = None
+        return value
+
+    def visit_list(self, nodes):
+        """Visit each of nodes, in a visitor method that is a generator.
+
+        Yield this method's generator to get the list of results.
+        """
+        results = []
+        for node in nodes:
+            results.append((yield node))
+        yield Result(results)
+
     def debug_print(self, s):
         """Print something if self.debug is True."""
         if self.debug:
@@ -20,24 +118,42 @@ class BaseTransformer(ast.NodeTransformer):
         return super(BaseTransformer, self).generic_visit(node)
 
     def format_dump(self, node, annotate_fields=True, include_attributes=False):
-        if isinstance(node, ast.AST):
-            fields = [(a, self.format_dump(b, annotate_fields, include_attributes)) for a, b in ast.iter_fields(node)]
-            rv = '%s(%s' % (node.__class__.__name__, ', '.join(
-                ('%s=%s' % field for field in fields)
-                if annotate_fields else
-                (b for a, b in fields)
-            ))
-            if include_attributes and node._attributes:
-                rv += fields and ', ' or ' '
-                rv += ', '.join('%s=%s' % (a, _format(getattr(node, a)))
-                                for a in node._attributes)
-            return rv + ')'
-        elif isinstance(node, list):
-            return '[%s]' % ', '.join(self.format_dump(x, annotate_fields, include_attributes) for x in node)
-        return repr(node)
+        parts = []
+        # Items are (True, text) or (False, value to format), with the next item last.
+        todo = [(False, node)]
+        while todo:
+            is_text, item = todo.pop()
+            if is_text:
+                parts.append(item)
+            elif isinstance(item, ScriptOp):
+                parts.append(item.dump(annotate_fields))
+            elif isinstance(item, ast.AST):
+                fields = list(ast.iter_fields(item))
+                if include_attributes:
+                    fields.extend((a, getattr(item, a)) for a in item._attributes if hasattr(item, a))
+                items = [(True, '%s(' % item.__class__.__name__)]
+                for i, (name, value) in enumerate(fields):
+                    if i:
+                        items.append((True, ', '))
+                    if annotate_fields:
+                        items.append((True, '%s=' % name))
+                    items.append((False, value))
+                items.append((True, ')'))
+                todo.extend(reversed(items))
+            elif isinstance(item, list):
+                items = [(True, '[')]
+                for i, value in enumerate(item):
+                    if i:
+                        items.append((True, ', '))
+                    items.append((False, value))
+                items.append((True, ']'))
+                todo.extend(reversed(items))
+            else:
+                parts.append(repr(item))
+        return ''.join(parts)
 
     def dump(self, node, annotate_fields=False, include_attributes=False):
-        if not isinstance(node, ast.AST):
+        if not isinstance(node, (ast.AST, ScriptOp)):
             raise TypeError('expected AST, got %r' % node.__class__.__name__)
         return self.format_dump(node, annotate_fields, include_attributes)
 
@@ -45,6 +161,8 @@ class SourceVisitor(BaseTransformer):
     """Visitor that operates on a source language."""
     # Type of instructions that this visitor generates.
     ir_type = LINEAR
+    # Profiler that records the stages of transformation.
+    profiler = null_profiler
     def __init__(self, *args, **kwargs):
         super(SourceVisitor, self).__init__(*args, **kwargs)
         self.instructions = get_instructions_class(self.ir_type)()
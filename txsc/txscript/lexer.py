@@ -107,7 +107,7 @@ def t_newline(t):
     t.lexer.lineno += len(t.value)
 
 def t_error(t):
-    print("Illegal character '%s'" % t.value[0])
+    raise SyntaxError("Line %d: Illegal character '%s'" % (t.lineno, t.value[0]))
 
 precedence = (
     ('left', 'EQUALITY', 'INEQUALITY',),
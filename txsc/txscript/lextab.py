@@ -0,0 +1,10 @@
+# lextab.py. This file automatically created by PLY (version 3.11). Don't edit!
+_tabversion   = '3.10'
+_lextokens    = set(('AMPERSAND', 'AND', 'ASSUME', 'CARET', 'COMMA', 'DIVIDE', 'EQUALITY', 'EQUALS', 'GREATERTHAN', 'GREATERTHANOREQUAL', 'HEXSTR', 'INEQUALITY', 'LBRACE', 'LESSTHAN', 'LESSTHANOREQUAL', 'LPAREN', 'LSHIFT', 'MINUS', 'MOD', 'NAME', 'NOT', 'NUMBER', 'OR', 'PIPE', 'PLUS', 'RBRACE', 'RETURN', 'RPAREN', 'RSHIFT', 'SEMICOLON', 'TILDE', 'TIMES', 'VERIFY'))
+_lexreflags   = 64
+_lexliterals  = ''
+_lexstateinfo = {'INITIAL': 'inclusive'}
+_lexstatere   = {'INITIAL': [("(?P<t_NAME>[a-zA-Z][a-zA-Z0-9_]*)|(?P<t_NUMBER>((0x)[0-9a-fA-F]+)|(\\d+))|(?P<t_HEXSTR>\\'[0-9a-fA-F]+\\')|(?P<t_COMMENT>\\#.*)|(?P<t_newline>\\n+)|(?P<t_RETURN>return)|(?P<t_ASSUME>assume)|(?P<t_VERIFY>verify)|(?P<t_GREATERTHANOREQUAL>\\>\\=)|(?P<t_RSHIFT>\\>\\>)|(?P<t_INEQUALITY>\\!\\=)|(?P<t_LSHIFT>\\<\\<)|(?P<t_LESSTHANOREQUAL>\\<\\=)|(?P<t_EQUALITY>\\=\\=)|(?P<t_AND>and)|(?P<t_PIPE>\\|)|(?P<t_RBRACE>\\})|(?P<t_TILDE>\\~)|(?P<t_PLUS>\\+)|(?P<t_LESSTHAN>\\<)|(?P<t_LPAREN>\\()|(?P<t_COMMA>\\,)|(?P<t_CARET>\\^)|(?P<t_MOD>\\%)|(?P<t_DIVIDE>\\/)|(?P<t_AMPERSAND>\\&)|(?P<t_OR>or)|(?P<t_LBRACE>\\{)|(?P<t_GREATERTHAN>\\>)|(?P<t_TIMES>\\*)|(?P<t_MINUS>\\-)|(?P<t_SEMICOLON>\\;)|(?P<t_EQUALS>\\=)|(?P<t_RPAREN>\\))", [None, ('t_NAME', 'NAME'), ('t_NUMBER', 'NUMBER'), None, None, None, ('t_HEXSTR', 'HEXSTR'), ('t_COMMENT', 'COMMENT'), ('t_newline', 'newline'), (None, 'RETURN'), (None, 'ASSUME'), (None, 'VERIFY'), (None, 'GREATERTHANOREQUAL'), (None, 'RSHIFT'), (None, 'INEQUALITY'), (None, 'LSHIFT'), (None, 'LESSTHANOREQUAL'), (None, 'EQUALITY'), (None, 'AND'), (None, 'PIPE'), (None, 'RBRACE'), (None, 'TILDE'), (None, 'PLUS'), (None, 'LESSTHAN'), (None, 'LPAREN'), (None, 'COMMA'), (None, 'CARET'), (None, 'MOD'), (None, 'DIVIDE'), (None, 'AMPERSAND'), (None, 'OR'), (None, 'LBRACE'), (None, 'GREATERTHAN'), (None, 'TIMES'), (None, 'MINUS'), (None, 'SEMICOLON'), (None, 'EQUALS'), (None, 'RPAREN')])]}
+_lexstateignore = {'INITIAL': ' \t'}
+_lexstateerrorf = {'INITIAL': 't_error'}
+_lexstateeoff = {}
@@ -0,0 +1,71 @@
+
+# parsetab.py
+# This file is automatically generated. Do not edit.
+# pylint: disable=W,C,R
+_tabversion = '3.10'
+
+_lr_method = 'LALR'
+
+_lr_signature = 'leftEQUALITYINEQUALITYleftLESSTHANGREATERTHANLESSTHANOREQUALGREATERTHANOREQUALleftLSHIFTRSHIFTleftPLUSMINUSleftTIMESDIVIDEMODrightUNARYOPAMPERSAND AND ASSUME CARET COMMA DIVIDE EQUALITY EQUALS GREATERTHAN GREATERTHANOREQUAL HEXSTR INEQUALITY LBRACE LESSTHAN LESSTHANOREQUAL LPAREN LSHIFT MINUS MOD NAME NOT NUMBER OR PIPE PLUS RBRACE RETURN RPAREN RSHIFT SEMICOLON TILDE TIMES VERIFYmodule : statement\n                  | block\n                  | module statement\n                  | module block\n        block : blockstatements RBRACEblockstatements : LBRACE statement\n                           | blockstatements statement\n        statement : NAME EQUALS expr SEMICOLON\n                     | NAME EQUALS block SEMICOLON\n        args : expr\n                | args COMMA expr\n        expr : ASSUME argsexpr : RETURNexpr : NAME LPAREN args RPARENexpr : expr AND expr\n                | expr OR expr\n        expr : MINUS expr %prec UNARYOP\n                | TILDE expr %prec UNARYOP\n                | NOT expr %prec UNARYOP\n        expr : VERIFY exprexpr : expr PLUS expr\n                | expr MINUS expr\n                | expr TIMES expr\n                | expr DIVIDE expr\n                | expr MOD expr\n                | expr LSHIFT expr\n                | expr RSHIFT expr\n        expr : expr AMPERSAND expr\n                | expr CARET expr\n                | expr PIPE expr\n        expr : expr EQUALITY expr\n                | expr INEQUALITY expr\n                | expr LESSTHAN expr\n                | expr GREATERTHAN expr\n                | expr LESSTHANOREQUAL expr\n                | expr GREATERTHANOREQUAL expr\n        expr : HEXSTRexpr : NAMEexpr : LPAREN expr RPARENexpr : NUMBERstatement : expr SEMICOLON'
+    
+_lr_action_items = {'CARET':([1,2,8,13,14,19,20,23,24,25,26,27,50,52,53,56,57,58,59,60,61,62,63,64,65,66,67,68,69,70,71,72,73,74,77,],[-13,-40,-37,-38,32,-38,-17,-12,32,32,-18,32,-19,-39,32,32,32,-27,-24,-35,-22,32,-33,-32,-21,-26,-34,32,-31,-23,32,-36,-25,32,-14,]),'RETURN':([0,3,4,5,6,7,9,10,11,12,15,16,17,18,21,22,28,29,30,31,32,33,34,35,36,37,38,39,40,41,42,43,44,45,46,47,48,49,51,75,76,],[1,1,1,1,1,1,-1,1,1,1,1,-2,-3,-4,-7,-5,-6,1,1,1,1,1,1,-41,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,-8,-9,]),'NUMBER':([0,3,4,5,6,7,9,10,11,12,15,16,17,18,21,22,28,29,30,31,32,33,34,35,36,37,38,39,40,41,42,43,44,45,46,47,48,49,51,75,76,],[2,2,2,2,2,2,-1,2,2,2,2,-2,-3,-4,-7,-5,-6,2,2,2,2,2,2,-41,2,2,2,2,2,2,2,2,2,2,2,2,2,2,2,-8,-9,]),'LESSTHAN':([1,2,8,13,14,19,20,23,24,25,26,27,50,52,53,56,57,58,59,60,61,62,63,64,65,66,67,68,69,70,71,72,73,74,77,],[-13,-40,-37,-38,39,-38,-17,-12,39,39,-18,39,-19,-39,39,39,39,-27,-24,-35,-22,39,-33,39,-21,-26,-34,39,39,-23,39,-36,-25,39,-14,]),'LSHIFT':([1,2,8,13,14,19,20,23,24,25,26,27,50,52,53,56,57,58,59,60,61,62,63,64,65,66,67,68,69,70,71,72,73,74,77,],[-13,-40,-37,-38,42,-38,-17,-12,42,42,-18,42,-19,-39,42,42,42,-27,-24,42,-22,42,42,42,-21,-26,42,42,42,-23,42,42,-25,42,-14,]),'RSHIFT':([1,2,8,13,14,19,20,23,24,25,26,27,50,52,53,56,57,58,59,60,61,62,63,64,65,66,67,68,69,70,71,72,73,74,77,],[-13,-40,-37,-38,33,-38,-17,-12,33,33,-18,33,-19,-39,33,33,33,-27,-24,33,-22,33,33,33,-21,-26,33,33,33,-23,33,33,-25,33,-14,]),'MINUS':([0,1,2,3,4,5,6,7,8,9,10,11,12,13,14,15,16,17,18,19,20,21,22,23,24,25,26,27,28,29,30,31,32,33,34,35,36,37,38,39,40,41,42,43,44,45,46,47,48,49,50,51,52,53,56,57,58,59,60,61,62,63,64,65,66,67,68,69,70,71,72,73,74,75,76,77,],[4,-13,-40,4,4,4,4,4,-37,-1,4,4,4,-38,37,4,-2,-3,-4,-38,-17,-7,-5,-12,37,37,-18,37,-6,4,4,4,4,4,4,-41,4,4,4,4,4,4,4,4,4,4,4,4,4,4,-19,4,-39,37,37,37,37,-24,37,-22,37,37,37,-21,37,37,37,37,-23,37,37,-25,37,-8,-9,-14,]),'RBRACE':([5,21,28,35,75,76,],[22,-7,-6,-41,-8,-9,]),'EQUALITY':([1,2,8,13,14,19,20,23,24,25,26,27,50,52,53,56,57,58,59,60,61,62,63,64,65,66,67,68,69,70,71,72,73,74,77,],[-13,-40,-37,-38,45,-38,-17,-12,45,45,-18,45,-19,-39,45,45,45,-27,-24,-35,-22,45,-33,-32,-21,-26,-34,45,-31,-23,45,-36,-25,45,-14,]),'SEMICOLON':([1,2,8,13,14,19,20,22,23,24,25,26,50,52,53,54,56,57,58,59,60,61,62,63,64,65,66,67,68,69,70,71,72,73,74,77,],[-13,-40,-37,-38,35,-38,-17,-5,-12,-10,-20,-18,-19,-39,75,76,-15,-29,-27,-24,-35,-22,-30,-33,-32,-21,-26,-34,-28,-31,-23,-16,-36,-25,-11,-14,]),'ASSUME':([0,3,4,5,6,7,9,10,11,12,15,16,17,18,21,22,28,29,30,31,32,33,34,35,36,37,38,39,40,41,42,43,44,45,46,47,48,49,51,75,76,],[6,6,6,6,6,6,-1,6,6,6,6,-2,-3,-4,-7,-5,-6,6,6,6,6,6,6,-41,6,6,6,6,6,6,6,6,6,6,6,6,6,6,6,-8,-9,]),'VERIFY':([0,3,4,5,6,7,9,10,11,12,15,16,17,18,21,22,28,29,30,31,32,33,34,35,36,37,38,39,40,41,42,43,44,45,46,47,48,49,51,75,76,],[7,7,7,7,7,7,-1,7,7,7,7,-2,-3,-4,-7,-5,-6,7,7,7,7,7,7,-41,7,7,7,7,7,7,7,7,7,7,7,7,7,7,7,-8,-9,]),'PIPE':([1,2,8,13,14,19,20,23,24,25,26,27,50,52,53,56,57,58,59,60,61,62,63,64,65,66,67,68,69,70,71,72,73,74,77,],[-13,-40,-37,-38,38,-38,-17,-12,38,38,-18,38,-19,-39,38,38,38,-27,-24,-35,-22,38,-33,-32,-21,-26,-34,38,-31,-23,38,-36,-25,38,-14,]),'INEQUALITY':([1,2,8,13,14,19,20,23,24,25,26,27,50,52,53,56,57,58,59,60,61,62,63,64,65,66,67,68,69,70,71,72,73,74,77,],[-13,-40,-37,-38,40,-38,-17,-12,40,40,-18,40,-19,-39,40,40,40,-27,-24,-35,-22,40,-33,-32,-21,-26,-34,40,-31,-23,40,-36,-25,40,-14,]),'PLUS':([1,2,8,13,14,19,20,23,24,25,26,27,50,52,53,56,57,58,59,60,61,62,63,64,65,66,67,68,69,70,71,72,73,74,77,],[-13,-40,-37,-38,41,-38,-17,-12,41,41,-18,41,-19,-39,41,41,41,41,-24,41,-22,41,41,41,-21,41,41,41,41,-23,41,41,-25,41,-14,]),'GREATERTHANOREQUAL':([1,2,8,13,14,19,20,23,24,25,26,27,50,52,53,56,57,58,59,60,61,62,63,64,65,66,67,68,69,70,71,72,73,74,77,],[-13,-40,-37,-38,48,-38,-17,-12,48,48,-18,48,-19,-39,48,48,48,-27,-24,-35,-22,48,-33,48,-21,-26,-34,48,48,-23,48,-36,-25,48,-14,]),'TILDE':([0,3,4,5,6,7,9,10,11,12,15,16,17,18,21,22,28,29,30,31,32,33,34,35,36,37,38,39,40,41,42,43,44,45,46,47,48,49,51,75,76,],[10,10,10,10,10,10,-1,10,10,10,10,-2,-3,-4,-7,-5,-6,10,10,10,10,10,10,-41,10,10,10,10,10,10,10,10,10,10,10,10,10,10,10,-8,-9,]),'COMMA':([1,2,8,19,20,23,24,25,26,50,52,55,56,57,58,59,60,61,62,63,64,65,66,67,68,69,70,71,72,73,74,77,],[-13,-40,-37,-38,-17,51,-10,-20,-18,-19,-39,51,-15,-29,-27,-24,-35,-22,-30,-33,-32,-21,-26,-34,-28,-31,-23,-16,-36,-25,-11,-14,]),'$end':([3,9,16,17,18,22,35,75,76,],[0,-1,-2,-3,-4,-5,-41,-8,-9,]),'DIVIDE':([1,2,8,13,14,19,20,23,24,25,26,27,50,52,53,56,57,58,59,60,61,62,63,64,65,66,67,68,69,70,71,72,73,74,77,],[-13,-40,-37,-38,34,-38,-17,-12,34,34,-18,34,-19,-39,34,34,34,34,-24,34,34,34,34,34,34,34,34,34,34,-23,34,34,-25,34,-14,]),'EQUALS':([13,],[29,]),'TIMES':([1,2,8,13,14,19,20,23,24,25,26,27,50,52,53,56,57,58,59,60,61,62,63,64,65,66,67,68,69,70,71,72,73,74,77,],[-13,-40,-37,-38,46,-38,-17,-12,46,46,-18,46,-19,-39,46,46,46,46,-24,46,46,46,46,46,46,46,46,46,46,-23,46,46,-25,46,-14,]),'GREATERTHAN':([1,2,8,13,14,19,20,23,24,25,26,27,50,52,53,56,57,58,59,60,61,62,63,64,65,66,67,68,69,70,71,72,73,74,77,],[-13,-40,-37,-38,43,-38,-17,-12,43,43,-18,43,-19,-39,43,43,43,-27,-24,-35,-22,43,-33,43,-21,-26,-34,43,43,-23,43,-36,-25,43,-14,]),'LPAREN':([0,3,4,5,6,7,9,10,11,12,13,15,16,17,18,19,21,22,28,29,30,31,32,33,34,35,36,37,38,39,40,41,42,43,44,45,46,47,48,49,51,75,76,],[11,11,11,11,11,11,-1,11,11,11,30,11,-2,-3,-4,30,-7,-5,-6,11,11,11,11,11,11,-41,11,11,11,11,11,11,11,11,11,11,11,11,11,11,11,-8,-9,]),'RPAREN':([1,2,8,19,20,23,24,25,26,27,50,52,55,56,57,58,59,60,61,62,63,64,65,66,67,68,69,70,71,72,73,74,77,],[-13,-40,-37,-38,-17,-12,-10,-20,-18,52,-19,-39,77,-15,-29,-27,-24,-35,-22,-30,-33,-32,-21,-26,-34,-28,-31,-23,-16,-36,-25,-11,-14,]),'HEXSTR':([0,3,4,5,6,7,9,10,11,12,15,16,17,18,21,22,28,29,30,31,32,33,34,35,36,37,38,39,40,41,42,43,44,45,46,47,48,49,51,75,76,],[8,8,8,8,8,8,-1,8,8,8,8,-2,-3,-4,-7,-5,-6,8,8,8,8,8,8,-41,8,8,8,8,8,8,8,8,8,8,8,8,8,8,8,-8,-9,]),'AND':([1,2,8,13,14,19,20,23,24,25,26,27,50,52,53,56,57,58,59,60,61,62,63,64,65,66,67,68,69,70,71,72,73,74,77,],[-13,-40,-37,-38,31,-38,-17,-12,31,31,-18,31,-19,-39,31,31,31,-27,-24,-35,-22,31,-33,-32,-21,-26,-34,31,-31,-23,31,-36,-25,31,-14,]),'LBRACE':([0,3,9,16,17,18,22,29,35,75,76,],[12,12,-1,-2,-3,-4,-5,12,-41,-8,-9,]),'NAME':([0,3,4,5,6,7,9,10,11,12,15,16,17,18,21,22,28,29,30,31,32,33,34,35,36,37,38,39,40,41,42,43,44,45,46,47,48,49,51,75,76,],[13,13,19,13,19,19,-1,19,19,13,19,-2,-3,-4,-7,-5,-6,19,19,19,19,19,19,-41,19,19,19,19,19,19,19,19,19,19,19,19,19,19,19,-8,-9,]),'LESSTHANOREQUAL':([1,2,8,13,14,19,20,23,24,25,26,27,50,52,53,56,57,58,59,60,61,62,63,64,65,66,67,68,69,70,71,72,73,74,77,],[-13,-40,-37,-38,36,-38,-17,-12,36,36,-18,36,-19,-39,36,36,36,-27,-24,-35,-22,36,-33,36,-21,-26,-34,36,36,-23,36,-36,-25,36,-14,]),'NOT':([0,3,4,5,6,7,9,10,11,12,15,16,17,18,21,22,28,29,30,31,32,33,34,35,36,37,38,39,40,41,42,43,44,45,46,47,48,49,51,75,76,],[15,15,15,15,15,15,-1,15,15,15,15,-2,-3,-4,-7,-5,-6,15,15,15,15,15,15,-41,15,15,15,15,15,15,15,15,15,15,15,15,15,15,15,-8,-9,]),'AMPERSAND':([1,2,8,13,14,19,20,23,24,25,26,27,50,52,53,56,57,58,59,60,61,62,63,64,65,66,67,68,69,70,71,72,73,74,77,],[-13,-40,-37,-38,44,-38,-17,-12,44,44,-18,44,-19,-39,44,44,44,-27,-24,-35,-22,44,-33,-32,-21,-26,-34,44,-31,-23,44,-36,-25,44,-14,]),'OR':([1,2,8,13,14,19,20,23,24,25,26,27,50,52,53,56,57,58,59,60,61,62,63,64,65,66,67,68,69,70,71,72,73,74,77,],[-13,-40,-37,-38,47,-38,-17,-12,47,47,-18,47,-19,-39,47,47,47,-27,-24,-35,-22,47,-33,-32,-21,-26,-34,47,-31,-23,47,-36,-25,47,-14,]),'MOD':([1,2,8,13,14,19,20,23,24,25,26,27,50,52,53,56,57,58,59,60,61,62,63,64,65,66,67,68,69,70,71,72,73,74,77,],[-13,-40,-37,-38,49,-38,-17,-12,49,49,-18,49,-19,-39,49,49,49,49,-24,49,49,49,49,49,49,49,49,49,49,-23,49,49,-25,49,-14,]),}
+
+_lr_action = {}
+for _k, _v in _lr_action_items.items():
+   for _x,_y in zip(_v[0],_v[1]):
+      if not _x in _lr_action:  _lr_action[_x] = {}
+      _lr_action[_x][_k] = _y
+del _lr_action_items
+
+_lr_goto_items = {'expr':([0,3,4,5,6,7,10,11,12,15,29,30,31,32,33,34,36,37,38,39,40,41,42,43,44,45,46,47,48,49,51,],[14,14,20,14,24,25,26,27,14,50,53,24,56,57,58,59,60,61,62,63,64,65,66,67,68,69,70,71,72,73,74,]),'args':([6,30,],[23,55,]),'module':([0,],[3,]),'block':([0,3,29,],[16,18,54,]),'statement':([0,3,5,12,],[9,17,21,28,]),'blockstatements':([0,3,29,],[5,5,5,]),}
+
+_lr_goto = {}
+for _k, _v in _lr_goto_items.items():
+   for _x, _y in zip(_v[0], _v[1]):
+       if not _x in _lr_goto: _lr_goto[_x] = {}
+       _lr_goto[_x][_k] = _y
+del _lr_goto_items
+_lr_productions = [
+  ("S' -> module","S'",1,None,None,None),
+  ('module -> statement','module',1,'p_module','script_parser.py',52),
+  ('module -> block','module',1,'p_module','script_parser.py',53),
+  ('module -> module statement','module',2,'p_module','script_parser.py',54),
+  ('module -> module block','module',2,'p_module','script_parser.py',55),
+  ('block -> blockstatements RBRACE','block',2,'p_block','script_parser.py',66),
+  ('blockstatements -> LBRACE statement','blockstatements',2,'p_block_statements','script_parser.py',70),
+  ('blockstatements -> blockstatements statement','blockstatements',2,'p_block_statements','script_parser.py',71),
+  ('statement -> NAME EQUALS expr SEMICOLON','statement',4,'p_statement_assign','script_parser.py',79),
+  ('statement -> NAME EQUALS block SEMICOLON','statement',4,'p_statement_assign','script_parser.py',80),
+  ('args -> expr','args',1,'p_function_args','script_parser.py',87),
+  ('args -> args COMMA expr','args',3,'p_function_args','script_parser.py',88),
+  ('expr -> ASSUME args','expr',2,'p_assume','script_parser.py',98),
+  ('expr -> RETURN','expr',1,'p_return','script_parser.py',104),
+  ('expr -> NAME LPAREN args RPAREN','expr',4,'p_function_call','script_parser.py',108),
+  ('expr -> expr AND expr','expr',3,'p_boolop','script_parser.py',114),
+  ('expr -> expr OR expr','expr',3,'p_boolop','script_parser.py',115),
+  ('expr -> MINUS expr','expr',2,'p_expr_unaryop','script_parser.py',121),
+  ('expr -> TILDE expr','expr',2,'p_expr_unaryop','script_parser.py',122),
+  ('expr -> NOT expr','expr',2,'p_expr_unaryop','script_parser.py',123),
+  ('expr -> VERIFY expr','expr',2,'p_verify','script_parser.py',136),
+  ('expr -> expr PLUS expr','expr',3,'p_expr_binop','script_parser.py',140),
+  ('expr -> expr MINUS expr','expr',3,'p_expr_binop','script_parser.py',141),
+  ('expr -> expr TIMES expr','expr',3,'p_expr_binop','script_parser.py',142),
+  ('expr -> expr DIVIDE expr','expr',3,'p_expr_binop','script_parser.py',143),
+  ('expr -> expr MOD expr','expr',3,'p_expr_binop','script_parser.py',144),
+  ('expr -> expr LSHIFT expr','expr',3,'p_expr_binop','script_parser.py',145),
+  ('expr -> expr RSHIFT expr','expr',3,'p_expr_binop','script_parser.py',146),
+  ('expr -> expr AMPERSAND expr','expr',3,'p_expr_bitwise_op','script_parser.py',167),
+  ('expr -> expr CARET expr','expr',3,'p_expr_bitwise_op','script_parser.py',168),
+  ('expr -> expr PIPE expr','expr',3,'p_expr_bitwise_op','script_parser.py',169),
+  ('expr -> expr EQUALITY expr','expr',3,'p_expr_compare','script_parser.py',182),
+  ('expr -> expr INEQUALITY expr','expr',3,'p_expr_compare','script_parser.py',183),
+  ('expr -> expr LESSTHAN expr','expr',3,'p_expr_compare','script_parser.py',184),
+  ('expr -> expr GREATERTHAN expr','expr',3,'p_expr_compare','script_parser.py',185),
+  ('expr -> expr LESSTHANOREQUAL expr','expr',3,'p_expr_compare','script_parser.py',186),
+  ('expr -> expr GREATERTHANOREQUAL expr','expr',3,'p_expr_compare','script_parser.py',187),
+  ('expr -> HEXSTR','expr',1,'p_expr_str','script_parser.py',206),
+  ('expr -> NAME','expr',1,'p_expr_name','script_parser.py',216),
+  ('expr -> LPAREN expr RPAREN','expr',3,'p_expr_group','script_parser.py',220),
+  ('expr -> NUMBER','expr',1,'p_expr_number','script_parser.py',224),
+  ('statement -> expr SEMICOLON','statement',2,'p_statement_expr','script_parser.py',228),
+]
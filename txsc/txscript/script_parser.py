@@ -1,22 +1,51 @@
 import ast
+import os
+import threading
 
 from ply import lex, yacc
 
 import lexer
 
+# Modules containing the pregenerated parse and lex tables.
+# Run this module to regenerate them after changing the grammar or tokens.
+tabmodule = 'txsc.txscript.parsetab'
+lextab = 'txsc.txscript.lextab'
+
+# Per-thread parser instances. PLY parsers keep state while parsing,
+# so an instance cannot be shared by threads.
+_local = threading.local()
+
+def get_parser():
+    """Get the ScriptParser instance of the current thread."""
+    parser = getattr(_local, 'parser', None)
+    if parser is None:
+        parser = _local.parser = ScriptParser()
+    return parser
+
+def write_tables(outputdir=None):
+    """Write the parse and lex tables to outputdir."""
+    if outputdir is None:
+        outputdir = os.path.dirname(os.path.abspath(__file__))
+    lex.lex(module=lexer).writetab(lextab, outputdir)
+    ScriptParser(outputdir=outputdir, write_tables=True)
+
 class ScriptParser(object):
     tokens = lexer.tokens
     precedence = lexer.precedence
 
     def __init__(self, **kwargs):
         self.debug = False
+        self.outputdir = None
+        self.write_tables = False
         for k, v in kwargs.items():
             setattr(self, k, v)
-        self.lexer = lex.lex(module=lexer)
-        self.parser = yacc.yacc(module=self, debug=self.debug)
+        self.lexer = lex.lex(module=lexer, optimize=True, lextab=lextab)
+        self.parser = yacc.yacc(module=self, debug=self.debug, tabmodule=tabmodule,
+                outputdir=self.outputdir, write_tables=self.write_tables)
 
     def parse(self, s):
-        return self.parser.parse(s, lexer=self.lexer)
+        # Each parse uses its own copy of the lexer so that no state is shared between parses.
+        return self.parser.parse(s, lexer=self.lexer.clone())
 
     def p_error(self, p):
         raise SyntaxError('Syntax error: %s' % p)
@@ -43,10 +72,12 @@ class ScriptParser(object):
         '''blockstatements : LBRACE statement
                            | blockstatements statement
         '''
-        body = [p[2]]
+        # The statements are appended to the previous Tuple, so that long blocks are parsed in linear time.
         if p[1] != '{':
-            body = p[1].elts + body
-        p[0] = ast.Tuple(elts=body)
+            p[0] = p[1]
+            p[0].elts.append(p[2])
+        else:
+            p[0] = ast.Tuple(elts=[p[2]])
 
     def p_statement_assign(self, p):
         '''statement : NAME EQUALS expr SEMICOLON
@@ -60,17 +91,17 @@ class ScriptParser(object):
         '''args : expr
                 | args COMMA expr
         '''
-        args = [p[1]]
-        if hasattr(p[1], 'elts'):
-            args = p[1].elts
+        # A single argument may be a list (hex strings are lists of bytes).
         if len(p) > 2:
-            args.append(p[3])
-        p[0] = ast.List(elts=args, ctx=ast.Store())
+            p[0] = p[1]
+            p[0].elts.append(p[3])
+        else:
+            p[0] = ast.List(elts=[p[1]], ctx=ast.Store())
 
     def p_assume(self, p):
         '''expr : ASSUME args'''
         if not all(isinstance(i, ast.Name) for i in p[2].elts):
-            raise Exception('Assumptions can only be assigned to names.')
+            raise SyntaxError('Assumptions can only be assigned to names.')
         p[0] = ast.Assign(targets=[ast.Name(id='_stack', ctx=ast.Store())], value=p[2])
 
     def p_return(self, p):
@@ -181,7 +212,7 @@ class ScriptParser(object):
         try:
             _ = int(s, 16)
         except ValueError:
-            raise Exception('Invalid hex literal.')
+            raise SyntaxError('Invalid hex literal.')
         byte_arr = [s[i:i+2] for i in range(0, len(s), 2)]
         p[0] = ast.List(elts=byte_arr, ctx=ast.Store())
 
@@ -200,3 +231,6 @@ class ScriptParser(object):
     def p_statement_expr(self, p):
         '''statement : expr SEMICOLON'''
         p[0] = p[1]
+
+if __name__ == '__main__':
+    write_tables()
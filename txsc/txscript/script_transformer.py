@@ -2,11 +2,10 @@ import ast
 from collections import namedtuple
 import sys
 
-import hexs
 
 from txsc.ir import formats
 import txsc.ir.structural_nodes as types
-from txsc.transformer import BaseTransformer
+from txsc.transformer import BaseTransformer, Result
 
 if sys.version >= '3':
     import functools
@@ -86,7 +85,11 @@ op_functions = [
 op_functions_dict = dict((i.name, i) for i in op_functions)
 
 class ScriptTransformer(BaseTransformer):
-    """Transforms input into a structural intermediate representation."""
+    """Transforms input into a structural intermediate representation.
+
+    Visitor methods of nodes that contain expressions are generators (see
+    BaseTransformer.visit()), so that deep expressions can be transformed.
+    """
     def __init__(self, symbol_table=None):
         super(ScriptTransformer, self).__init__()
         self.symbol_table = symbol_table
@@ -101,9 +104,9 @@ class ScriptTransformer(BaseTransformer):
             return binary_ops[name]
 
     def visit_Module(self, node):
-        node.body = map(self.visit, node.body)
+        node.body = yield self.visit_list(node.body)
         scr = types.Script(statements=filter(lambda i: i is not None, node.body))
-        return scr
+        yield Result(scr)
 
     def visit_Pass(self, node):
         return None
@@ -123,7 +126,7 @@ class ScriptTransformer(BaseTransformer):
         if target == '_stack':
             self.symbol_table.add_stack_assumptions([i.id for i in value.elts])
         else:
-            value = self.visit(value)
+            value = yield value
             # Byte array value.
             if isinstance(value, types.Push):
                 sym_value = formats.hex_to_list(value.data)
@@ -134,7 +137,7 @@ class ScriptTransformer(BaseTransformer):
                 sym_type = self.symbol_table.Expr
             self.symbol_table.add_symbol(target, sym_value, sym_type)
 
-        return types.Assignment(name=target, value=value)
+        yield Result(types.Assignment(name=target, value=value))
 
     def visit_Name(self, node):
         # Return the node if it's being assigned.
@@ -150,11 +153,12 @@ class ScriptTransformer(BaseTransformer):
         return op
 
     def visit_Num(self, node):
-        """Transform int to a hex string."""
-        return self.visit(ast.Str(hex(node.n)))
+        """Transform int to a script number."""
+        return types.Push(formats.int_to_scriptnum(node.n).encode('hex'))
 
     def visit_Str(self, node):
-        return types.Push(hexs.format_hex(node.s))
+        # Leading zero bytes are part of the data.
+        return types.Push(formats.make_even(node.s.lower()))
 
     def visit_List(self, node):
         """Transform array of bytes to bytes."""
@@ -162,79 +166,76 @@ class ScriptTransformer(BaseTransformer):
 
     def visit_Tuple(self, node):
         """Tuple denotes an embedded "inner" script."""
-        node.elts = map(self.visit, node.elts)
-        return types.InnerScript(node.elts)
+        node.elts = yield self.visit_list(node.elts)
+        yield Result(types.InnerScript(node.elts))
 
     def visit_Assert(self, node):
-        node.test = self.visit(node.test)
-        return types.VerifyOpCode(name='OP_VERIFY',
-                test=node.test)
+        node.test = yield node.test
+        yield Result(types.VerifyOpCode(name='OP_VERIFY',
+                test=node.test))
 
     def visit_Return(self, node):
         return types.OpCode(name='OP_RETURN')
 
     def visit_BoolOp(self, node):
-        node.values = map(self.visit, node.values)
+        node.values = yield self.visit_list(node.values)
 
         name = self.get_op_name(node.op)
         # Create nested boolean ops.
         op = _reduce(lambda left, right: types.BinOpCode(name=name,
             left=left, right=right), node.values)
-        return op
+        yield Result(op)
 
     def visit_UnaryOp(self, node):
-        node.operand = self.visit(node.operand)
+        node.operand = yield node.operand
 
-        return types.UnaryOpCode(name=self.get_op_name(node.op),
-                operand=node.operand)
+        yield Result(types.UnaryOpCode(name=self.get_op_name(node.op),
+                operand=node.operand))
 
     def visit_BinOp(self, node):
-        node.left, node.right = map(self.visit, [node.left, node.right])
+        node.left = yield node.left
+        node.right = yield node.right
 
-        return types.BinOpCode(name=self.get_op_name(node.op),
-                left=node.left, right=node.right)
+        yield Result(types.BinOpCode(name=self.get_op_name(node.op),
+                left=node.left, right=node.right))
 
     def visit_Compare(self, node):
-        node.left = self.visit(node.left)
-        node.comparators[0] = self.visit(node.comparators[0])
+        node.left = yield node.left
+        node.comparators[0] = yield node.comparators[0]
 
         # Special case for NotEq (!=).
         if node.ops[0].__class__.__name__ == 'NotEq':
             binop = types.BinOpCode(name='OP_EQUAL',
                     left=node.left, right=node.comparators[0])
-            return types.UnaryOpCode(name='OP_NOT', operand=binop)
+            yield Result(types.UnaryOpCode(name='OP_NOT', operand=binop))
+            return
 
         # Assume one op and one comparator.
-        return types.BinOpCode(name=self.get_op_name(node.ops[0]),
-                left=node.left, right=node.comparators[0])
+        yield Result(types.BinOpCode(name=self.get_op_name(node.ops[0]),
+                left=node.left, right=node.comparators[0]))
 
     def visit_Call(self, node):
         """Transform function calls into their corresponding OpCodes."""
         # Function name must be known.
         if node.func.id not in op_functions_dict:
-            return node
+            raise SyntaxError('Unknown function: %s' % node.func.id)
 
         op_func = op_functions_dict[node.func.id]
         # Ensure args have been visited.
-        node.args = map(self.visit, node.args)
+        node.args = yield self.visit_list(node.args)
         # Ensure the number of args is correct.
         if op_func.nargs != -1 and len(node.args) != op_func.nargs:
             raise SyntaxError('%s takes %d arguments (%d were given)' % (op_func.name, op_func.nargs, len(node.args)))
 
         # Unary opcode.
         if op_func.nargs == 1:
-            return types.UnaryOpCode(name = op_func.op_name,
-                    operand = node.args[0])
+            yield Result(types.UnaryOpCode(name = op_func.op_name,
+                    operand = node.args[0]))
         # Binary opcode.
         elif op_func.nargs == 2:
-            return types.BinOpCode(name = op_func.op_name,
-                    left = node.args[0], right = node.args[1])
+            yield Result(types.BinOpCode(name = op_func.op_name,
+                    left = node.args[0], right = node.args[1]))
         # Variable arguments.
         else:
-            return types.VariableArgsOpCode(name = op_func.op_name,
-                    operands = list(node.args))
-
-    def format_dump(self, node, annotate_fields=True, include_attributes=False):
-        if hasattr(node, 'dump') and not isinstance(node, types.Script):
-            return node.dump(annotate_fields)
-        return super(ScriptTransformer, self).format_dump(node, annotate_fields, include_attributes)
+            yield Result(types.VariableArgsOpCode(name = op_func.op_name,
+                    operands = list(node.args)))
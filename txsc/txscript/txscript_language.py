@@ -4,7 +4,8 @@ from ply import yacc
 from txsc.ir.instructions import STRUCTURAL, SInstructions
 from txsc.language import Language
 from txsc.transformer import SourceVisitor
-from txsc.txscript import ScriptParser, ScriptTransformer
+from txsc.txscript import ScriptTransformer
+from txsc.txscript.script_parser import get_parser
 from txsc.symbols import SymbolTable
 
 def get_lang():
@@ -15,20 +16,22 @@ class TxScriptSourceVisitor(SourceVisitor):
     ir_type = STRUCTURAL
     def __init__(self, *args, **kwargs):
         super(TxScriptSourceVisitor, self).__init__(*args, **kwargs)
-        # Set up yacc.
-        self.parser = ScriptParser()
+        self.parser = get_parser()
 
     def transform(self, source, symbol_table):
         if isinstance(source, list):
             source = '\n'.join(source)
 
-        node = self.parser.parse(source)
-        if not isinstance(node, ast.Module):
-            node = ast.Module(body=node)
-        ast.fix_missing_locations(node)
+        with self.profiler.stage('parse') as stage:
+            node = self.parser.parse(source)
+            if not isinstance(node, ast.Module):
+                node = ast.Module(body=node)
+            stage.set_output(node)
 
         # Convert AST to structural representation.
-        node = ScriptTransformer(symbol_table).visit(node)
+        with self.profiler.stage('ScriptTransformer', node) as stage:
+            node = ScriptTransformer(symbol_table).visit(node)
+            stage.set_output(node)
 
         return SInstructions(node)
 
@@ -38,3 +41,7 @@ class TxScriptLanguage(Language):
     name = 'txscript'
     source_visitor = TxScriptSourceVisitor
     supports_symbol_table = True
+
+    @classmethod
+    def prepare(cls):
+        get_parser()